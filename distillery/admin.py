@@ -1,170 +1,182 @@
-from django.contrib import admin
-from django.http import HttpResponse
-from .models import Batch, FermentationRecord, WashRecord, DistillationRecord, TotalsRecord, ProductRecord
-import csv
+import tempfile
 
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin.views.main import ChangeList
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db.models import Max, OuterRef, Q, Subquery
+from django.http import FileResponse, HttpResponse
+from django.shortcuts import redirect
+from django.utils.functional import cached_property
+from .exports import write_batches_csv
+from .jobs import enqueue
+from .models import (
+    Batch, FermentationRecord, WashRecord, DistillationRecord, TotalsRecord, ProductRecord, Job,
+    FermentationReading, FermentationRollup, StillRunTrace, FaintsTransfer, SyncOperation, Recipe, AuditRun,
+)
+from .querybudget import query_budget
+from .replica import complete_on_replica, replica_reads
+from .snapshots import write_snapshot
 
+
+@query_budget(15)
 def export_batches_to_csv(modeladmin, request, queryset):
     """Admin action to export selected batches and all their records to CSV"""
+    count = queryset.count()
+    if count > settings.EXPORT_BACKGROUND_THRESHOLD:
+        job = enqueue(
+            'export_batches_csv',
+            batch_ids=list(queryset.values_list('pk', flat=True)),
+            host=request.META.get('HTTP_HOST', ''),
+        )
+        modeladmin.message_user(request, f'Large export queued as job #{job.pk}.', messages.INFO)
+        return redirect('job_detail', job_id=job.pk)
+
     response = HttpResponse(content_type='text/csv')
     response['Content-Disposition'] = 'attachment; filename="batches_export.csv"'
-    
-    writer = csv.writer(response)
-    
-    # Write header
-    writer.writerow(['Export Date:', request.META.get('HTTP_HOST', ''), 'Generated by Django Admin'])
-    writer.writerow([])
-    
-    for batch in queryset.order_by('batch_number'):
-        # Write batch header info
-        writer.writerow(['=' * 80])
-        writer.writerow([f'BATCH #{batch.batch_number}'])
-        writer.writerow(['=' * 80])
-        writer.writerow(['Recipe:', batch.recipe])
-        writer.writerow(['Notes:', batch.notes or ''])
-        writer.writerow(['Created:', batch.created_at.strftime('%Y-%m-%d %H:%M')])
-        writer.writerow(['Updated:', batch.updated_at.strftime('%Y-%m-%d %H:%M')])
-        writer.writerow([])
-        
-        # Export Fermentation
-        if batch.fermentation:
-            writer.writerow(['--- Fermentation ---'])
-            record = batch.fermentation
-            writer.writerow(['Field', 'Value'])
-            writer.writerow(['Description', record.description])
-            writer.writerow(['To', record.to_field or ''])
-            writer.writerow(['Volume (L)', record.volume_in_l or ''])
-            writer.writerow(['Start Date', record.start_date.strftime('%Y-%m-%d') if record.start_date else ''])
-            writer.writerow(['SG Start', record.sg_start or ''])
-            writer.writerow(['End Date', record.date.strftime('%Y-%m-%d') if record.date else ''])
-            writer.writerow(['SG End', record.sg_end or ''])
-            writer.writerow(['ABV (%)', record.abv or ''])
-            writer.writerow(['LAL', record.lal or ''])
-            writer.writerow(['Notes', record.notes or ''])
-            writer.writerow(['Created', record.created_at.strftime('%Y-%m-%d %H:%M')])
-            writer.writerow(['Updated', record.updated_at.strftime('%Y-%m-%d %H:%M')])
-            writer.writerow([])
-        
-        # Export Wash
-        if batch.wash:
-            writer.writerow(['--- Wash ---'])
-            record = batch.wash
-            writer.writerow(['Field', 'Value'])
-            writer.writerow(['Description', record.description])
-            writer.writerow(['Faints In (L)', record.faints_in_l or ''])
-            writer.writerow(['From', record.from_field or ''])
-            writer.writerow(['To', record.to_field or ''])
-            writer.writerow(['Volume (L)', record.volume_in_l or ''])
-            writer.writerow(['Start Date', record.start_date.strftime('%Y-%m-%d') if record.start_date else ''])
-            writer.writerow(['End Date', record.date.strftime('%Y-%m-%d') if record.date else ''])
-            writer.writerow(['Fores Out (L)', record.fores_out or ''])
-            writer.writerow(['Heads Out (L)', record.heads_out or ''])
-            writer.writerow(['Hearts Out (L)', record.hearts_out or ''])
-            writer.writerow(['Hearts Out Location', record.hearts_out_location or ''])
-            writer.writerow(['Tails Out (L)', record.tails_out or ''])
-            writer.writerow(['Faints Out Location', record.faints_out_location or ''])
-            writer.writerow(['Waste Out (L)', record.waste_out or ''])
-            writer.writerow(['ABV (Hearts) %', record.abv_hearts or ''])
-            writer.writerow(['LAL', record.lal or ''])
-            writer.writerow(['Notes', record.notes or ''])
-            writer.writerow(['Created', record.created_at.strftime('%Y-%m-%d %H:%M')])
-            writer.writerow(['Updated', record.updated_at.strftime('%Y-%m-%d %H:%M')])
-            writer.writerow([])
-        
-        # Export Spirit 1
-        if batch.spirit_1:
-            writer.writerow(['--- Spirit 1 ---'])
-            record = batch.spirit_1
-            writer.writerow(['Field', 'Value'])
-            writer.writerow(['Description', record.description])
-            writer.writerow(['Faints In (L)', record.faints_in_l or ''])
-            writer.writerow(['From', record.from_field or ''])
-            writer.writerow(['To', record.to_field or ''])
-            writer.writerow(['Volume (L)', record.volume_in_l or ''])
-            writer.writerow(['Start Date', record.start_date.strftime('%Y-%m-%d') if record.start_date else ''])
-            writer.writerow(['End Date', record.date.strftime('%Y-%m-%d') if record.date else ''])
-            writer.writerow(['Fores Out (L)', record.fores_out or ''])
-            writer.writerow(['Heads Out (L)', record.heads_out or ''])
-            writer.writerow(['Hearts Out (L)', record.hearts_out or ''])
-            writer.writerow(['ABV (Hearts) %', record.abv_hearts or ''])
-            writer.writerow(['Hearts Out Location', record.hearts_out_location or ''])
-            writer.writerow(['Tails Out (L)', record.tails_out or ''])
-            writer.writerow(['Waste Out (L)', record.waste_out or ''])
-            writer.writerow(['LAL', record.lal or ''])
-            writer.writerow(['Notes', record.notes or ''])
-            writer.writerow(['Created', record.created_at.strftime('%Y-%m-%d %H:%M')])
-            writer.writerow(['Updated', record.updated_at.strftime('%Y-%m-%d %H:%M')])
-            writer.writerow([])
-        
-        # Export Spirit 2
-        if batch.spirit_2:
-            writer.writerow(['--- Spirit 2 ---'])
-            record = batch.spirit_2
-            writer.writerow(['Field', 'Value'])
-            writer.writerow(['Description', record.description])
-            writer.writerow(['Faints In (L)', record.faints_in_l or ''])
-            writer.writerow(['From', record.from_field or ''])
-            writer.writerow(['To', record.to_field or ''])
-            writer.writerow(['Volume (L)', record.volume_in_l or ''])
-            writer.writerow(['Start Date', record.start_date.strftime('%Y-%m-%d') if record.start_date else ''])
-            writer.writerow(['End Date', record.date.strftime('%Y-%m-%d') if record.date else ''])
-            writer.writerow(['Fores Out (L)', record.fores_out or ''])
-            writer.writerow(['Heads Out (L)', record.heads_out or ''])
-            writer.writerow(['Hearts Out (L)', record.hearts_out or ''])
-            writer.writerow(['ABV (Hearts) %', record.abv_hearts or ''])
-            writer.writerow(['Hearts Out Location', record.hearts_out_location or ''])
-            writer.writerow(['Tails Out (L)', record.tails_out or ''])
-            writer.writerow(['Waste Out (L)', record.waste_out or ''])
-            writer.writerow(['LAL', record.lal or ''])
-            writer.writerow(['Notes', record.notes or ''])
-            writer.writerow(['Created', record.created_at.strftime('%Y-%m-%d %H:%M')])
-            writer.writerow(['Updated', record.updated_at.strftime('%Y-%m-%d %H:%M')])
-            writer.writerow([])
-        
-        # Export Totals
-        if batch.totals:
-            writer.writerow(['--- Totals ---'])
-            record = batch.totals
-            writer.writerow(['Field', 'Value'])
-            writer.writerow(['Description', record.description])
-            writer.writerow(['Hearts to Storage Location', record.hearts_to_storage_location or ''])
-            writer.writerow(['Hearts ABV (%)', record.hearts_abv or ''])
-            writer.writerow(['Hearts to Storage (L)', record.hearts_to_storage_l or ''])
-            writer.writerow(['Faints to Storage Location', record.faints_to_storage_location or ''])
-            writer.writerow(['Faints to Storage (L)', record.faints_to_storage_l or ''])
-            writer.writerow(['Faints ABV (%)', record.faints_abv or ''])
-            writer.writerow(['Notes', record.notes or ''])
-            writer.writerow(['Created', record.created_at.strftime('%Y-%m-%d %H:%M')])
-            writer.writerow(['Updated', record.updated_at.strftime('%Y-%m-%d %H:%M')])
-            
-            # Add products if any
-            products = record.products.all()
-            if products.exists():
-                writer.writerow([])
-                writer.writerow(['Products:'])
-                writer.writerow(['Product', 'Final ABV (%)', 'Final L', 'Location', 'LAL', 'Notes', 'Created', 'Updated'])
-                for product in products:
-                    writer.writerow([
-                        product.product_name,
-                        product.final_abv or '',
-                        product.final_l or '',
-                        product.distillation_location or '',
-                        product.lal or '',
-                        product.notes or '',
-                        product.created_at.strftime('%Y-%m-%d %H:%M'),
-                        product.updated_at.strftime('%Y-%m-%d %H:%M')
-                    ])
-            writer.writerow([])
-        
-        writer.writerow([])  # Extra spacing between batches
-    
+    with replica_reads(request):
+        write_batches_csv(response, complete_on_replica(queryset, count), request.META.get('HTTP_HOST', ''))
     return response
 
 export_batches_to_csv.short_description = "Export selected batches to CSV"
 
 
+# Mostly the snapshot's schema: a statement per table and index, whatever the number of batches
+@query_budget(45)
+def export_batches_to_sqlite(modeladmin, request, queryset):
+    """Admin action to download selected batches and their records as a gzipped SQLite database"""
+    # Deleted when closed, i.e. once the response has been sent
+    packed = tempfile.TemporaryFile()
+    write_snapshot(queryset, packed)
+    packed.seek(0)
+    return FileResponse(packed, as_attachment=True, filename='batches_snapshot.sqlite3.gz', content_type='application/gzip')
+
+export_batches_to_sqlite.short_description = "Export selected batches to SQLite"
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that estimates the size of big unfiltered tables.
+
+    SQLite has to scan the whole table for ``COUNT(*)``. When the changelist
+    isn't filtered, the highest primary key (an index lookup) is used instead
+    once it passes ``exact_limit``. Deleted and archived rows make that too
+    high, so a page that comes back short clamps the count to where the table
+    really ends, and one past the end is served as the real last page.
+    """
+    exact_limit = 10000
+    estimated = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = queryset.model._default_manager.using(queryset.db).aggregate(last=Max('pk'))['last'] or 0
+            if estimate > self.exact_limit:
+                self.estimated = True
+                return estimate
+        return super().count
+
+    def page(self, number):
+        page = super().page(number)
+        # len() loads the page's rows, which are shown anyway
+        if not self.estimated or len(page) == self.per_page:
+            return page
+        self.estimated = False
+        self.__dict__.pop('num_pages', None)
+        if len(page):
+            # The first short page is the last one
+            self.count = (page.number - 1) * self.per_page + len(page)
+            return page
+        self.count = self.object_list.count()
+        return super().page(self.num_pages)
+
+
+def _has_column(model, name):
+    return any(field.name == name for field in model._meta.concrete_fields)
+
+
+class DeferringChangeList(ChangeList):
+    """ChangeList that skips loading the admin's ``list_defer`` columns.
+
+    It also picks up the count EstimatedCountPaginator settles on once a page
+    reaches the end of the table.
+    """
+
+    def get_results(self, request):
+        super().get_results(request)
+        # EstimatedCountPaginator corrects its count when the page runs into the end of the table
+        if self.multi_page and self.paginator.count != self.result_count:
+            self.result_count = self.paginator.count
+            self.page_num = min(self.page_num, self.paginator.num_pages)
+            self.can_show_all = self.result_count <= self.list_max_show_all
+            self.multi_page = self.result_count > self.list_per_page
+
+    def get_queryset(self, request, *args, **kwargs):
+        queryset = super().get_queryset(request, *args, **kwargs)
+        fields = [
+            name for name in self.model_admin.list_defer
+            if name not in self.list_display and _has_column(self.model, name)
+        ]
+        # Joined rows are only shown by their __str__, so skip their long columns too
+        if isinstance(self.list_select_related, (list, tuple)):
+            for relation in self.list_select_related:
+                related = self.model._meta.get_field(relation).related_model
+                fields.extend(
+                    f'{relation}__{name}' for name in self.model_admin.list_defer if _has_column(related, name)
+                )
+        return queryset.defer(*fields) if fields else queryset
+
+
+class ScalableModelAdmin(admin.ModelAdmin):
+    """Base admin for tables that grow without bound.
+
+    Changelists use an estimated count, skip the second full-table count
+    behind "N total", and don't load long text columns they don't show.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_defer = ('notes',)
+
+    def get_changelist(self, request, **kwargs):
+        return DeferringChangeList
+
+
+class BatchRecordSelect(AutocompleteSelect):
+    """Autocomplete for a Batch record field that tells the lookup which batch is being edited."""
+    batch_pk = None
+
+    def get_url(self):
+        url = super().get_url()
+        return f'{url}?batch={self.batch_pk}' if self.batch_pk else url
+
+
+class BatchRecordAdmin(ScalableModelAdmin):
+    """Admin for records a Batch links to one-to-one.
+
+    When searched from the Batch form's autocomplete, only records that no
+    batch uses yet (plus the edited batch's own) are offered.
+    """
+
+    def get_search_results(self, request, queryset, search_term):
+        queryset, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        match = request.resolver_match
+        if match and match.url_name == 'autocomplete' and request.GET.get('model_name') == Batch._meta.model_name:
+            links = [
+                field.related_query_name() for field in Batch._meta.concrete_fields
+                if field.one_to_one and field.related_model is self.model
+            ]
+            available = Q(*[Q(**{f'{name}__isnull': True}) for name in links])
+            batch_pk = request.GET.get('batch', '')
+            if batch_pk.isdigit():
+                for name in links:
+                    available |= Q(**{name: batch_pk})
+            queryset = queryset.filter(available)
+        return queryset, may_have_duplicates
+
+
 @admin.register(FermentationRecord)
-class FermentationRecordAdmin(admin.ModelAdmin):
+class FermentationRecordAdmin(BatchRecordAdmin):
     list_display = ('description', 'to_field', 'volume_in_l', 'start_date', 'date', 'abv', 'lal')
     list_filter = ('start_date', 'date')
     search_fields = ('description', 'to_field')
@@ -172,7 +184,7 @@ class FermentationRecordAdmin(admin.ModelAdmin):
 
 
 @admin.register(WashRecord)
-class WashRecordAdmin(admin.ModelAdmin):
+class WashRecordAdmin(BatchRecordAdmin):
     list_display = ('description', 'from_field', 'to_field', 'volume_in_l', 'start_date', 'date', 'abv_hearts', 'lal')
     list_filter = ('start_date', 'date')
     search_fields = ('description', 'from_field', 'to_field')
@@ -180,7 +192,7 @@ class WashRecordAdmin(admin.ModelAdmin):
 
 
 @admin.register(DistillationRecord)
-class DistillationRecordAdmin(admin.ModelAdmin):
+class DistillationRecordAdmin(BatchRecordAdmin):
     list_display = ('description', 'from_field', 'to_field', 'volume_in_l', 'start_date', 'date', 'abv_hearts', 'lal')
     list_filter = ('start_date', 'date')
     search_fields = ('description', 'from_field', 'to_field')
@@ -188,7 +200,7 @@ class DistillationRecordAdmin(admin.ModelAdmin):
 
 
 @admin.register(TotalsRecord)
-class TotalsRecordAdmin(admin.ModelAdmin):
+class TotalsRecordAdmin(BatchRecordAdmin):
     list_display = ('description', 'hearts_to_storage_location', 'hearts_abv', 'hearts_to_storage_l', 'faints_to_storage_location', 'faints_to_storage_l', 'faints_abv', 'created_at')
     list_filter = ('created_at',)
     search_fields = ('description',)
@@ -196,19 +208,132 @@ class TotalsRecordAdmin(admin.ModelAdmin):
 
 
 @admin.register(ProductRecord)
-class ProductRecordAdmin(admin.ModelAdmin):
+class ProductRecordAdmin(ScalableModelAdmin):
     list_display = ('product_name', 'totals_record', 'final_abv', 'final_l', 'distillation_location', 'lal')
+    list_select_related = ('totals_record',)
     list_filter = ('product_name', 'created_at')
     search_fields = ('product_name', 'distillation_location')
     date_hierarchy = 'created_at'
 
 
 @admin.register(Batch)
-class BatchAdmin(admin.ModelAdmin):
-    list_display = ('batch_number', 'recipe', 'created_at', 'updated_at')
-    list_filter = ('created_at', 'updated_at')
-    search_fields = ('batch_number', 'recipe')
-    readonly_fields = ('created_at', 'updated_at')
+class BatchAdmin(ScalableModelAdmin):
+    list_display = ('batch_number', 'recipe', 'status', 'status_changed_at', 'created_at', 'updated_at')
+    list_select_related = ('recipe',)
+    list_filter = ('status', 'created_at', 'updated_at')
+    search_fields = ('batch_number', 'recipe__name')
+    readonly_fields = ('status', 'status_changed_at', 'created_at', 'updated_at')
     date_hierarchy = 'created_at'
-    actions = [export_batches_to_csv]
+    actions = [export_batches_to_csv, export_batches_to_sqlite]
+    autocomplete_fields = ('fermentation', 'wash', 'spirit_1', 'spirit_2', 'totals')
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name in self.autocomplete_fields:
+            kwargs['widget'] = BatchRecordSelect(db_field, self.admin_site, using=kwargs.get('using'))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_form(self, request, obj=None, **kwargs):
+        form = super().get_form(request, obj, **kwargs)
+        if obj is not None:
+            for name in self.autocomplete_fields:
+                widget = form.base_fields[name].widget
+                # Unwrap RelatedFieldWidgetWrapper
+                getattr(widget, 'widget', widget).batch_pk = obj.pk
+        return form
+
+
+@admin.register(Recipe)
+class RecipeAdmin(admin.ModelAdmin):
+    list_display = ('name', 'batch_count', 'avg_abv', 'avg_lal', 'last_brewed', 'stats_updated_at')
+    search_fields = ('name',)
+    readonly_fields = ('batch_count', 'avg_abv', 'avg_lal', 'last_brewed', 'stats_updated_at', 'created_at', 'updated_at')
+
+
+@admin.register(FermentationReading)
+class FermentationReadingAdmin(ScalableModelAdmin):
+    list_display = ('fermentation', 'taken_at', 'sg', 'temperature')
+    list_select_related = ('fermentation',)
+    list_filter = ('taken_at',)
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(FermentationRollup)
+class FermentationRollupAdmin(ScalableModelAdmin):
+    list_display = ('fermentation', 'hour', 'readings', 'sg_min', 'sg_mean', 'sg_max', 'temperature_mean')
+    list_select_related = ('fermentation',)
+    readonly_fields = ('fermentation', 'hour', 'readings', 'sg_min', 'sg_max', 'sg_mean', 'temperature_min', 'temperature_max', 'temperature_mean')
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(StillRunTrace)
+class StillRunTraceAdmin(ScalableModelAdmin):
+    list_display = ('__str__', 'wash', 'distillation', 'started_at', 'samples', 'updated_at')
+    list_select_related = ('wash', 'distillation')
+    list_defer = ('notes', 'seconds', 'abv', 'temperature', 'flow')
+    exclude = ('seconds', 'abv', 'temperature', 'flow')
+    readonly_fields = ('wash', 'distillation', 'started_at', 'samples')
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(FaintsTransfer)
+class FaintsTransferAdmin(ScalableModelAdmin):
+    list_display = ('__str__', 'source_batch', 'target_batch', 'stage', 'volume_l', 'abv', 'location', 'date')
+    list_filter = ('stage', 'date')
+    search_fields = ('source__batch_number', 'target__batch_number', 'location')
+    autocomplete_fields = ('source', 'target')
+    date_hierarchy = 'date'
+
+    def get_queryset(self, request):
+        # Batch numbers by subquery: a join would hide transfers whose batch has been archived
+        numbers = Batch.objects.values('batch_number')
+        return super().get_queryset(request).annotate(
+            source_number=Subquery(numbers.filter(pk=OuterRef('source_id'))),
+            target_number=Subquery(numbers.filter(pk=OuterRef('target_id'))),
+        )
+
+    @admin.display(description='From batch', ordering='source_number')
+    def source_batch(self, obj):
+        return obj.source_number or f'(archived, id {obj.source_id})'
+
+    @admin.display(description='Into batch', ordering='target_number')
+    def target_batch(self, obj):
+        return obj.target_number or f'(archived, id {obj.target_id})'
+
+
+@admin.register(Job)
+class JobAdmin(ScalableModelAdmin):
+    list_display = ('id', 'kind', 'status', 'progress', 'total', 'duration', 'created_at', 'finished_at')
+    list_filter = ('status', 'kind')
+    list_defer = ('params', 'error')
+    readonly_fields = ('kind', 'params', 'status', 'progress', 'total', 'result_file', 'error', 'duration', 'created_at', 'started_at', 'finished_at')
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(SyncOperation)
+class SyncOperationAdmin(ScalableModelAdmin):
+    list_display = ('op_id', 'action', 'batch_number', 'target', 'status', 'queued_at', 'created_at')
+    list_filter = ('status', 'action')
+    search_fields = ('=op_id', '=batch_number')
+    list_defer = ('result',)
+    readonly_fields = ('op_id', 'action', 'batch_number', 'target', 'status', 'result', 'queued_at', 'created_at')
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(AuditRun)
+class AuditRunAdmin(ScalableModelAdmin):
+    list_display = ('started_at', 'finished_at', 'incremental', 'batches_checked', 'findings')
+    list_filter = ('incremental',)
+    readonly_fields = ('started_at', 'finished_at', 'incremental', 'batches_checked', 'findings')
 
+    def has_add_permission(self, request):
+        return False
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class DistilleryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'distillery'
+
+    def ready(self):
+        # Connects the signal handlers that keep cached trend buckets, batch statuses and recipe statistics current
+        from . import recipes, status, trends  # noqa: F401
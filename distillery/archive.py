@@ -0,0 +1,254 @@
+"""Hot/cold archival of finished batches.
+
+Batches whose own row, stage records and products have all been untouched for
+``ARCHIVE_AFTER_DAYS`` are moved, with those records, from the ``default``
+database into the ``archive`` database (a separate SQLite file with the same
+schema). Rows keep their primary keys, so ``restore_batch()`` can move a batch
+back unchanged; the log page of an archived batch offers to.
+
+Rows are copied with raw SQL so column values (including ``updated_at``) are
+preserved exactly, and the target is committed before the source rows are
+deleted, so an interrupted move leaves a duplicate rather than losing data.
+
+Only ``manage.py boot`` migrates the archive on its own; after a plain
+``manage.py migrate`` run ``manage.py migrate --database archive`` too. Until
+then reads wrapped in ``archive_reads()`` see an empty archive.
+"""
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, connections, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from .models import (
+    AuditFinding, Batch, FermentationRecord, FermentationReading, FermentationRollup, WashRecord, DistillationRecord, TotalsRecord,
+    ProductRecord, Recipe, StillRunTrace,
+)
+from .trends import clear_cached_trends
+
+
+ARCHIVE_DB = 'archive'
+HOT_DB = 'default'
+
+# SQLite limits the number of bound parameters per statement
+CHUNK_SIZE = 500
+
+
+class ArchiveError(Exception):
+    """Raised when a batch can't be moved between the hot and archive databases."""
+
+
+def archive_migrated():
+    return Batch._meta.db_table in connections[ARCHIVE_DB].introspection.table_names()
+
+
+@contextmanager
+def archive_reads(using=ARCHIVE_DB):
+    """Skip the rest of the block if it reads from an archive that hasn't been migrated.
+
+    Other databases (``using`` is the alias the block reads from) are left alone.
+    """
+    try:
+        yield
+    except DatabaseError:
+        if using != ARCHIVE_DB or archive_migrated():
+            raise
+
+
+def _chunks(values, size=CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def archive_cutoff(days=None):
+    days = settings.ARCHIVE_AFTER_DAYS if days is None else days
+    return timezone.now() - timedelta(days=days)
+
+
+def archivable_batches(cutoff):
+    """Hot batches whose batch row, stage records and products all predate ``cutoff``."""
+    return Batch.objects.using(HOT_DB).filter(updated_at__lt=cutoff).exclude(
+        Q(fermentation__updated_at__gte=cutoff)
+        | Q(wash__updated_at__gte=cutoff)
+        | Q(spirit_1__updated_at__gte=cutoff)
+        | Q(spirit_2__updated_at__gte=cutoff)
+        | Q(totals__updated_at__gte=cutoff)
+        | Q(totals__products__updated_at__gte=cutoff)
+    )
+
+
+def _child_pks(model, fk_column, parent_pks, using):
+    pks = []
+    for chunk in _chunks(parent_pks):
+        pks.extend(model.objects.using(using).filter(**{f'{fk_column}__in': chunk}).values_list('pk', flat=True))
+    return pks
+
+
+def _move_plan(batch_pks, source):
+    """Return [(model, pks)] for everything belonging to ``batch_pks``, parents first."""
+    links = list(
+        Batch.objects.using(source).filter(pk__in=batch_pks)
+        .values_list('pk', 'fermentation_id', 'wash_id', 'spirit_1_id', 'spirit_2_id', 'totals_id')
+    )
+    fermentation = [row[1] for row in links if row[1]]
+    wash = [row[2] for row in links if row[2]]
+    distillation = [pk for row in links for pk in (row[3], row[4]) if pk]
+    totals = [row[5] for row in links if row[5]]
+    products = _child_pks(ProductRecord, 'totals_record_id', totals, source)
+    return [
+        (FermentationRecord, fermentation),
+        (FermentationReading, _child_pks(FermentationReading, 'fermentation_id', fermentation, source)),
+        (FermentationRollup, _child_pks(FermentationRollup, 'fermentation_id', fermentation, source)),
+        (WashRecord, wash),
+        (DistillationRecord, distillation),
+        (StillRunTrace, [
+            *_child_pks(StillRunTrace, 'wash_id', wash, source),
+            *_child_pks(StillRunTrace, 'distillation_id', distillation, source),
+        ]),
+        (TotalsRecord, totals),
+        (ProductRecord, products),
+        (Batch, [row[0] for row in links]),
+        (AuditFinding, _child_pks(AuditFinding, 'batch_id', [row[0] for row in links], source)),
+    ]
+
+
+def _copy_rows(model, pks, source, target):
+    """Copy rows of ``model`` by primary key, column for column."""
+    quote = connections[target].ops.quote_name
+    table = quote(model._meta.db_table)
+    pk_column = quote(model._meta.pk.column)
+    columns = ', '.join(quote(field.column) for field in model._meta.concrete_fields)
+    values = ', '.join(['%s'] * len(model._meta.concrete_fields))
+    with connections[source].cursor() as src, connections[target].cursor() as dst:
+        for chunk in _chunks(pks):
+            placeholders = ', '.join(['%s'] * len(chunk))
+            src.execute(f'SELECT {columns} FROM {table} WHERE {pk_column} IN ({placeholders})', chunk)
+            rows = src.fetchall()
+            if rows:
+                dst.executemany(f'INSERT OR REPLACE INTO {table} ({columns}) VALUES ({values})', rows)
+
+
+def _delete_rows(model, pks, using):
+    quote = connections[using].ops.quote_name
+    table = quote(model._meta.db_table)
+    pk_column = quote(model._meta.pk.column)
+    with connections[using].cursor() as cursor:
+        for chunk in _chunks(pks):
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(f'DELETE FROM {table} WHERE {pk_column} IN ({placeholders})', chunk)
+
+
+def _referencing_tables(models):
+    """Tables with foreign key constraints pointing at ``models``."""
+    return sorted({
+        relation.related_model._meta.db_table
+        for model in models
+        for relation in model._meta.related_objects
+        if relation.field.db_constraint
+    })
+
+
+def _target_recipes(batch_pks, source, target):
+    """Make sure ``target`` has the batches' recipes; returns ``{source pk: target pk}``.
+
+    Recipes stay in both databases. Each database numbers its own, so they're
+    matched by name.
+    """
+    recipe_pks = set()
+    for chunk in _chunks(batch_pks):
+        recipe_pks.update(Batch.objects.using(source).filter(pk__in=chunk).values_list('recipe_id', flat=True))
+    matches = {}
+    for recipe in Recipe.objects.using(source).filter(pk__in=recipe_pks):
+        match = Recipe.objects.using(target).filter(name__iexact=recipe.name).first()
+        if match is None:
+            match = Recipe.objects.using(target).create(name=recipe.name)
+        matches[recipe.pk] = match.pk
+    return matches
+
+
+def move_batches(batch_pks, source, target):
+    """Move batches and their records from ``source`` to ``target``; returns the count moved."""
+    # recipes imports the database aliases from here
+    from .recipes import refresh_stats
+
+    plan = _move_plan(batch_pks, source)
+    batches = dict(plan)[Batch]
+    try:
+        # Source is the outer block, so the target commits before anything is deleted.
+        with transaction.atomic(using=source), transaction.atomic(using=target):
+            recipes = _target_recipes(batches, source, target)
+            for model, pks in plan:
+                _copy_rows(model, pks, source, target)
+            # Foreign keys are checked at commit, so the copied batches can be pointed at the target's recipes now
+            for old, new in recipes.items():
+                if old != new:
+                    for chunk in _chunks(batches):
+                        Batch.objects.using(target).filter(pk__in=chunk, recipe_id=old).update(recipe_id=new)
+            # Children before parents: the batch references its records, products and readings reference theirs.
+            for model, pks in reversed(plan):
+                _delete_rows(model, pks, source)
+            # Check now rather than at the source's commit, which comes after the target's
+            connections[source].check_constraints(table_names=_referencing_tables(model for model, _ in plan))
+    except IntegrityError as exc:
+        raise ArchiveError(f'Rows outside the move still reference these batches: {exc}') from exc
+    # Raw SQL sends no signals, so drop cached trends and recount the recipes' archived share by hand
+    clear_cached_trends()
+    refresh_stats(recipes.keys() if source == HOT_DB else recipes.values(), archived=True)
+    return len(batches)
+
+
+def archive_batches(cutoff=None, chunk_size=200, dry_run=False):
+    """Archive every batch untouched since ``cutoff``; returns the batch numbers moved.
+
+    Works in chunks of ``chunk_size`` batches so the hot database's write lock
+    is only held briefly.
+    """
+    cutoff = archive_cutoff() if cutoff is None else cutoff
+    candidates = list(archivable_batches(cutoff).order_by('batch_number').values_list('pk', 'batch_number'))
+    if not dry_run:
+        for chunk in _chunks(candidates, chunk_size):
+            move_batches([pk for pk, _ in chunk], HOT_DB, ARCHIVE_DB)
+    return [number for _, number in candidates]
+
+
+def is_archived(batch_number):
+    with archive_reads():
+        return Batch.objects.using(ARCHIVE_DB).filter(batch_number=batch_number).exists()
+    return False
+
+
+def restore_batch(batch_number):
+    """Move an archived batch back into the hot database.
+
+    Returns False if the batch isn't in the archive.
+    """
+    batch_pk = None
+    with archive_reads():
+        batch_pk = Batch.objects.using(ARCHIVE_DB).filter(batch_number=batch_number).values_list('pk', flat=True).first()
+    if batch_pk is None:
+        return False
+    if Batch.objects.using(HOT_DB).filter(batch_number=batch_number).exclude(pk=batch_pk).exists():
+        raise ArchiveError(f'Batch #{batch_number} exists in both the hot and archive databases.')
+    move_batches([batch_pk], ARCHIVE_DB, HOT_DB)
+    return True
+
+
+def batch_number_taken(batch_number):
+    """True if the batch number is in use in either database."""
+    return (
+        Batch.objects.using(HOT_DB).filter(batch_number=batch_number).exists()
+        or is_archived(batch_number)
+    )
+
+
+def last_batch_number():
+    """Highest batch number across the hot and archive databases, or None."""
+    numbers = []
+    for db in (HOT_DB, ARCHIVE_DB):
+        with archive_reads(db):
+            numbers.append(Batch.objects.using(db).aggregate(last=Max('batch_number'))['last'])
+    numbers = [number for number in numbers if number is not None]
+    return max(numbers) if numbers else None
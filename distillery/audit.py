@@ -0,0 +1,212 @@
+"""Mass-balance and data-quality audit of batches.
+
+Each rule compares an expected value with the recorded one, e.g. a run's
+cuts against the volume charged, or a record's LAL against its volume and
+ABV. ``balance`` rules report a difference either way; ``limit`` rules only
+report the actual exceeding the expected (LAL can be lost between stages,
+not gained). A difference within the rule's tolerance (a percentage of the
+expected value, see ``AUDIT_TOLERANCE_PERCENT`` and ``AUDIT_TOLERANCES``)
+plus ``ROUNDING`` is fine.
+
+``run_audit()`` evaluates every rule in SQL: one query for the batch rules
+and one for the product rules, each returning only the rows that break a
+rule. An incremental run checks only the batches changed (batch, stage record
+or product updated) since the previous run started, and replaces just their
+findings.
+"""
+import csv
+from collections import namedtuple
+from functools import reduce
+from operator import add, and_, or_
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import BooleanField, ExpressionWrapper, F, FloatField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Abs, Cast, Coalesce
+from django.utils import timezone
+
+from .models import AuditFinding, AuditRun, Batch, ProductRecord
+
+
+# Findings listed on the audit page; the CSV export has them all
+PAGE_LIMIT = 500
+
+# Litres (or LAL) of slack on top of the tolerance, for values recorded to 2 decimal places
+ROUNDING = 0.05
+
+Rule = namedtuple('Rule', 'code label model kind expected actual required')
+
+DISTILLATION_STAGES = [('wash', 'Wash'), ('spirit_1', 'Spirit 1'), ('spirit_2', 'Spirit 2')]
+CUTS = ['fores_out', 'heads_out', 'hearts_out', 'tails_out', 'waste_out']
+
+# Fields whose update means a batch needs checking again
+CHANGE_FIELDS = [
+    'updated_at', 'fermentation__updated_at', 'wash__updated_at', 'spirit_1__updated_at',
+    'spirit_2__updated_at', 'totals__updated_at', 'totals__products__updated_at',
+]
+
+
+def _value(path):
+    return Cast(path, FloatField())
+
+
+def _total(*paths):
+    """Sum of ``paths``, counting missing values as 0."""
+    return reduce(add, [Coalesce(_value(path), Value(0.0)) for path in paths])
+
+
+def _lal(volume, abv):
+    return _value(volume) * _value(abv) / 100
+
+
+_PRODUCT_LAL = Subquery(
+    ProductRecord.objects.filter(totals_record=OuterRef('totals_id'))
+    .values('totals_record').annotate(total=Sum('lal')).values('total'),
+    output_field=FloatField(),
+)
+
+
+RULES = [
+    Rule('fermentation_lal', 'Fermentation LAL = volume × ABV', Batch, 'balance',
+         _lal('fermentation__volume_in_l', 'fermentation__abv'), _value('fermentation__lal'),
+         ('fermentation__volume_in_l', 'fermentation__abv', 'fermentation__lal')),
+    *[
+        rule
+        for stage, label in DISTILLATION_STAGES
+        for rule in (
+            Rule(f'{stage}_volume', f'{label}: cuts add up to volume + faints in', Batch, 'balance',
+                 _total(f'{stage}__volume_in_l', f'{stage}__faints_in_l'), _total(*(f'{stage}__{cut}' for cut in CUTS)),
+                 (f'{stage}__volume_in_l', f'{stage}__hearts_out')),
+            Rule(f'{stage}_lal', f'{label}: LAL = hearts out × ABV', Batch, 'balance',
+                 _lal(f'{stage}__hearts_out', f'{stage}__abv_hearts'), _value(f'{stage}__lal'),
+                 (f'{stage}__hearts_out', f'{stage}__abv_hearts', f'{stage}__lal')),
+        )
+    ],
+    Rule('wash_lal_gain', 'Wash LAL no more than fermentation LAL', Batch, 'limit',
+         _value('fermentation__lal'), _value('wash__lal'),
+         ('fermentation__lal', 'wash__lal')),
+    Rule('spirit_lal_gain', 'Spirit runs LAL no more than wash LAL', Batch, 'limit',
+         _value('wash__lal'), _total('spirit_1__lal', 'spirit_2__lal'),
+         ('wash__lal', 'spirit_1__lal')),
+    Rule('totals_lal_gain', 'Hearts stored LAL no more than spirit runs LAL', Batch, 'limit',
+         _total('spirit_1__lal', 'spirit_2__lal'), _lal('totals__hearts_to_storage_l', 'totals__hearts_abv'),
+         ('spirit_1__lal', 'totals__hearts_to_storage_l', 'totals__hearts_abv')),
+    Rule('products_lal_gain', 'Products LAL no more than hearts stored LAL', Batch, 'limit',
+         _lal('totals__hearts_to_storage_l', 'totals__hearts_abv'), _PRODUCT_LAL,
+         ('totals__hearts_to_storage_l', 'totals__hearts_abv')),
+    Rule('product_lal', 'Product LAL = final litres × final ABV', ProductRecord, 'balance',
+         _lal('final_l', 'final_abv'), _value('lal'),
+         ('final_l', 'final_abv', 'lal')),
+]
+RULES_BY_CODE = {rule.code: rule for rule in RULES}
+
+# Per model: the path to the batch id, and the field naming the part of the batch at fault with its label
+TARGETS = {
+    Batch: ('pk', None, ''),
+    ProductRecord: ('totals_record__batch__id', 'product_name', 'Product'),
+}
+
+
+def tolerance(code, tolerances=None):
+    """Allowed difference for rule ``code``, in percent of the expected value."""
+    overrides = {**getattr(settings, 'AUDIT_TOLERANCES', {}), **(tolerances or {})}
+    return float(overrides.get(code, settings.AUDIT_TOLERANCE_PERCENT))
+
+
+def _broken(rule, percent):
+    """Q for rows where ``rule`` applies and is broken, on its annotated ``<code>_expected/_actual``."""
+    expected = F(f'{rule.code}_expected')
+    margin = Abs(expected) * (percent / 100) + ROUNDING
+    broken = Q(**{f'{rule.code}_actual__gt': expected + margin})
+    if rule.kind == 'balance':
+        broken |= Q(**{f'{rule.code}_actual__lt': expected - margin})
+    return reduce(and_, [Q(**{f'{path}__isnull': False}) for path in rule.required], broken)
+
+
+def _violations(model, rules, batches, tolerances):
+    """``[AuditFinding]`` for ``rules`` on ``model``, in one query; ``batches`` limits it to a batch subquery."""
+    batch_path, subject_field, subject_label = TARGETS[model]
+    queryset = model.objects.all()
+    if model is ProductRecord:
+        queryset = queryset.filter(totals_record__batch__isnull=False)
+    if batches is not None:
+        queryset = queryset.filter(**{f'{batch_path}__in': batches})
+    queryset = queryset.annotate(**{
+        name: expression
+        for rule in rules
+        for name, expression in ((f'{rule.code}_expected', rule.expected), (f'{rule.code}_actual', rule.actual))
+    }).annotate(**{
+        f'{rule.code}_broken': ExpressionWrapper(_broken(rule, tolerance(rule.code, tolerances)), output_field=BooleanField())
+        for rule in rules
+    }).filter(reduce(or_, [Q(**{f'{rule.code}_broken': True}) for rule in rules]))
+
+    columns = [f'{rule.code}_{suffix}' for rule in rules for suffix in ('expected', 'actual', 'broken')]
+    now = timezone.now()
+    findings = []
+    for row in queryset.values(batch_path, *([subject_field] if subject_field else []), *columns):
+        for rule in rules:
+            if row[f'{rule.code}_broken']:
+                findings.append(AuditFinding(
+                    batch_id=row[batch_path],
+                    rule=rule.code,
+                    subject=f'{subject_label} {row[subject_field]}' if subject_field else '',
+                    expected=round(row[f'{rule.code}_expected'], 2),
+                    actual=round(row[f'{rule.code}_actual'], 2),
+                    found_at=now,
+                ))
+    return findings
+
+
+def changed_batches(since):
+    """Subquery of the batches with the batch, a stage record or a product updated since ``since``."""
+    return Batch.objects.filter(reduce(or_, [Q(**{f'{path}__gte': since}) for path in CHANGE_FIELDS])).values('pk').distinct()
+
+
+def run_audit(full=False, tolerances=None):
+    """Check batches against every rule and store the findings; returns the AuditRun.
+
+    Only batches changed since the previous run are checked unless ``full`` is
+    set (or there was no previous run). ``tolerances`` overrides per-rule
+    tolerances for this run.
+    """
+    previous = AuditRun.objects.filter(finished_at__isnull=False).first()
+    run = AuditRun(started_at=timezone.now(), incremental=not full and previous is not None)
+    batches = changed_batches(previous.started_at) if run.incremental else None
+
+    findings = []
+    for model in TARGETS:
+        rules = [rule for rule in RULES if rule.model is model]
+        findings.extend(_violations(model, rules, batches, tolerances))
+
+    with transaction.atomic():
+        stale = AuditFinding.objects.all()
+        if batches is not None:
+            stale = stale.filter(batch__in=batches)
+            run.batches_checked = batches.count()
+        else:
+            run.batches_checked = Batch.objects.count()
+        stale.delete()
+        AuditFinding.objects.bulk_create(findings, batch_size=500)
+        run.findings = len(findings)
+        run.finished_at = timezone.now()
+        run.save()
+    return run
+
+
+def write_findings_csv(fileobj, findings, tolerances=None):
+    """Write ``findings`` (with their batches loaded) to ``fileobj`` as CSV."""
+    writer = csv.writer(fileobj)
+    writer.writerow(['Batch', 'Rule', 'Check', 'Subject', 'Expected', 'Actual', 'Difference', 'Tolerance (%)', 'Found'])
+    for finding in findings:
+        rule = RULES_BY_CODE.get(finding.rule)
+        writer.writerow([
+            finding.batch.batch_number,
+            finding.rule,
+            rule.label if rule else '',
+            finding.subject,
+            finding.expected,
+            finding.actual,
+            round(finding.actual - finding.expected, 2) if None not in (finding.actual, finding.expected) else '',
+            tolerance(finding.rule, tolerances),
+            finding.found_at.strftime('%Y-%m-%d %H:%M'),
+        ])
@@ -0,0 +1,146 @@
+"""Online backups of the SQLite databases.
+
+``backup_database()`` copies a live database with SQLite's backup API a few
+hundred pages at a time, sleeping between steps so writers aren't locked out
+for the whole copy. The copy is checked with ``PRAGMA integrity_check``,
+gzipped into ``BACKUP_DIR`` and older backups beyond ``BACKUP_KEEP`` are
+removed. ``restore_database()`` goes the other way, again through the backup
+API so open connections see a consistent database rather than a replaced file.
+"""
+import gzip
+import shutil
+import sqlite3
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+
+# Pages copied per backup step, and seconds to pause between steps
+PAGES_PER_STEP = 256
+STEP_SLEEP = 0.005
+
+SUFFIX = '.sqlite3.gz'
+
+
+class BackupError(Exception):
+    """Raised when a backup or restore can't be completed safely."""
+
+
+def backup_dir():
+    return Path(settings.BACKUP_DIR)
+
+
+def database_path(using):
+    if connections[using].vendor != 'sqlite':
+        raise BackupError(f'Database "{using}" is not SQLite.')
+    return Path(settings.DATABASES[using]['NAME'])
+
+
+def list_backups(using='default'):
+    """Backup files for ``using``, newest first."""
+    prefix = database_path(using).stem + '-'
+    directory = backup_dir()
+    if not directory.is_dir():
+        return []
+    return sorted(
+        (path for path in directory.iterdir() if path.name.startswith(prefix) and path.name.endswith(SUFFIX)),
+        reverse=True,
+    )
+
+
+def check_integrity(conn):
+    result = [row[0] for row in conn.execute('PRAGMA integrity_check')]
+    if result != ['ok']:
+        raise BackupError('Integrity check failed: ' + '; '.join(result[:5]))
+
+
+def rotate(using='default', keep=None):
+    """Delete all but the newest ``keep`` backups of ``using``; returns the removed paths."""
+    keep = settings.BACKUP_KEEP if keep is None else keep
+    removed = list_backups(using)[max(keep, 1):]
+    for path in removed:
+        path.unlink()
+    return removed
+
+
+def backup_database(using='default', pages=PAGES_PER_STEP, sleep=STEP_SLEEP, keep=None):
+    """Back up database ``using`` and return a dict describing the backup."""
+    source_path = database_path(using)
+    if not source_path.exists():
+        raise BackupError(f'{source_path} does not exist.')
+    directory = backup_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+
+    # Microseconds too, so backups made within the same second don't overwrite each other
+    stamp = timezone.now().strftime('%Y%m%d-%H%M%S-%f')
+    target = directory / f'{source_path.stem}-{stamp}{SUFFIX}'
+    working = target.with_name(target.name + '.tmp')
+    copy = directory / f'.{source_path.stem}-{stamp}.sqlite3'
+
+    started = time.monotonic()
+    source = sqlite3.connect(f'file:{source_path}?mode=ro', uri=True)
+    dest = sqlite3.connect(copy)
+    try:
+        source.backup(dest, pages=pages, sleep=sleep)
+        copied = time.monotonic() - started
+        page_count = dest.execute('PRAGMA page_count').fetchone()[0]
+        check_integrity(dest)
+    except Exception:
+        dest.close()
+        copy.unlink(missing_ok=True)
+        raise
+    finally:
+        source.close()
+    dest.close()
+
+    try:
+        with open(copy, 'rb') as raw, gzip.open(working, 'wb', compresslevel=6) as packed:
+            shutil.copyfileobj(raw, packed, 1024 * 1024)
+        working.replace(target)
+    finally:
+        copy.unlink(missing_ok=True)
+        working.unlink(missing_ok=True)
+
+    return {
+        'path': target,
+        'pages': page_count,
+        'copy_seconds': copied,
+        'seconds': time.monotonic() - started,
+        'size': target.stat().st_size,
+        'removed': rotate(using, keep),
+    }
+
+
+def restore_database(path, using='default'):
+    """Replace the contents of database ``using`` with backup ``path``; returns pages restored.
+
+    The backup is unpacked and integrity-checked before the live database is
+    touched.
+    """
+    path = Path(path)
+    target_path = database_path(using)
+    unpacked = target_path.with_name(f'.{target_path.stem}-restore.sqlite3')
+    opener = gzip.open if path.suffix == '.gz' else open
+    try:
+        with opener(path, 'rb') as packed, open(unpacked, 'wb') as raw:
+            shutil.copyfileobj(packed, raw, 1024 * 1024)
+        source = sqlite3.connect(unpacked)
+        try:
+            check_integrity(source)
+            connections[using].close()
+            dest = sqlite3.connect(target_path)
+            try:
+                # One step, so the live database changes atomically.
+                source.backup(dest)
+                return dest.execute('PRAGMA page_count').fetchone()[0]
+            finally:
+                dest.close()
+        finally:
+            source.close()
+    except (OSError, EOFError, sqlite3.DatabaseError) as exc:
+        raise BackupError(f'Could not restore {path}: {exc}') from exc
+    finally:
+        unpacked.unlink(missing_ok=True)
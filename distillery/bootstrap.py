@@ -0,0 +1,55 @@
+"""Container start-up helpers used by ``manage.py boot``.
+
+``unapplied_migrations()`` compares the migration files on disk with the
+``django_migrations`` table without importing any migration module, so an
+up-to-date database costs one query instead of loading the migration graph.
+"""
+import pkgutil
+from importlib import import_module
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.db import connections, router
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.recorder import MigrationRecorder
+
+
+def migration_names(app_label):
+    """Names of the migration files of ``app_label`` (empty if it has none)."""
+    module_name, _ = MigrationLoader.migrations_module(app_label)
+    if module_name is None:
+        return []
+    try:
+        module = import_module(module_name)
+    except ModuleNotFoundError:
+        return []
+    return [
+        info.name for info in pkgutil.iter_modules(getattr(module, '__path__', []))
+        if not info.ispkg and info.name[0] not in '_~'
+    ]
+
+
+def unapplied_migrations(database='default'):
+    """``[(app_label, name)]`` on disk but not applied to ``database``.
+
+    Errs on the side of reporting migrations (a fresh database reports all of
+    them), so a non-empty result only means ``migrate`` should run.
+    """
+    recorder = MigrationRecorder(connections[database])
+    applied = set(recorder.applied_migrations()) if recorder.has_table() else set()
+    return [
+        (config.label, name)
+        for config in apps.get_app_configs()
+        if router.allow_migrate(database, config.label)
+        for name in sorted(migration_names(config.label))
+        if (config.label, name) not in applied
+    ]
+
+
+def ensure_admin(username, password, email='admin@example.com'):
+    """Create the superuser ``username`` if it doesn't exist; returns True if created."""
+    User = get_user_model()
+    if User.objects.filter(username=username).exists():
+        return False
+    User.objects.create_superuser(username=username, email=email, password=password)
+    return True
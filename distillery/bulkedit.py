@@ -0,0 +1,113 @@
+"""Spreadsheet-style editing of one stage's records across many batches.
+
+``load_rows()`` fetches the batches with their stage records in one query.
+``grid_formset()`` puts those records in a model formset built on the
+stage's record form, so every row still goes through the form's ``clean()``,
+and ``save_grid()`` writes all changed rows with one ``bulk_update`` in a
+single transaction.
+"""
+from django import forms
+from django.db import transaction
+from django.forms import BaseModelFormSet, modelformset_factory
+from django.utils import timezone
+
+from .forms import SECTION_MAP
+from .models import Batch
+from .recipes import RECORD_FIELDS, refresh_for_records
+from .trends import clear_cached_trends
+
+
+MAX_BATCHES = 100
+
+# Stage (Batch field) -> (section label, form)
+STAGES = {field: (section, form) for section, (field, form, _) in SECTION_MAP.items()}
+
+# Shown unless columns are picked: long text doesn't fit a grid cell
+HIDDEN_BY_DEFAULT = {'notes'}
+
+
+def stage_fields(stage):
+    """The form fields of ``stage`` as ``[(name, label)]``."""
+    form = STAGES[stage][1]
+    return [(name, field.label) for name, field in form.base_fields.items()]
+
+
+def load_rows(numbers, stage):
+    """``[(batch, record)]`` for batches ``numbers`` (in that order) in one query; record is None if missing."""
+    batches = Batch.objects.filter(batch_number__in=numbers).select_related(stage)
+    by_number = {batch.batch_number: batch for batch in batches}
+    return [
+        (by_number[number], getattr(by_number[number], stage))
+        for number in numbers if number in by_number
+    ]
+
+
+class GridFormSet(BaseModelFormSet):
+    """Model formset over records that are already loaded.
+
+    Rows are matched to ``records`` by their hidden id, so neither rendering
+    nor validating runs a query per row.
+    """
+
+    def __init__(self, *args, records=(), **kwargs):
+        self.records = list(records)
+        super().__init__(*args, **kwargs)
+
+    def get_queryset(self):
+        return self.records
+
+    def add_fields(self, form, index):
+        super().add_fields(form, index)
+        # The default ModelChoiceField would look each row's id up again
+        pk = self.model._meta.pk.name
+        form.fields[pk] = forms.IntegerField(widget=forms.HiddenInput, required=False, initial=form.instance.pk)
+
+    def clean(self):
+        super().clean()
+        for form in self.forms:
+            if form.instance.pk is None or form.cleaned_data.get(self.model._meta.pk.name) != form.instance.pk:
+                raise forms.ValidationError('The grid no longer matches the records; reload it and try again.')
+
+
+def grid_formset(stage, records, fields, data=None):
+    """Formset editing ``fields`` of ``records`` with the stage's form."""
+    FormSet = modelformset_factory(
+        STAGES[stage][1]._meta.model,
+        form=STAGES[stage][1],
+        formset=GridFormSet,
+        fields=fields,
+        extra=0,
+        edit_only=True,
+    )
+    return FormSet(data, records=records, prefix='grid')
+
+
+def save_grid(formset):
+    """Write the changed rows of a valid ``formset`` with one ``bulk_update``; returns the changed records."""
+    model = formset.model
+    records = []
+    fields = set()
+    for form in formset.forms:
+        record = form.save(commit=False)
+        if record.changed_fields:
+            records.append(record)
+            fields |= record.changed_fields
+    if not records:
+        return []
+
+    # bulk_update() doesn't fill auto_now fields or send post_save
+    now = timezone.now()
+    for field in model._meta.concrete_fields:
+        if getattr(field, 'auto_now', False):
+            fields.add(field.name)
+            for record in records:
+                setattr(record, field.attname, now)
+    with transaction.atomic():
+        model.objects.bulk_update(records, sorted(fields))
+    for record in records:
+        record.saved_fields = set(fields)
+        record._snapshot()
+    clear_cached_trends(sender=model, update_fields=fields)
+    if fields & RECORD_FIELDS.get(model, set()):
+        refresh_for_records(model, [record.pk for record in records])
+    return records
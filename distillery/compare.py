@@ -0,0 +1,118 @@
+"""Side-by-side comparison of batches.
+
+``load_batches()`` fetches the batches with their five stage records and
+products in two queries; ``comparison_rows()`` turns them into a
+field-by-stage matrix with deltas against a baseline batch.
+"""
+import datetime
+import re
+from decimal import Decimal
+
+from django.utils.text import capfirst
+
+from .models import Batch, FermentationRecord, WashRecord, DistillationRecord, TotalsRecord, ProductRecord
+
+
+MAX_BATCHES = 50
+
+STAGES = [
+    ('Fermentation', 'fermentation', FermentationRecord),
+    ('Wash', 'wash', WashRecord),
+    ('Spirit 1', 'spirit_1', DistillationRecord),
+    ('Spirit 2', 'spirit_2', DistillationRecord),
+    ('Totals', 'totals', TotalsRecord),
+]
+
+# Bookkeeping columns that aren't worth comparing
+SKIP_FIELDS = {'id', 'description', 'notes', 'created_at', 'updated_at'}
+
+PRODUCT_FIELDS = ['final_abv', 'final_l', 'distillation_location', 'lal']
+
+_RANGE = re.compile(r'^(\d+)\s*-\s*(\d+)$')
+
+
+def parse_batch_numbers(text, limit=MAX_BATCHES):
+    """Parse "12, 14-18 21" into [12, 14, 15, 16, 17, 18, 21].
+
+    Raises ValueError for anything that isn't a number or range, or for more
+    than ``limit`` batches.
+    """
+    numbers = []
+    for part in re.split(r'[\s,]+', text.strip()):
+        if not part:
+            continue
+        match = _RANGE.match(part)
+        if match:
+            start, end = sorted(int(value) for value in match.groups())
+            if end - start >= limit:
+                raise ValueError(f'Choose at most {limit} batches at a time.')
+            numbers.extend(range(start, end + 1))
+        elif part.isdigit():
+            numbers.append(int(part))
+        else:
+            raise ValueError(f'"{part}" is not a batch number or range like 12-18.')
+    numbers = list(dict.fromkeys(numbers))
+    if len(numbers) > limit:
+        raise ValueError(f'Choose at most {limit} batches at a time.')
+    return numbers
+
+
+def load_batches(numbers):
+    """Batches with ``numbers`` (in that order), stage records and products in two queries."""
+    batches = Batch.objects.filter(batch_number__in=numbers).select_related(
+        'recipe', *(attr for _, attr, _ in STAGES)
+    ).prefetch_related('totals__products')
+    by_number = {batch.batch_number: batch for batch in batches}
+    return [by_number[number] for number in numbers if number in by_number]
+
+
+def delta(value, base):
+    """``value - base`` for numbers (and days between dates), else None."""
+    if value is None or base is None or isinstance(value, bool):
+        return None
+    if isinstance(value, datetime.date) and isinstance(base, datetime.date):
+        return (value - base).days
+    if isinstance(value, (int, float, Decimal)) and isinstance(base, (int, float, Decimal)):
+        return Decimal(str(value)) - Decimal(str(base))
+    return None
+
+
+def _row(stage, label, values, baseline_index):
+    base = values[baseline_index] if baseline_index is not None else None
+    return {
+        'stage': stage,
+        'label': label,
+        'cells': [
+            {'value': value, 'delta': None if index == baseline_index else delta(value, base)}
+            for index, value in enumerate(values)
+        ],
+    }
+
+
+def comparison_rows(batches, baseline=None):
+    """Rows of ``{'stage', 'label', 'cells': [{'value', 'delta'}]}``, one cell per batch.
+
+    Deltas are against the batch numbered ``baseline`` (if it's in ``batches``).
+    """
+    numbers = [batch.batch_number for batch in batches]
+    baseline_index = numbers.index(baseline) if baseline in numbers else None
+    rows = [_row('Batch', 'Recipe', [batch.recipe for batch in batches], baseline_index)]
+
+    for stage, attr, model in STAGES:
+        records = [getattr(batch, attr) for batch in batches]
+        for field in model._meta.concrete_fields:
+            if field.name in SKIP_FIELDS:
+                continue
+            values = [getattr(record, field.attname) if record else None for record in records]
+            rows.append(_row(stage, capfirst(field.verbose_name), values, baseline_index))
+
+    products = [
+        {product.product_name: product for product in batch.totals.products.all()} if batch.totals else {}
+        for batch in batches
+    ]
+    for name in sorted({name for by_name in products for name in by_name}):
+        for field_name in PRODUCT_FIELDS:
+            field = ProductRecord._meta.get_field(field_name)
+            values = [getattr(by_name.get(name), field_name, None) for by_name in products]
+            rows.append(_row(f'Product {name}', capfirst(field.verbose_name), values, baseline_index))
+    return rows
@@ -0,0 +1,166 @@
+"""CSV export of batches and their stage records."""
+import csv
+
+
+def write_batches_csv(fileobj, batches, host='', progress=None):
+    """Write the multi-batch CSV export for ``batches`` to ``fileobj``.
+
+    ``progress`` is called as ``progress(done, total)`` after each batch.
+    """
+    writer = csv.writer(fileobj)
+    
+    # Write header
+    writer.writerow(['Export Date:', host, 'Generated by Django Admin'])
+    writer.writerow([])
+    
+    # defer(None): the admin changelist leaves out notes, which the export needs
+    batches = batches.defer(None).order_by('batch_number').select_related(
+        'recipe', 'fermentation', 'wash', 'spirit_1', 'spirit_2', 'totals'
+    ).prefetch_related('totals__products')
+    total = len(batches)
+
+    for done, batch in enumerate(batches, start=1):
+        # Write batch header info
+        writer.writerow(['=' * 80])
+        writer.writerow([f'BATCH #{batch.batch_number}'])
+        writer.writerow(['=' * 80])
+        writer.writerow(['Recipe:', batch.recipe])
+        writer.writerow(['Notes:', batch.notes or ''])
+        writer.writerow(['Created:', batch.created_at.strftime('%Y-%m-%d %H:%M')])
+        writer.writerow(['Updated:', batch.updated_at.strftime('%Y-%m-%d %H:%M')])
+        writer.writerow([])
+        
+        # Export Fermentation
+        if batch.fermentation:
+            writer.writerow(['--- Fermentation ---'])
+            record = batch.fermentation
+            writer.writerow(['Field', 'Value'])
+            writer.writerow(['Description', record.description])
+            writer.writerow(['To', record.to_field or ''])
+            writer.writerow(['Volume (L)', record.volume_in_l or ''])
+            writer.writerow(['Start Date', record.start_date.strftime('%Y-%m-%d') if record.start_date else ''])
+            writer.writerow(['SG Start', record.sg_start or ''])
+            writer.writerow(['End Date', record.date.strftime('%Y-%m-%d') if record.date else ''])
+            writer.writerow(['SG End', record.sg_end or ''])
+            writer.writerow(['ABV (%)', record.abv or ''])
+            writer.writerow(['LAL', record.lal or ''])
+            writer.writerow(['Notes', record.notes or ''])
+            writer.writerow(['Created', record.created_at.strftime('%Y-%m-%d %H:%M')])
+            writer.writerow(['Updated', record.updated_at.strftime('%Y-%m-%d %H:%M')])
+            writer.writerow([])
+        
+        # Export Wash
+        if batch.wash:
+            writer.writerow(['--- Wash ---'])
+            record = batch.wash
+            writer.writerow(['Field', 'Value'])
+            writer.writerow(['Description', record.description])
+            writer.writerow(['Faints In (L)', record.faints_in_l or ''])
+            writer.writerow(['From', record.from_field or ''])
+            writer.writerow(['To', record.to_field or ''])
+            writer.writerow(['Volume (L)', record.volume_in_l or ''])
+            writer.writerow(['Start Date', record.start_date.strftime('%Y-%m-%d') if record.start_date else ''])
+            writer.writerow(['End Date', record.date.strftime('%Y-%m-%d') if record.date else ''])
+            writer.writerow(['Fores Out (L)', record.fores_out or ''])
+            writer.writerow(['Heads Out (L)', record.heads_out or ''])
+            writer.writerow(['Hearts Out (L)', record.hearts_out or ''])
+            writer.writerow(['Hearts Out Location', record.hearts_out_location or ''])
+            writer.writerow(['Tails Out (L)', record.tails_out or ''])
+            writer.writerow(['Faints Out Location', record.faints_out_location or ''])
+            writer.writerow(['Waste Out (L)', record.waste_out or ''])
+            writer.writerow(['ABV (Hearts) %', record.abv_hearts or ''])
+            writer.writerow(['LAL', record.lal or ''])
+            writer.writerow(['Notes', record.notes or ''])
+            writer.writerow(['Created', record.created_at.strftime('%Y-%m-%d %H:%M')])
+            writer.writerow(['Updated', record.updated_at.strftime('%Y-%m-%d %H:%M')])
+            writer.writerow([])
+        
+        # Export Spirit 1
+        if batch.spirit_1:
+            writer.writerow(['--- Spirit 1 ---'])
+            record = batch.spirit_1
+            writer.writerow(['Field', 'Value'])
+            writer.writerow(['Description', record.description])
+            writer.writerow(['Faints In (L)', record.faints_in_l or ''])
+            writer.writerow(['From', record.from_field or ''])
+            writer.writerow(['To', record.to_field or ''])
+            writer.writerow(['Volume (L)', record.volume_in_l or ''])
+            writer.writerow(['Start Date', record.start_date.strftime('%Y-%m-%d') if record.start_date else ''])
+            writer.writerow(['End Date', record.date.strftime('%Y-%m-%d') if record.date else ''])
+            writer.writerow(['Fores Out (L)', record.fores_out or ''])
+            writer.writerow(['Heads Out (L)', record.heads_out or ''])
+            writer.writerow(['Hearts Out (L)', record.hearts_out or ''])
+            writer.writerow(['ABV (Hearts) %', record.abv_hearts or ''])
+            writer.writerow(['Hearts Out Location', record.hearts_out_location or ''])
+            writer.writerow(['Tails Out (L)', record.tails_out or ''])
+            writer.writerow(['Waste Out (L)', record.waste_out or ''])
+            writer.writerow(['LAL', record.lal or ''])
+            writer.writerow(['Notes', record.notes or ''])
+            writer.writerow(['Created', record.created_at.strftime('%Y-%m-%d %H:%M')])
+            writer.writerow(['Updated', record.updated_at.strftime('%Y-%m-%d %H:%M')])
+            writer.writerow([])
+        
+        # Export Spirit 2
+        if batch.spirit_2:
+            writer.writerow(['--- Spirit 2 ---'])
+            record = batch.spirit_2
+            writer.writerow(['Field', 'Value'])
+            writer.writerow(['Description', record.description])
+            writer.writerow(['Faints In (L)', record.faints_in_l or ''])
+            writer.writerow(['From', record.from_field or ''])
+            writer.writerow(['To', record.to_field or ''])
+            writer.writerow(['Volume (L)', record.volume_in_l or ''])
+            writer.writerow(['Start Date', record.start_date.strftime('%Y-%m-%d') if record.start_date else ''])
+            writer.writerow(['End Date', record.date.strftime('%Y-%m-%d') if record.date else ''])
+            writer.writerow(['Fores Out (L)', record.fores_out or ''])
+            writer.writerow(['Heads Out (L)', record.heads_out or ''])
+            writer.writerow(['Hearts Out (L)', record.hearts_out or ''])
+            writer.writerow(['ABV (Hearts) %', record.abv_hearts or ''])
+            writer.writerow(['Hearts Out Location', record.hearts_out_location or ''])
+            writer.writerow(['Tails Out (L)', record.tails_out or ''])
+            writer.writerow(['Waste Out (L)', record.waste_out or ''])
+            writer.writerow(['LAL', record.lal or ''])
+            writer.writerow(['Notes', record.notes or ''])
+            writer.writerow(['Created', record.created_at.strftime('%Y-%m-%d %H:%M')])
+            writer.writerow(['Updated', record.updated_at.strftime('%Y-%m-%d %H:%M')])
+            writer.writerow([])
+        
+        # Export Totals
+        if batch.totals:
+            writer.writerow(['--- Totals ---'])
+            record = batch.totals
+            writer.writerow(['Field', 'Value'])
+            writer.writerow(['Description', record.description])
+            writer.writerow(['Hearts to Storage Location', record.hearts_to_storage_location or ''])
+            writer.writerow(['Hearts ABV (%)', record.hearts_abv or ''])
+            writer.writerow(['Hearts to Storage (L)', record.hearts_to_storage_l or ''])
+            writer.writerow(['Faints to Storage Location', record.faints_to_storage_location or ''])
+            writer.writerow(['Faints to Storage (L)', record.faints_to_storage_l or ''])
+            writer.writerow(['Faints ABV (%)', record.faints_abv or ''])
+            writer.writerow(['Notes', record.notes or ''])
+            writer.writerow(['Created', record.created_at.strftime('%Y-%m-%d %H:%M')])
+            writer.writerow(['Updated', record.updated_at.strftime('%Y-%m-%d %H:%M')])
+            
+            # Add products if any
+            products = record.products.all()
+            if products:
+                writer.writerow([])
+                writer.writerow(['Products:'])
+                writer.writerow(['Product', 'Final ABV (%)', 'Final L', 'Location', 'LAL', 'Notes', 'Created', 'Updated'])
+                for product in products:
+                    writer.writerow([
+                        product.product_name,
+                        product.final_abv or '',
+                        product.final_l or '',
+                        product.distillation_location or '',
+                        product.lal or '',
+                        product.notes or '',
+                        product.created_at.strftime('%Y-%m-%d %H:%M'),
+                        product.updated_at.strftime('%Y-%m-%d %H:%M')
+                    ])
+            writer.writerow([])
+        
+        writer.writerow([])  # Extra spacing between batches
+
+        if progress is not None:
+            progress(done, total)
@@ -162,3 +162,16 @@ class ProductRecordForm(forms.ModelForm):
             'distillation_location': forms.TextInput(attrs={'placeholder': 'e.g., Tank 1'}),
             'lal': forms.NumberInput(attrs={'step': '0.01', 'placeholder': 'e.g., 40.00'}),
         }
+
+
+# Log page section -> (Batch field holding its record, form, default description)
+SECTION_MAP = {
+    'Fermentation': ('fermentation', FermentationRecordForm, 'Fermentation'),
+    'Wash': ('wash', WashRecordForm, 'Wash Run'),
+    'Spirit 1': ('spirit_1', DistillationRecordForm, 'Spirit Run 1'),
+    'Spirit 2': ('spirit_2', DistillationRecordForm, 'Spirit Run 2'),
+    'Totals': ('totals', TotalsRecordForm, 'Totals'),
+}
+
+# Record type (the Batch field name, as used in edit URLs) -> form
+RECORD_FORMS = {field: form for field, form, _ in SECTION_MAP.values()}
@@ -0,0 +1,130 @@
+"""Database-backed background jobs.
+
+Jobs are rows in the ``Job`` table. ``enqueue()`` adds one, and the
+``run_jobs`` management command claims queued jobs and runs the registered
+handler for each job's ``kind`` in a thread pool. Handlers receive the job and
+a ``progress(done, total)`` callback, and return the name of the file they
+wrote to ``JOBS_OUTPUT_DIR`` (or ``None``).
+
+A worker keeps a heartbeat on the jobs it runs. A running job whose heartbeat
+is older than ``JOBS_LEASE_SECONDS`` belonged to a worker that died, and
+``requeue_interrupted()`` puts it back in the queue; jobs of live workers,
+including other workers', are left alone.
+"""
+import time
+import traceback
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .exports import write_batches_csv
+from .models import Batch, Job
+from .replica import complete_on_replica, replica_reads
+
+
+HANDLERS = {}
+
+# Seconds between progress writes, so big jobs don't hammer the database
+PROGRESS_INTERVAL = 0.5
+
+
+def register(kind):
+    """Decorator registering a handler function for jobs of ``kind``."""
+    def decorator(func):
+        HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def enqueue(kind, **params):
+    """Queue a job of ``kind`` and return it."""
+    if kind not in HANDLERS:
+        raise ValueError(f'Unknown job kind: {kind}')
+    return Job.objects.create(kind=kind, params=params)
+
+
+def output_dir():
+    path = Path(settings.JOBS_OUTPUT_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def claim_next():
+    """Atomically mark the oldest queued job as running and return it, or None."""
+    while True:
+        job_id = (
+            Job.objects.filter(status=Job.Status.QUEUED)
+            .order_by('created_at', 'pk')
+            .values_list('pk', flat=True)
+            .first()
+        )
+        if job_id is None:
+            return None
+        # Another worker may have claimed it between the SELECT and the UPDATE.
+        now = timezone.now()
+        claimed = Job.objects.filter(pk=job_id, status=Job.Status.QUEUED).update(
+            status=Job.Status.RUNNING, started_at=now, heartbeat_at=now
+        )
+        if claimed:
+            return Job.objects.get(pk=job_id)
+
+
+def heartbeat(job_ids):
+    """Record that the worker running ``job_ids`` is still alive."""
+    return Job.objects.filter(pk__in=job_ids, status=Job.Status.RUNNING).update(heartbeat_at=timezone.now())
+
+
+def requeue_interrupted():
+    """Put running jobs whose worker stopped sending heartbeats back in the queue."""
+    expired = timezone.now() - timedelta(seconds=settings.JOBS_LEASE_SECONDS)
+    return Job.objects.filter(status=Job.Status.RUNNING).filter(
+        Q(heartbeat_at__lt=expired) | Q(heartbeat_at__isnull=True)
+    ).update(status=Job.Status.QUEUED, started_at=None, heartbeat_at=None, progress=0)
+
+
+def run_job(job):
+    """Execute a claimed job and persist its outcome."""
+    last_write = 0.0
+
+    def progress(done, total):
+        nonlocal last_write
+        now = time.monotonic()
+        if done < total and now - last_write < PROGRESS_INTERVAL:
+            return
+        last_write = now
+        Job.objects.filter(pk=job.pk).update(progress=done, total=total, heartbeat_at=timezone.now())
+
+    started = time.monotonic()
+    try:
+        result_file = HANDLERS[job.kind](job, progress)
+    except Exception:
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.Status.FAILED,
+            error=traceback.format_exc(),
+            finished_at=timezone.now(),
+            duration=time.monotonic() - started,
+        )
+    else:
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.Status.DONE,
+            result_file=result_file or '',
+            finished_at=timezone.now(),
+            duration=time.monotonic() - started,
+        )
+    job.refresh_from_db()
+    return job
+
+
+@register('export_batches_csv')
+def export_batches_csv(job, progress):
+    """Multi-batch CSV export queued from the Batch admin."""
+    name = f'job-{job.pk}-batches_export.csv'
+    batch_ids = job.params['batch_ids']
+    with replica_reads():
+        batches = complete_on_replica(Batch.objects.filter(pk__in=batch_ids), len(set(batch_ids)))
+        with open(output_dir() / name, 'w', newline='') as fileobj:
+            write_batches_csv(fileobj, batches, job.params.get('host', ''), progress=progress)
+    return name
@@ -0,0 +1,107 @@
+"""Faints lineage across batches.
+
+``FaintsTransfer`` rows form a graph of batches: an edge for every time faints
+from one batch were recharged into another. ``ancestry()`` and
+``descendants()`` walk it with a single recursive CTE, stepping through the
+``(target, source)`` / ``(source, target)`` indexes, however deep the chain.
+``provenance_tree()`` turns an ancestry into a nested tree for display.
+"""
+from collections import defaultdict
+
+from django.db import connections, router
+
+from .models import Batch, FaintsTransfer
+
+
+# Guards against cycles (which only data-entry mistakes can create)
+MAX_DEPTH = 50
+
+LINEAGE_SQL = """
+WITH RECURSIVE lineage(id, depth) AS (
+    SELECT id, 1 FROM {transfer} WHERE {near} = %s
+    UNION
+    SELECT step.id, lineage.depth + 1
+    FROM lineage
+    JOIN {transfer} previous ON previous.id = lineage.id
+    JOIN {transfer} step ON step.{near} = previous.{far}
+    WHERE lineage.depth < %s
+)
+SELECT transfer.*, found.depth, source.batch_number AS source_number, target.batch_number AS target_number
+FROM (SELECT id, MIN(depth) AS depth FROM lineage GROUP BY id) found
+JOIN {transfer} transfer ON transfer.id = found.id
+LEFT JOIN {batch} source ON source.id = transfer.source_id
+LEFT JOIN {batch} target ON target.id = transfer.target_id
+ORDER BY found.depth, transfer.id
+"""
+
+
+def _lineage(batch_pk, near, far, max_depth):
+    db = router.db_for_read(FaintsTransfer)
+    quote = connections[db or 'default'].ops.quote_name
+    sql = LINEAGE_SQL.format(
+        transfer=quote(FaintsTransfer._meta.db_table),
+        batch=quote(Batch._meta.db_table),
+        near=quote(near),
+        far=quote(far),
+    )
+    transfers = list(FaintsTransfer.objects.raw(sql, [batch_pk, max_depth]))
+    _label_archived(transfers)
+    return transfers
+
+
+def _label_archived(transfers):
+    """Fill in batch numbers for ends that have been archived (one query, only if needed)."""
+    from .archive import ARCHIVE_DB
+
+    missing = {
+        pk for transfer in transfers
+        for pk, number in ((transfer.source_id, transfer.source_number), (transfer.target_id, transfer.target_number))
+        if number is None
+    }
+    if not missing:
+        return
+    numbers = dict(Batch.objects.using(ARCHIVE_DB).filter(pk__in=missing).values_list('pk', 'batch_number'))
+    for transfer in transfers:
+        transfer.source_number = transfer.source_number or numbers.get(transfer.source_id)
+        transfer.target_number = transfer.target_number or numbers.get(transfer.target_id)
+
+
+def ancestry(batch_pk, max_depth=MAX_DEPTH):
+    """Every transfer that fed faints into ``batch_pk``, directly or through earlier batches.
+
+    Each transfer has ``depth`` (1 for the batch's own inputs) and
+    ``source_number`` / ``target_number``.
+    """
+    return _lineage(batch_pk, 'target_id', 'source_id', max_depth)
+
+
+def descendants(batch_pk, max_depth=MAX_DEPTH):
+    """Every transfer that carried faints of ``batch_pk`` onwards, directly or through later batches."""
+    return _lineage(batch_pk, 'source_id', 'target_id', max_depth)
+
+
+def provenance_tree(batch_pk, transfers):
+    """Nest ``ancestry(batch_pk)`` as ``{'transfer', 'batch_number', 'repeat', 'sources': [...]}`` nodes.
+
+    A batch reached by more than one path is expanded the first time only;
+    later nodes for it have ``repeat`` set.
+    """
+    by_target = defaultdict(list)
+    for transfer in transfers:
+        by_target[transfer.target_id].append(transfer)
+    expanded = set()
+
+    def sources(target_pk, path):
+        nodes = []
+        for transfer in by_target[target_pk]:
+            repeat = transfer.source_id in expanded or transfer.source_id in path
+            expanded.add(transfer.source_id)
+            nodes.append({
+                'transfer': transfer,
+                'batch_number': transfer.source_number,
+                'repeat': repeat,
+                'sources': [] if repeat else sources(transfer.source_id, path | {transfer.source_id}),
+            })
+        return nodes
+
+    return sources(batch_pk, {batch_pk})
@@ -0,0 +1,306 @@
+"""Concurrent load generator for ``manage.py loadtest``.
+
+Simulates operators saving record forms while a dashboard polls the log page
+and someone exports: each worker thread picks operations at random by weight
+and records the latency of every request. Requests go through Django's test
+client in-process, or over HTTP to a running server.
+
+SQLite reports lock contention as "database is locked" once its busy timeout
+runs out; such requests are retried with backoff and counted, which is what
+worker counts and database tuning should be sized against.
+"""
+import http.cookiejar
+import math
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+
+from django.db import OperationalError, connections
+from django.urls import reverse
+
+from .forms import WashRecordForm
+from .models import Batch, FermentationRecord, WashRecord, DistillationRecord, TotalsRecord, Recipe
+from .recipes import recipe_named
+from .sampledata import create_sample_batches
+
+
+# Recipe given to the batches a run creates, so they can be removed afterwards
+RECIPE = 'Load test'
+
+DEFAULT_MIX = {'log': 6, 'full_log': 1, 'export': 1, 'edit': 2, 'create': 1}
+
+# Seconds before the first retry of a locked request; doubles on each retry
+RETRY_DELAY = 0.05
+
+# SQLite's busy errors; the second comes from shared-cache (e.g. in-memory test) databases
+LOCKED = ('database is locked', 'database table is locked')
+
+
+class DatabaseLocked(Exception):
+    """A request failed because SQLite couldn't get its lock in time."""
+
+
+def parse_mix(text):
+    """Parse "log=6,edit=2" into {'log': 6, 'edit': 2}."""
+    mix = {}
+    for part in filter(None, (part.strip() for part in text.split(','))):
+        name, _, weight = part.partition('=')
+        if name not in OPERATIONS:
+            raise ValueError(f'Unknown operation "{name}"; choose from {", ".join(OPERATIONS)}.')
+        try:
+            mix[name] = int(weight or 1)
+        except ValueError:
+            raise ValueError(f'Weight for "{name}" must be a whole number.')
+    if not any(mix.values()):
+        raise ValueError('The mix needs at least one operation with a positive weight.')
+    return mix
+
+
+def _form_data(form):
+    data = {}
+    for name in form.fields:
+        value = form[name].value()
+        data[name] = '' if value is None else str(value)
+    return data
+
+
+def prepare_targets(count):
+    """Create ``count`` batches for the run; returns plain dicts the workers (and other processes) can use."""
+    targets = []
+    recipe = recipe_named(RECIPE)
+    for batch in create_sample_batches(count):
+        batch.recipe = recipe
+        batch.save(update_fields=['recipe'])
+        targets.append({
+            'number': batch.batch_number,
+            'wash_id': batch.wash_id,
+            'wash_form': _form_data(WashRecordForm(instance=batch.wash)),
+        })
+    return targets
+
+
+def record_high_water():
+    """Highest primary key of each stage record model, to find records a run created."""
+    return {
+        model: model.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        for model in (FermentationRecord, WashRecord, DistillationRecord, TotalsRecord)
+    }
+
+
+def clean_up(high_water):
+    """Delete the run's batches, their records, and records it created that no batch links to any more."""
+    batches = Batch.objects.filter(recipe__name=RECIPE)
+    linked = {
+        model: set(batches.values_list(field, flat=True)) - {None}
+        for model, field in [
+            (FermentationRecord, 'fermentation_id'), (WashRecord, 'wash_id'), (DistillationRecord, 'spirit_1_id'),
+            (TotalsRecord, 'totals_id'),
+        ]
+    }
+    linked[DistillationRecord] |= set(batches.values_list('spirit_2_id', flat=True)) - {None}
+    removed = batches.delete()[0]
+    for model, pks in linked.items():
+        removed += model.objects.filter(pk__in=pks).delete()[0]
+        # Replaced by a "create" during the run
+        orphans = model.objects.filter(pk__gt=high_water[model])
+        for field in Batch._meta.concrete_fields:
+            if field.is_relation and field.related_model is model:
+                orphans = orphans.filter(**{f'{field.remote_field.related_name}__isnull': True})
+        removed += orphans.delete()[0]
+    removed += Recipe.objects.filter(name=RECIPE, batches__isnull=True).delete()[0]
+    return removed
+
+
+# Each operation returns (method, path, POST data or None)
+def _log(target, rng):
+    return 'GET', reverse('log', args=[target['number']]), None
+
+
+def _full_log(target, rng):
+    return 'GET', reverse('full_log'), None
+
+
+def _export(target, rng):
+    return 'GET', reverse('export_batch_csv', args=[target['number']]), None
+
+
+def _edit(target, rng):
+    data = dict(target['wash_form'], notes=f'Load test edit {rng.random():.6f}')
+    return 'POST', reverse('edit_record', args=[target['number'], 'wash', target['wash_id']]), data
+
+
+def _create(target, rng):
+    data = {'description': 'Totals', 'notes': 'Load test'}
+    return 'POST', reverse('create_record', args=[target['number'], 'Totals', 0]), data
+
+
+OPERATIONS = {
+    'log': _log,
+    'full_log': _full_log,
+    'export': _export,
+    'edit': _edit,
+    'create': _create,
+}
+
+
+class InProcessSession:
+    """Requests through Django's test client, in this process."""
+
+    def __init__(self):
+        from django.test import Client
+
+        self.client = Client()
+
+    def request(self, method, path, data):
+        try:
+            if method == 'POST':
+                response = self.client.post(path, data)
+            else:
+                response = self.client.get(path)
+            body = b''.join(response.streaming_content) if response.streaming else response.content
+        except OperationalError as exc:
+            if any(message in str(exc) for message in LOCKED):
+                raise DatabaseLocked(str(exc))
+            raise
+        return response.status_code, body
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpSession:
+    """Requests over HTTP to a running server, keeping cookies (and the CSRF token) per worker.
+
+    Lock errors are only recognisable when the server runs with DEBUG on;
+    otherwise they count as failed requests.
+    """
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirect)
+
+    def _csrf_token(self):
+        return next((cookie.value for cookie in self.cookies if cookie.name == 'csrftoken'), None)
+
+    def _send(self, method, path, data):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        request = urllib.request.Request(self.base_url + path, data=body, method=method)
+        try:
+            with self.opener.open(request) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as exc:
+            return exc.code, exc.read()
+
+    def request(self, method, path, data):
+        if method == 'POST':
+            if self._csrf_token() is None:
+                # The form page sets the CSRF cookie
+                self._send('GET', path, None)
+            data = dict(data, csrfmiddlewaretoken=self._csrf_token() or '')
+        status, body = self._send(method, path, data)
+        if status >= 500 and any(message.encode() in body for message in LOCKED):
+            raise DatabaseLocked(LOCKED[0])
+        return status, body
+
+
+def _thread(config, seed, samples, lock):
+    rng = random.Random(seed)
+    session = HttpSession(config['url']) if config['url'] else InProcessSession()
+    names = list(config['mix'])
+    weights = [config['mix'][name] for name in names]
+    deadline = time.monotonic() + config['duration'] if config['duration'] else None
+    done = 0
+    results = []
+    try:
+        while (deadline is None and done < config['requests']) or (deadline is not None and time.monotonic() < deadline):
+            name = rng.choices(names, weights)[0]
+            method, path, data = OPERATIONS[name](rng.choice(config['targets']), rng)
+            retries = 0
+            started = time.perf_counter()
+            while True:
+                try:
+                    status, _ = session.request(method, path, data)
+                except DatabaseLocked:
+                    if retries >= config['retries']:
+                        status = None
+                        break
+                    time.sleep(RETRY_DELAY * 2 ** retries)
+                    retries += 1
+                else:
+                    break
+            ok = status is not None and status < 400
+            results.append((name, time.perf_counter() - started, ok, retries))
+            done += 1
+    finally:
+        connections.close_all()
+    with lock:
+        samples.extend(results)
+
+
+def run_workers(config, offset=0):
+    """Run ``config['threads']`` worker threads; returns ``[(operation, seconds, ok, lock_retries)]``."""
+    samples = []
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(target=_thread, args=(config, config['seed'] + offset + index, samples, lock))
+        for index in range(config['threads'])
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples
+
+
+def _start_process():
+    import django
+
+    django.setup()
+
+
+def run(config):
+    """Run the load test; returns ``(samples, wall seconds)``."""
+    started = time.perf_counter()
+    if config['processes'] > 1:
+        # Forked workers must open their own connections
+        connections.close_all()
+        with ProcessPoolExecutor(config['processes'], initializer=_start_process) as pool:
+            offsets = [index * config['threads'] for index in range(config['processes'])]
+            samples = [sample for result in pool.map(run_workers, [config] * len(offsets), offsets) for sample in result]
+    else:
+        samples = run_workers(config)
+    return samples, time.perf_counter() - started
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of sorted ``values``."""
+    if not values:
+        return None
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+def summarize(samples, seconds):
+    """Per-operation and overall latency percentiles (ms), throughput and lock retries."""
+    rows = []
+    for name in [*sorted({sample[0] for sample in samples}), None]:
+        chosen = [sample for sample in samples if name is None or sample[0] == name]
+        latencies = sorted(sample[1] * 1000 for sample in chosen)
+        rows.append({
+            'operation': name or 'total',
+            'requests': len(chosen),
+            'failed': sum(1 for sample in chosen if not sample[2]),
+            'lock_retries': sum(sample[3] for sample in chosen),
+            'p50': percentile(latencies, 0.50),
+            'p95': percentile(latencies, 0.95),
+            'p99': percentile(latencies, 0.99),
+            'max': latencies[-1] if latencies else None,
+            'throughput': len(chosen) / seconds if seconds else 0,
+        })
+    return rows
@@ -0,0 +1,27 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from distillery.archive import archive_batches, archive_cutoff
+
+
+class Command(BaseCommand):
+    help = "Move batches untouched for ARCHIVE_AFTER_DAYS (with their records and products) to the archive database."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.ARCHIVE_AFTER_DAYS, help='Archive batches untouched for this many days')
+        parser.add_argument('--chunk-size', type=int, default=200, help='Batches moved per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='List the batches that would be archived')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        numbers = archive_batches(
+            archive_cutoff(options['days']),
+            chunk_size=options['chunk_size'],
+            dry_run=options['dry_run'],
+        )
+        verb = 'Would archive' if options['dry_run'] else 'Archived'
+        self.stdout.write(f'{verb} {len(numbers)} batch(es) in {time.monotonic() - started:.2f}s')
+        if numbers and options['verbosity'] > 1:
+            self.stdout.write(', '.join(f'#{number}' for number in numbers))
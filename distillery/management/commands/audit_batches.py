@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from distillery.audit import RULES_BY_CODE, run_audit
+
+
+class Command(BaseCommand):
+    help = "Check batches' mass balance and LAL against the audit rules (only batches changed since the last run, unless --full)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Re-check every batch')
+        parser.add_argument('--tolerance', action='append', default=[], metavar='RULE=PERCENT', help='Override a rule\'s tolerance for this run')
+
+    def handle(self, *args, **options):
+        tolerances = {}
+        for item in options['tolerance']:
+            code, _, percent = item.partition('=')
+            if code not in RULES_BY_CODE:
+                raise CommandError(f'Unknown rule "{code}". Rules: {", ".join(RULES_BY_CODE)}')
+            try:
+                tolerances[code] = float(percent)
+            except ValueError:
+                raise CommandError(f'"{item}" is not RULE=PERCENT.')
+
+        run = run_audit(full=options['full'], tolerances=tolerances)
+        self.stdout.write(f"Checked {run.batches_checked} batch(es) ({'incremental' if run.incremental else 'full'}): {run.findings} finding(s)")
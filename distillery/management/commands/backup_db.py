@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from distillery.backups import PAGES_PER_STEP, STEP_SLEEP, BackupError, backup_database
+
+
+class Command(BaseCommand):
+    help = "Back up a SQLite database online, verify and gzip the copy, and rotate old backups."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='Database alias to back up (default, archive)')
+        parser.add_argument('--pages', type=int, default=PAGES_PER_STEP, help='Pages copied per step')
+        parser.add_argument('--sleep', type=float, default=STEP_SLEEP, help='Seconds to pause between steps so writers can get in')
+        parser.add_argument('--keep', type=int, default=settings.BACKUP_KEEP, help='Number of backups of this database to keep')
+
+    def handle(self, *args, **options):
+        try:
+            result = backup_database(
+                options['database'],
+                pages=options['pages'],
+                sleep=options['sleep'],
+                keep=options['keep'],
+            )
+        except BackupError as exc:
+            raise CommandError(str(exc))
+
+        rate = result['pages'] / result['copy_seconds'] if result['copy_seconds'] else 0
+        self.stdout.write(
+            f"Backed up {result['pages']} pages to {result['path']} "
+            f"({result['size'] / 1024:.0f} KB) in {result['seconds']:.2f}s "
+            f"(copy {result['copy_seconds']:.2f}s, {rate:,.0f} pages/s)"
+        )
+        for path in result['removed']:
+            self.stdout.write(f'Removed old backup {path.name}')
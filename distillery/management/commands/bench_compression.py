@@ -0,0 +1,63 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from distillery.models import Batch
+from distillery.sampledata import create_sample_batches
+
+
+class Command(BaseCommand):
+    help = "Measure bytes on the wire and server CPU per request for log, full_log and export_batch_csv, with and without gzip."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batches', type=int, default=200, help='Sample batches to create for the run (rolled back afterwards). 0 uses the existing data.')
+        parser.add_argument('--repeat', type=int, default=20, help='Requests per URL and encoding')
+        parser.add_argument('--level', type=int, help='Override COMPRESSION_LEVEL for this run')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['batches']:
+                create_sample_batches(options['batches'], seed=1)
+            batch = Batch.objects.order_by('-batch_number').first()
+            if batch is None:
+                self.stderr.write('No batches to benchmark; pass --batches N to create sample data.')
+                return
+            overrides = {}
+            if options['level'] is not None:
+                overrides['COMPRESSION_LEVEL'] = options['level']
+            with override_settings(**overrides):
+                self.run_benchmark(batch, options['repeat'])
+            transaction.set_rollback(True)
+
+    def run_benchmark(self, batch, repeat):
+        urls = [
+            ('log', reverse('log', args=[batch.batch_number])),
+            ('full_log', reverse('full_log')),
+            ('export_batch_csv', reverse('export_batch_csv', args=[batch.batch_number])),
+        ]
+        client = Client()
+        self.stdout.write(f"{'view':<18}{'plain B':>10}{'gzip B':>10}{'ratio':>8}{'plain ms':>10}{'gzip ms':>10}{'+cpu ms':>9}")
+        for name, url in urls:
+            client.get(url)  # warm up caches and template loading
+            plain_bytes, plain_cpu = self.measure(client, url, repeat, 'identity')
+            gzip_bytes, gzip_cpu = self.measure(client, url, repeat, 'gzip')
+            ratio = gzip_bytes / plain_bytes if plain_bytes else 0
+            self.stdout.write(
+                f'{name:<18}{plain_bytes:>10}{gzip_bytes:>10}{ratio:>8.2f}'
+                f'{plain_cpu:>10.2f}{gzip_cpu:>10.2f}{gzip_cpu - plain_cpu:>9.2f}'
+            )
+
+    def measure(self, client, url, repeat, encoding):
+        """Return (response bytes, mean CPU milliseconds per request)."""
+        size = 0
+        cpu = 0.0
+        for _ in range(repeat):
+            start = time.process_time()
+            response = client.get(url, HTTP_ACCEPT_ENCODING=encoding)
+            body = b''.join(response.streaming_content) if response.streaming else response.content
+            cpu += time.process_time() - start
+            size = len(body)
+        return size, cpu / repeat * 1000
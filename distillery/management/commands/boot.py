@@ -0,0 +1,59 @@
+import os
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from distillery.bootstrap import ensure_admin, unapplied_migrations
+
+
+# Databases boot keeps migrated; the replica is a copy of default and is never migrated
+DATABASES = ('default', 'archive')
+
+
+class Command(BaseCommand):
+    help = (
+        "Start the container in one process: migrate only if there are unapplied migrations, "
+        "create the admin user if missing, then run the server. Reports how long each step took."
+    )
+    # Checks run once, in runserver
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('addrport', nargs='?', default='0.0.0.0:8000', help='Address and port for runserver')
+        parser.add_argument('--noreload', action='store_true', help='Run the server without the autoreloader')
+        parser.add_argument('--no-serve', action='store_true', help='Stop after migrations and the admin user')
+
+    def handle(self, *args, **options):
+        # The autoreloader re-runs this command in a child process; the parent has done the setup
+        if os.environ.get('RUN_MAIN') != 'true':
+            self.prepare()
+        if not options['no_serve']:
+            call_command('runserver', options['addrport'], use_reloader=not options['noreload'])
+
+    def step(self, label, started):
+        self.stdout.write(f'{label} in {time.perf_counter() - started:.2f}s')
+
+    def prepare(self):
+        # CPU time so far is interpreter start-up plus Django setup
+        self.stdout.write(f'Django loaded in {time.process_time():.2f}s (CPU)')
+        for database in DATABASES:
+            started = time.perf_counter()
+            pending = unapplied_migrations(database)
+            if pending:
+                call_command('migrate', database=database, interactive=False, verbosity=1)
+                self.step(f'Applied {len(pending)} migration(s) to {database}', started)
+            else:
+                self.step(f'No unapplied migrations for {database}, checked', started)
+
+        started = time.perf_counter()
+        username = 'admin'
+        created = ensure_admin(username, os.environ.get('DJANGO_ADMIN_PASSWORD', 'admin'))
+        self.step(f"Superuser '{username}' {'created' if created else 'already exists'}", started)
+
+        # Set by entrypoint.sh before Python starts
+        boot_started = os.environ.get('BOOT_STARTED')
+        if boot_started:
+            self.stdout.write(self.style.SUCCESS(
+                f'Starting server {time.time() - float(boot_started):.2f}s after container start'
+            ))
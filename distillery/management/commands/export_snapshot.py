@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from distillery.models import Batch
+from distillery.search import SearchError, batch_filter
+from distillery.snapshots import SnapshotError, write_snapshot
+
+
+class Command(BaseCommand):
+    help = "Write batches, their stage records and products to a gzipped SQLite database for analysis."
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='File to write, e.g. batches.sqlite3.gz')
+        parser.add_argument('--query', default='', help='Batches to export, in the search box syntax (e.g. "#100-500 recipe:rye"); all by default')
+        parser.add_argument('--database', default='default', help='Database alias to export from (default, archive)')
+
+    def handle(self, *args, **options):
+        batches = Batch.objects.all()
+        if options['query']:
+            try:
+                batches = batches.filter(batch_filter(options['query']))
+            except SearchError as exc:
+                raise CommandError(str(exc))
+
+        started = time.monotonic()
+        try:
+            with open(options['output'], 'wb') as fileobj:
+                counts = write_snapshot(batches, fileobj, using=options['database'])
+        except SnapshotError as exc:
+            raise CommandError(str(exc))
+        rows = ', '.join(f'{count} {name}' for name, count in counts.items())
+        self.stdout.write(f"Wrote {options['output']} ({rows}) in {time.monotonic() - started:.2f}s")
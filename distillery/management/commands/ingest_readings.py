@@ -0,0 +1,33 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from distillery.models import FermentationRecord
+from distillery.telemetry import TelemetryError, ingest_readings, parse_readings
+
+
+class Command(BaseCommand):
+    help = "Load hydrometer readings (CSV or JSON files) into a fermentation record and update its hourly rollups."
+
+    def add_arguments(self, parser):
+        parser.add_argument('record_id', type=int, help='FermentationRecord id')
+        parser.add_argument('files', nargs='+', help='CSV or JSON files of readings')
+
+    def handle(self, *args, **options):
+        try:
+            fermentation = FermentationRecord.objects.get(pk=options['record_id'])
+        except FermentationRecord.DoesNotExist:
+            raise CommandError(f"Fermentation record {options['record_id']} does not exist")
+
+        for name in options['files']:
+            path = Path(name)
+            content_type = 'application/json' if path.suffix.lower() == '.json' else 'text/csv'
+            try:
+                readings = parse_readings(path.read_bytes(), content_type)
+            except (OSError, TelemetryError, UnicodeDecodeError) as exc:
+                raise CommandError(f'{name}: {exc}')
+            result = ingest_readings(fermentation, readings)
+            self.stdout.write(
+                f"{name}: {result['stored']} stored, {result['duplicates']} duplicate(s), "
+                f"{result['too_old']} past retention, {result['hours']} hour(s) rolled up"
+            )
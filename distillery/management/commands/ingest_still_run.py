@@ -0,0 +1,43 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from distillery.stillruns import RECORD_TYPES, find_cuts, ingest_samples, parse_samples
+from distillery.telemetry import TelemetryError
+
+
+class Command(BaseCommand):
+    help = "Load still controller samples (CSV or JSON files) into the trace of a wash or distillation run."
+
+    def add_arguments(self, parser):
+        parser.add_argument('record_type', choices=sorted(RECORD_TYPES), help='Kind of run')
+        parser.add_argument('record_id', type=int, help='WashRecord or DistillationRecord id')
+        parser.add_argument('files', nargs='+', help='CSV or JSON files of samples')
+
+    def handle(self, *args, **options):
+        model = RECORD_TYPES[options['record_type']]
+        try:
+            record = model.objects.get(pk=options['record_id'])
+        except model.DoesNotExist:
+            raise CommandError(f"{model._meta.verbose_name} {options['record_id']} does not exist")
+
+        trace = None
+        for name in options['files']:
+            path = Path(name)
+            content_type = 'application/json' if path.suffix.lower() == '.json' else 'text/csv'
+            try:
+                samples = parse_samples(path.read_bytes(), content_type)
+            except (OSError, TelemetryError, UnicodeDecodeError) as exc:
+                raise CommandError(f'{name}: {exc}')
+            trace = ingest_samples(record, samples) or trace
+            self.stdout.write(f"{name}: {len(samples)} sample(s) read")
+
+        if trace is None:
+            self.stdout.write('No samples stored.')
+            return
+        self.stdout.write(f'Trace now has {trace.samples} sample(s).')
+        for cut in find_cuts(trace, record):
+            self.stdout.write(
+                f"  {cut['cut']}: {cut['seconds'] / 60:.1f} min, {cut['volume']} L, "
+                f"{'-' if cut['abv'] is None else cut['abv']}% ABV"
+            )
@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from distillery.loadtest import DEFAULT_MIX, OPERATIONS, clean_up, parse_mix, prepare_targets, record_high_water, run, summarize
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the app with concurrent operators (log polling, exports, record edits and creates) "
+        "and report latency percentiles, throughput and SQLite lock retries. Works on sample batches "
+        "it creates, and removes them afterwards."
+    )
+
+    def add_arguments(self, parser):
+        mix = ','.join(f'{name}={weight}' for name, weight in DEFAULT_MIX.items())
+        parser.add_argument('--mix', default=mix, help=f'Operation weights, from {", ".join(OPERATIONS)} (default {mix})')
+        parser.add_argument('--threads', type=int, default=4, help='Worker threads (per process)')
+        parser.add_argument('--processes', type=int, default=1, help='Worker processes')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds to run; 0 to use --requests instead')
+        parser.add_argument('--requests', type=int, default=100, help='Requests per thread when --duration is 0')
+        parser.add_argument('--batches', type=int, default=20, help='Sample batches to spread the load over')
+        parser.add_argument('--retries', type=int, default=5, help='Retries for a request that hits "database is locked"')
+        parser.add_argument('--url', default='', help='Base URL of a running server sharing this database (default: in-process)')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--keep', action='store_true', help="Don't delete the sample batches afterwards")
+
+    def handle(self, *args, **options):
+        try:
+            mix = parse_mix(options['mix'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        if options['threads'] < 1 or options['processes'] < 1 or options['batches'] < 1:
+            raise CommandError('--threads, --processes and --batches must be at least 1.')
+
+        high_water = record_high_water()
+        config = {
+            'mix': mix,
+            'threads': options['threads'],
+            'processes': options['processes'],
+            'duration': options['duration'],
+            'requests': options['requests'],
+            'retries': options['retries'],
+            'url': options['url'],
+            'seed': options['seed'],
+            'targets': prepare_targets(options['batches']),
+        }
+        workers = options['threads'] * options['processes']
+        self.stdout.write(
+            f"{workers} worker(s) {'against ' + options['url'] if options['url'] else 'in-process'}, "
+            f"mix {', '.join(f'{name}={weight}' for name, weight in mix.items())}"
+        )
+        try:
+            samples, seconds = run(config)
+        finally:
+            if not options['keep']:
+                removed = clean_up(high_water)
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'Removed {removed} sample row(s)')
+
+        self.stdout.write(
+            f"{'operation':<12}{'requests':>9}{'failed':>8}{'locked':>8}"
+            f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}{'req/s':>8}"
+        )
+        for row in summarize(samples, seconds):
+            latencies = ''.join(
+                f'{row[key]:>9.1f}' if row[key] is not None else f"{'-':>9}" for key in ('p50', 'p95', 'p99', 'max')
+            )
+            self.stdout.write(
+                f"{row['operation']:<12}{row['requests']:>9}{row['failed']:>8}{row['lock_retries']:>8}"
+                f"{latencies}{row['throughput']:>8.1f}"
+            )
+        self.stdout.write(f'{len(samples)} request(s) in {seconds:.1f}s; "locked" counts database-is-locked retries.')
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from distillery.telemetry import prune_readings, retention_cutoff
+
+
+class Command(BaseCommand):
+    help = "Delete raw fermentation readings older than TELEMETRY_RAW_RETENTION_DAYS (hourly rollups are kept)."
+
+    def handle(self, *args, **options):
+        cutoff = retention_cutoff()
+        deleted = prune_readings(cutoff)
+        self.stdout.write(
+            f'Deleted {deleted} reading(s) taken before {cutoff:%Y-%m-%d %H:%M} UTC '
+            f'({settings.TELEMETRY_RAW_RETENTION_DAYS} day retention)'
+        )
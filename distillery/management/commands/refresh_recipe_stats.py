@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from distillery.models import Recipe
+from distillery.recipes import refresh_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute every recipe's cached statistics from the hot and archive databases."
+
+    def handle(self, *args, **options):
+        pks = list(Recipe.objects.values_list('pk', flat=True))
+        refresh_stats(pks, archived=True)
+        self.stdout.write(f'Refreshed statistics of {len(pks)} recipe(s)')
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from distillery.replica import refresh_replica
+
+
+class Command(BaseCommand):
+    help = "Copy the primary database into the read replica used by reports and exports."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0, help='Keep refreshing every N seconds instead of once')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            try:
+                pages = refresh_replica()
+            except (ValueError, OSError) as exc:
+                raise CommandError(str(exc))
+            if options['verbosity'] > 0:
+                self.stdout.write(f'Refreshed replica ({pages} pages) in {time.monotonic() - started:.2f}s')
+            if not options['interval']:
+                break
+            time.sleep(max(0.0, options['interval'] - (time.monotonic() - started)))
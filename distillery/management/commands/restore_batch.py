@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from distillery.archive import ArchiveError, restore_batch
+
+
+class Command(BaseCommand):
+    help = "Move archived batches back into the hot database."
+
+    def add_arguments(self, parser):
+        parser.add_argument('batch_numbers', nargs='+', type=int)
+
+    def handle(self, *args, **options):
+        for number in options['batch_numbers']:
+            try:
+                restored = restore_batch(number)
+            except ArchiveError as exc:
+                raise CommandError(str(exc))
+            if restored:
+                self.stdout.write(f'Restored batch #{number}')
+            else:
+                self.stderr.write(f'Batch #{number} is not in the archive')
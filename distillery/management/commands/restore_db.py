@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from distillery.backups import BackupError, list_backups, restore_database
+
+
+class Command(BaseCommand):
+    help = "Restore a SQLite database from a backup made by backup_db (the newest one by default)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', help='Backup file to restore')
+        parser.add_argument('--database', default='default', help='Database alias to restore into (default, archive)')
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive', help='Do not ask for confirmation')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        try:
+            path = options['path'] or next(iter(list_backups(using)), None)
+        except BackupError as exc:
+            raise CommandError(str(exc))
+        if path is None:
+            raise CommandError(f'No backups found for database "{using}".')
+
+        if options['interactive']:
+            answer = input(f'This replaces everything in database "{using}" with {path}. Type "yes" to continue: ')
+            if answer != 'yes':
+                raise CommandError('Restore cancelled.')
+
+        started = time.monotonic()
+        try:
+            pages = restore_database(path, using)
+        except BackupError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(f'Restored {pages} pages from {path} in {time.monotonic() - started:.2f}s')
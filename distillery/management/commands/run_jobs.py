@@ -0,0 +1,63 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from distillery.jobs import claim_next, heartbeat, requeue_interrupted, run_job
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (exports, reports) in a thread pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Jobs to run concurrently')
+        parser.add_argument('--poll', type=float, default=2.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Drain the queue and exit instead of polling forever')
+
+    def handle(self, *args, **options):
+        self.requeue()
+
+        workers = max(1, options['workers'])
+        # Heartbeats well inside the lease; a dead worker's jobs are picked up once it expires
+        beat_every = settings.JOBS_LEASE_SECONDS / 3
+        last_beat = last_requeue = time.monotonic()
+        running = {}
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job') as pool:
+            try:
+                while True:
+                    running = {future: job_id for future, job_id in running.items() if not future.done()}
+                    now = time.monotonic()
+                    if running and now - last_beat >= beat_every:
+                        heartbeat(running.values())
+                        last_beat = now
+                    job = claim_next() if len(running) < workers else None
+                    if job is not None:
+                        self.stdout.write(f'Starting {job}')
+                        running[pool.submit(self.run_one, job)] = job.pk
+                        continue
+                    if options['once'] and not running:
+                        break
+                    if now - last_requeue >= settings.JOBS_LEASE_SECONDS:
+                        self.requeue()
+                        last_requeue = now
+                    time.sleep(options['poll'] if not running else 0.2)
+            except KeyboardInterrupt:
+                self.stdout.write('Stopping; waiting for running jobs to finish.')
+        connection.close()
+
+    def requeue(self):
+        requeued = requeue_interrupted()
+        if requeued:
+            self.stdout.write(f'Requeued {requeued} interrupted job(s).')
+
+    def run_one(self, job):
+        close_old_connections()
+        try:
+            job = run_job(job)
+            duration = f'{job.duration:.1f}s' if job.duration is not None else '-'
+            self.stdout.write(f'Finished {job} in {duration}')
+        finally:
+            # Each pool thread has its own connection.
+            connection.close()
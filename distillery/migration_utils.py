@@ -0,0 +1,111 @@
+"""Helpers for data migrations on large tables.
+
+Looping over a table and saving rows one at a time holds SQLite's write lock
+for the whole migration. These helpers walk a queryset in primary-key chunks
+(keyset pagination, so each chunk is an index range scan), write each chunk
+with one ``bulk_update`` or ``UPDATE`` and commit it before moving on.
+
+The helpers are reused in two ways. Application code imports them (the
+telemetry pruning walks readings with ``pk_chunks``). Migrations copy the ones
+they need into the migration file, as 0016 and 0018 do, since a migration
+importing this module would change whenever it does; this module stays the
+tested original of those copies, and migration tests check that none import
+it. Put the chunked step in a migration of its own with ``atomic = False`` so
+the per-chunk commits are real, keep the schema changes around it in atomic
+migrations, and make the step idempotent so a re-run after an interrupted
+deploy picks up where it stopped::
+
+    def forwards(apps, schema_editor):
+        Wash = apps.get_model('distillery', 'WashRecord')
+        rows = Wash.objects.using(schema_editor.connection.alias).filter(abv__isnull=True)
+        update_in_chunks(rows, abv=0)
+"""
+import sys
+import time
+
+from django.db import transaction
+
+
+CHUNK_SIZE = 1000
+
+
+def pk_chunks(queryset, chunk_size=CHUNK_SIZE):
+    """Yield lists of primary keys from ``queryset`` in ascending order."""
+    pks = queryset.order_by('pk').values_list('pk', flat=True)
+    last = None
+    while True:
+        chunk = list((pks if last is None else pks.filter(pk__gt=last))[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last = chunk[-1]
+
+
+class Progress:
+    """Writes ``label: done/total`` lines to the migration output after each chunk."""
+
+    def __init__(self, label, total, stream=None):
+        self.label = label
+        self.total = total
+        self.done = 0
+        self.changed = 0
+        self.stream = stream or sys.stdout
+        self.started = time.monotonic()
+
+    def __call__(self, rows, changed):
+        self.done += rows
+        self.changed += changed
+        elapsed = time.monotonic() - self.started
+        rate = self.done / elapsed if elapsed else 0
+        self.stream.write(f'\n  {self.label}: {self.done}/{self.total} rows, {self.changed} changed ({rate:,.0f} rows/s)')
+        self.stream.flush()
+
+
+def _progress(queryset, label, progress, chunk_size):
+    if progress is not None:
+        return progress
+    total = queryset.count()
+    # Quiet for tables that fit in one chunk
+    if total <= chunk_size:
+        return None
+    return Progress(label or queryset.model._meta.db_table, total)
+
+
+def backfill(queryset, update, fields, chunk_size=CHUNK_SIZE, select_related=(), label=None, progress=None):
+    """Apply ``update`` to every row of ``queryset``, one committed chunk at a time.
+
+    ``update(obj)`` returns the instance to write (``obj`` itself or a related
+    object loaded with ``select_related``) or ``None`` to leave the row alone.
+    The returned instances must all be of one model; their ``fields`` are
+    written with ``bulk_update``. Returns the number of instances written.
+    """
+    using = queryset.db
+    progress = _progress(queryset, label, progress, chunk_size)
+    written = 0
+    for pks in pk_chunks(queryset, chunk_size):
+        with transaction.atomic(using=using):
+            rows = queryset.filter(pk__in=pks).select_related(*select_related)
+            changed = [obj for obj in map(update, rows) if obj is not None]
+            if changed:
+                type(changed[0])._base_manager.using(using).bulk_update(changed, fields)
+        written += len(changed)
+        if progress:
+            progress(len(pks), len(changed))
+    return written
+
+
+def update_in_chunks(queryset, chunk_size=CHUNK_SIZE, label=None, progress=None, **values):
+    """Run ``queryset.update(**values)`` one committed chunk of primary keys at a time.
+
+    Returns the number of rows updated.
+    """
+    using = queryset.db
+    progress = _progress(queryset, label, progress, chunk_size)
+    updated = 0
+    for pks in pk_chunks(queryset, chunk_size):
+        with transaction.atomic(using=using):
+            count = queryset.filter(pk__in=pks).update(**values)
+        updated += count
+        if progress:
+            progress(len(pks), count)
+    return updated
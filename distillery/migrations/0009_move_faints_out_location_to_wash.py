@@ -5,8 +5,9 @@ from django.db import migrations, models
 
 def copy_faints_out_location_to_wash(apps, schema_editor):
     Batch = apps.get_model('distillery', 'Batch')
+    db_alias = schema_editor.connection.alias
 
-    for batch in Batch.objects.select_related('wash', 'spirit_1', 'spirit_2'):
+    for batch in Batch.objects.using(db_alias).select_related('wash', 'spirit_1', 'spirit_2'):
         if not batch.wash or batch.wash.faints_out_location:
             continue
 
@@ -23,8 +24,9 @@ def copy_faints_out_location_to_wash(apps, schema_editor):
 
 def copy_faints_out_location_to_spirit(apps, schema_editor):
     Batch = apps.get_model('distillery', 'Batch')
+    db_alias = schema_editor.connection.alias
 
-    for batch in Batch.objects.select_related('wash', 'spirit_1'):
+    for batch in Batch.objects.using(db_alias).select_related('wash', 'spirit_1'):
         if not batch.wash or not batch.wash.faints_out_location or not batch.spirit_1:
             continue
 
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('distillery', '0009_move_faints_out_location_to_wash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(help_text='Registered job handler name', max_length=50)),
+                ('params', models.JSONField(blank=True, default=dict, help_text='Handler arguments')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('progress', models.PositiveIntegerField(default=0, help_text='Units of work completed')),
+                ('total', models.PositiveIntegerField(default=0, help_text='Units of work expected')),
+                ('result_file', models.CharField(blank=True, help_text='Output file name in JOBS_OUTPUT_DIR', max_length=255)),
+                ('error', models.TextField(blank=True, help_text='Traceback of the failure')),
+                ('duration', models.FloatField(blank=True, help_text='Run time in seconds', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Job',
+                'verbose_name_plural': 'Jobs',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='distillery__status_f4bb29_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('distillery', '0010_job'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='batch',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='distillationrecord',
+            name='date',
+            field=models.DateField(blank=True, db_index=True, help_text='End date', null=True, verbose_name='End Date'),
+        ),
+        migrations.AlterField(
+            model_name='fermentationrecord',
+            name='date',
+            field=models.DateField(blank=True, db_index=True, help_text='End date', null=True, verbose_name='End Date'),
+        ),
+        migrations.AlterField(
+            model_name='productrecord',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='productrecord',
+            name='product_name',
+            field=models.CharField(db_index=True, help_text='Product identifier (A, B, C, etc.)', max_length=50, verbose_name='Product'),
+        ),
+        migrations.AlterField(
+            model_name='totalsrecord',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='washrecord',
+            name='date',
+            field=models.DateField(blank=True, db_index=True, help_text='End date', null=True, verbose_name='End Date'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('distillery', '0011_admin_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FermentationReading',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_at', models.DateTimeField(help_text='When the reading was taken')),
+                ('sg', models.FloatField(blank=True, help_text='Specific gravity', null=True, verbose_name='SG')),
+                ('temperature', models.FloatField(blank=True, help_text='Temperature in °C', null=True, verbose_name='Temperature (°C)')),
+                ('fermentation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='readings', to='distillery.fermentationrecord')),
+            ],
+            options={
+                'verbose_name': 'Fermentation Reading',
+                'verbose_name_plural': 'Fermentation Readings',
+                'indexes': [models.Index(fields=['taken_at'], name='distillery__taken_a_065363_idx')],
+                'constraints': [models.UniqueConstraint(fields=('fermentation', 'taken_at'), name='unique_fermentation_reading')],
+            },
+        ),
+        migrations.CreateModel(
+            name='FermentationRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(help_text='Start of the hour (UTC)')),
+                ('readings', models.PositiveIntegerField(default=0, help_text='Readings in the hour')),
+                ('sg_min', models.FloatField(blank=True, null=True)),
+                ('sg_max', models.FloatField(blank=True, null=True)),
+                ('sg_mean', models.FloatField(blank=True, null=True)),
+                ('temperature_min', models.FloatField(blank=True, null=True)),
+                ('temperature_max', models.FloatField(blank=True, null=True)),
+                ('temperature_mean', models.FloatField(blank=True, null=True)),
+                ('fermentation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='distillery.fermentationrecord')),
+            ],
+            options={
+                'verbose_name': 'Fermentation Rollup',
+                'verbose_name_plural': 'Fermentation Rollups',
+                'ordering': ['hour'],
+                'constraints': [models.UniqueConstraint(fields=('fermentation', 'hour'), name='unique_fermentation_rollup')],
+            },
+        ),
+    ]
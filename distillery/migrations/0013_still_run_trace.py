@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('distillery', '0012_fermentation_telemetry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StillRunTrace',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(help_text='Time of the first sample')),
+                ('samples', models.PositiveIntegerField(default=0, help_text='Number of samples')),
+                ('seconds', models.BinaryField(default=bytes, help_text='Sample times, seconds since start (float32)')),
+                ('abv', models.BinaryField(default=bytes, help_text='Distillate ABV % (float32)')),
+                ('temperature', models.BinaryField(default=bytes, help_text='Temperature °C (float32)')),
+                ('flow', models.BinaryField(default=bytes, help_text='Distillate flow L/h (float32)')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('distillation', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='trace', to='distillery.distillationrecord')),
+                ('wash', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='trace', to='distillery.washrecord')),
+            ],
+            options={
+                'verbose_name': 'Still Run Trace',
+                'verbose_name_plural': 'Still Run Traces',
+                'constraints': [models.CheckConstraint(condition=models.Q(models.Q(('distillation__isnull', True), ('wash__isnull', False)), models.Q(('distillation__isnull', False), ('wash__isnull', True)), _connector='OR'), name='still_run_trace_one_run')],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('distillery', '0013_still_run_trace'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FaintsTransfer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stage', models.CharField(choices=[('wash', 'Wash'), ('spirit_1', 'Spirit 1'), ('spirit_2', 'Spirit 2')], default='wash', help_text='Run the faints were charged into', max_length=20)),
+                ('volume_l', models.DecimalField(blank=True, decimal_places=2, help_text='Litres transferred', max_digits=10, null=True, verbose_name='Volume (L)')),
+                ('abv', models.FloatField(blank=True, help_text='ABV of the faints', null=True, verbose_name='ABV (%)')),
+                ('location', models.CharField(blank=True, help_text='Storage the faints were held in', max_length=100, null=True)),
+                ('date', models.DateField(blank=True, help_text='Date transferred', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('source', models.ForeignKey(db_constraint=False, db_index=False, help_text='Batch the faints came from', on_delete=django.db.models.deletion.CASCADE, related_name='faints_sent', to='distillery.batch')),
+                ('target', models.ForeignKey(db_constraint=False, db_index=False, help_text='Batch they were recharged into', on_delete=django.db.models.deletion.CASCADE, related_name='faints_received', to='distillery.batch')),
+            ],
+            options={
+                'verbose_name': 'Faints Transfer',
+                'verbose_name_plural': 'Faints Transfers',
+                'ordering': ['target', 'source'],
+                'indexes': [models.Index(fields=['target', 'source'], name='faints_target_source_idx'), models.Index(fields=['source', 'target'], name='faints_source_target_idx')],
+                'constraints': [models.UniqueConstraint(fields=('source', 'target', 'stage'), name='faints_transfer_unique'), models.CheckConstraint(condition=models.Q(('source', models.F('target')), _negated=True), name='faints_transfer_not_self')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('distillery', '0014_faints_transfer'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncOperation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('op_id', models.UUIDField(help_text='Id the device gave the operation', unique=True)),
+                ('action', models.CharField(help_text='create or edit', max_length=10)),
+                ('batch_number', models.IntegerField(blank=True, null=True)),
+                ('target', models.CharField(help_text='Section created, or record type edited', max_length=20)),
+                ('status', models.CharField(choices=[('applied', 'Applied'), ('conflict', 'Conflict'), ('invalid', 'Invalid')], max_length=10)),
+                ('result', models.JSONField(default=dict, help_text='Response returned to the device')),
+                ('queued_at', models.DateTimeField(blank=True, help_text='When the device queued it', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Sync Operation',
+                'verbose_name_plural': 'Sync Operations',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
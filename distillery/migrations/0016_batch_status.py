@@ -0,0 +1,93 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:03
+
+import sys
+
+from django.db import migrations, models, transaction
+from django.db.models import Exists, OuterRef
+
+
+# Frozen copies of distillery.models.batch_status and
+# distillery.migration_utils.backfill, so later changes there can't change
+# what this migration does.
+
+def batch_status(batch, has_products):
+    if batch.totals_id is not None:
+        return 'bottled' if has_products else 'awaiting_bottling'
+    if batch.spirit_1_id is not None or batch.spirit_2_id is not None:
+        return 'spirit_run'
+    if batch.wash_id is not None:
+        return 'awaiting_spirit'
+    if batch.fermentation_id is not None:
+        return 'fermenting'
+    return 'new'
+
+
+def pk_chunks(queryset, chunk_size=1000):
+    pks = queryset.order_by('pk').values_list('pk', flat=True)
+    last = None
+    while True:
+        chunk = list((pks if last is None else pks.filter(pk__gt=last))[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last = chunk[-1]
+
+
+def backfill(queryset, update, fields, chunk_size=1000):
+    using = queryset.db
+    total = queryset.count()
+    done = 0
+    for pks in pk_chunks(queryset, chunk_size):
+        with transaction.atomic(using=using):
+            changed = [obj for obj in map(update, queryset.filter(pk__in=pks)) if obj is not None]
+            if changed:
+                type(changed[0])._base_manager.using(using).bulk_update(changed, fields)
+        done += len(pks)
+        # Quiet for tables that fit in one chunk
+        if total > chunk_size:
+            sys.stdout.write(f'\n  {queryset.model._meta.db_table}: {done}/{total} rows')
+            sys.stdout.flush()
+
+
+def fill_status(apps, schema_editor):
+    Batch = apps.get_model('distillery', 'Batch')
+    ProductRecord = apps.get_model('distillery', 'ProductRecord')
+    using = schema_editor.connection.alias
+    batches = Batch.objects.using(using).annotate(
+        has_products=Exists(ProductRecord.objects.using(using).filter(totals_record=OuterRef('totals_id')))
+    )
+
+    def fill(batch):
+        batch.status = batch_status(batch, batch.has_products)
+        # Best available guess at when the batch got there
+        batch.status_changed_at = batch.updated_at
+        return batch
+
+    backfill(batches, fill, ['status', 'status_changed_at'])
+
+
+class Migration(migrations.Migration):
+    # Let the backfill commit chunk by chunk
+    atomic = False
+
+    dependencies = [
+        ('distillery', '0015_sync_operation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='batch',
+            name='status',
+            field=models.CharField(choices=[('new', 'Not started'), ('fermenting', 'Fermenting'), ('awaiting_spirit', 'Awaiting spirit run'), ('spirit_run', 'Spirit runs'), ('awaiting_bottling', 'Awaiting bottling'), ('bottled', 'Bottled')], default='new', help_text='Furthest stage reached', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='batch',
+            name='status_changed_at',
+            field=models.DateTimeField(blank=True, help_text='When the batch reached its current status', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='batch',
+            index=models.Index(fields=['status', 'batch_number'], name='distillery__status_abbee0_idx'),
+        ),
+        migrations.RunPython(fill_status, migrations.RunPython.noop),
+    ]
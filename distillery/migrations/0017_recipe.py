@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:05
+
+import django.db.models.deletion
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('distillery', '0016_batch_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Recipe',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Recipe name', max_length=255)),
+                ('batch_count', models.PositiveIntegerField(default=0, help_text='Batches made to this recipe, archived ones included')),
+                ('avg_abv', models.FloatField(blank=True, help_text='Average hearts ABV to storage', null=True, verbose_name='Average ABV (%)')),
+                ('avg_lal', models.FloatField(blank=True, help_text='Average hearts to storage in litres of absolute alcohol', null=True, verbose_name='Average LAL')),
+                ('last_brewed', models.DateField(blank=True, help_text='Latest fermentation start (or batch creation)', null=True)),
+                ('archived_stats', models.JSONField(blank=True, default=dict, help_text="Archived batches' share of the statistics")),
+                ('stats_updated_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Recipe',
+                'verbose_name_plural': 'Recipes',
+                'ordering': ['name'],
+                'constraints': [models.UniqueConstraint(django.db.models.functions.text.Lower('name'), name='unique_recipe_name')],
+            },
+        ),
+        migrations.AddField(
+            model_name='batch',
+            name='recipe_ref',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='distillery.recipe'),
+        ),
+        # Nullable while both columns exist, so reversing can re-add the text column before refilling it
+        migrations.AlterField(
+            model_name='batch',
+            name='recipe',
+            field=models.CharField(help_text='Recipe name', max_length=255, null=True, verbose_name='Recipe'),
+        ),
+    ]
@@ -0,0 +1,108 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:05
+
+import sys
+
+from django.db import migrations, transaction
+from django.db.models import Count, ExpressionWrapper, F, FloatField, Max, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+
+# Frozen copies of distillery.migration_utils.update_in_chunks and
+# distillery.recipes.aggregate_batches / apply_stats, so later changes there
+# can't change what this migration does.
+
+LAL = ExpressionWrapper(F('totals__hearts_to_storage_l') * F('totals__hearts_abv') / 100, output_field=FloatField())
+
+
+def pk_chunks(queryset, chunk_size=1000):
+    pks = queryset.order_by('pk').values_list('pk', flat=True)
+    last = None
+    while True:
+        chunk = list((pks if last is None else pks.filter(pk__gt=last))[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last = chunk[-1]
+
+
+def update_in_chunks(queryset, chunk_size=1000, label=None, **values):
+    using = queryset.db
+    total = queryset.count()
+    done = 0
+    for pks in pk_chunks(queryset, chunk_size):
+        with transaction.atomic(using=using):
+            queryset.filter(pk__in=pks).update(**values)
+        done += len(pks)
+        # Quiet for tables that fit in one chunk
+        if total > chunk_size:
+            sys.stdout.write(f'\n  {label or queryset.model._meta.db_table}: {done}/{total} rows')
+            sys.stdout.flush()
+
+
+def aggregate_batches(batches):
+    return batches.aggregate(
+        count=Count('pk'),
+        abv_sum=Sum('totals__hearts_abv'),
+        abv_n=Count('totals__hearts_abv'),
+        lal_sum=Sum(LAL),
+        lal_n=Count(LAL),
+        last=Max(Coalesce('fermentation__start_date', TruncDate('created_at'))),
+    )
+
+
+def _average(total, count):
+    return round(total / count, 2) if count else None
+
+
+def apply_stats(recipe, part):
+    recipe.batch_count = part['count'] or 0
+    recipe.avg_abv = _average(part['abv_sum'] or 0, part['abv_n'])
+    recipe.avg_lal = _average(part['lal_sum'] or 0, part['lal_n'])
+    recipe.last_brewed = part['last']
+    recipe.stats_updated_at = timezone.now()
+
+
+def link_recipes(apps, schema_editor):
+    """One Recipe per name ignoring case and spacing, spelled as most batches spell it."""
+    Batch = apps.get_model('distillery', 'Batch')
+    Recipe = apps.get_model('distillery', 'Recipe')
+    using = schema_editor.connection.alias
+    batches = Batch.objects.using(using)
+
+    groups = {}
+    spellings = batches.values('recipe').annotate(count=Count('pk'))
+    # Most used first; on a tie, a spelling that needs no tidying
+    ranked = sorted(spellings, key=lambda row: (-row['count'], ' '.join(row['recipe'].split()) != row['recipe'], row['recipe']))
+    for row in ranked:
+        name = ' '.join(row['recipe'].split()) or 'Unknown'
+        groups.setdefault(name.casefold(), (name, []))[1].append(row['recipe'])
+
+    for name, spelled in groups.values():
+        recipe = Recipe.objects.using(using).create(name=name)
+        update_in_chunks(batches.filter(recipe__in=spelled), label=f'Recipe {name}', recipe_ref=recipe)
+        # Archived batches are counted once both databases are migrated: manage.py refresh_recipe_stats
+        apply_stats(recipe, aggregate_batches(batches.filter(recipe_ref=recipe)))
+        recipe.save()
+
+
+def unlink_recipes(apps, schema_editor):
+    Batch = apps.get_model('distillery', 'Batch')
+    Recipe = apps.get_model('distillery', 'Recipe')
+    using = schema_editor.connection.alias
+    for recipe in Recipe.objects.using(using).all():
+        update_in_chunks(Batch.objects.using(using).filter(recipe_ref=recipe), recipe=recipe.name)
+
+
+class Migration(migrations.Migration):
+    # Let the batch updates commit chunk by chunk; the schema changes around
+    # this are in their own, atomic, migrations
+    atomic = False
+
+    dependencies = [
+        ('distillery', '0017_recipe'),
+    ]
+
+    operations = [
+        migrations.RunPython(link_recipes, unlink_recipes),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('distillery', '0018_link_recipes'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='batch',
+            name='recipe',
+        ),
+        migrations.RenameField(
+            model_name='batch',
+            old_name='recipe_ref',
+            new_name='recipe',
+        ),
+        migrations.AlterField(
+            model_name='batch',
+            name='recipe',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='batches', to='distillery.recipe', verbose_name='Recipe'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('distillery', '0019_batch_recipe_fk'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(db_index=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('incremental', models.BooleanField(default=False, help_text='Only batches changed since the previous run were checked')),
+                ('batches_checked', models.PositiveIntegerField(blank=True, help_text='Empty for a full run', null=True)),
+                ('findings', models.PositiveIntegerField(default=0, help_text='Violations found by this run')),
+            ],
+            options={
+                'verbose_name': 'Audit Run',
+                'verbose_name_plural': 'Audit Runs',
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='AuditFinding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rule', models.CharField(db_index=True, max_length=30)),
+                ('subject', models.CharField(blank=True, help_text='Which part of the batch, e.g. a product', max_length=100)),
+                ('expected', models.FloatField(blank=True, null=True)),
+                ('actual', models.FloatField(blank=True, null=True)),
+                ('found_at', models.DateTimeField()),
+                ('batch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='audit_findings', to='distillery.batch')),
+            ],
+            options={
+                'verbose_name': 'Audit Finding',
+                'verbose_name_plural': 'Audit Findings',
+                'ordering': ['-batch__batch_number', 'rule', 'subject'],
+            },
+        ),
+    ]
@@ -1,7 +1,84 @@
+import copy
+
 from django.db import models
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+
+class TrackedModel(models.Model):
+    """Model that remembers the values it was loaded with.
+
+    ``save()`` on a loaded instance only UPDATEs the columns that changed
+    (plus ``auto_now`` timestamps), and skips the query entirely when nothing
+    did. ``changed_fields`` is the set of field names changed since loading or
+    the last save; after a save, ``saved_fields`` holds what it wrote (empty
+    if it skipped), and post_save receivers get the same set as
+    ``update_fields``.
+    """
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot()
+        return instance
+
+    def _snapshot(self, attnames=None):
+        loaded = self.__dict__.setdefault('_loaded_values', {})
+        deferred = self.get_deferred_fields()
+        for field in self._meta.concrete_fields:
+            if field.attname in deferred or (attnames is not None and field.attname not in attnames):
+                continue
+            value = getattr(self, field.attname)
+            loaded[field.attname] = copy.deepcopy(value) if isinstance(value, (dict, list)) else value
 
+    @property
+    def changed_fields(self):
+        """Names of fields changed since the instance was loaded or last saved (all of them if never saved)."""
+        loaded = self.__dict__.get('_loaded_values')
+        if self._state.adding or loaded is None:
+            return {field.name for field in self._meta.concrete_fields}
+        return {
+            field.name for field in self._meta.concrete_fields
+            if field.attname in self.__dict__
+            and (field.attname not in loaded or loaded[field.attname] != self.__dict__[field.attname])
+        }
 
-class FermentationRecord(models.Model):
+    def save(self, *args, **kwargs):
+        loaded = self.__dict__.get('_loaded_values')
+        minimal = (
+            loaded is not None and not self._state.adding and not kwargs.get('force_insert')
+            and kwargs.get('update_fields') is None and not args
+            and loaded.get(self._meta.pk.attname) == self.pk
+        )
+        if minimal:
+            changed = self.changed_fields
+            if not changed:
+                self.saved_fields = set()
+                return
+            kwargs['update_fields'] = changed | {
+                field.name for field in self._meta.concrete_fields if getattr(field, 'auto_now', False)
+            }
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        fields = self._concrete_fields(update_fields)
+        self.saved_fields = {field.name for field in fields}
+        self._snapshot({field.attname for field in fields})
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        self._snapshot({field.attname for field in self._concrete_fields(fields)} if fields else None)
+
+    def _concrete_fields(self, names=None):
+        """Concrete fields matching ``names`` (field names or attnames), or all of them."""
+        if names is None:
+            return list(self._meta.concrete_fields)
+        names = set(names)
+        return [field for field in self._meta.concrete_fields if field.name in names or field.attname in names]
+
+
+class FermentationRecord(TrackedModel):
     """Record for fermentation stage"""
     description = models.CharField(max_length=255, default="Fermentation", help_text="Description")
     notes = models.TextField(blank=True, null=True, help_text="Notes")
@@ -9,7 +86,7 @@ class FermentationRecord(models.Model):
     volume_in_l = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Volume (L)", help_text="Volume in litres", blank=True, null=True)
     start_date = models.DateField(help_text="Start date", blank=True, null=True)
     sg_start = models.FloatField(verbose_name="SG Start", help_text="Starting specific gravity", blank=True, null=True)
-    date = models.DateField(verbose_name="End Date", help_text="End date", blank=True, null=True)
+    date = models.DateField(verbose_name="End Date", help_text="End date", blank=True, null=True, db_index=True)
     sg_end = models.FloatField(verbose_name="SG End", help_text="Ending specific gravity", blank=True, null=True)
     abv = models.FloatField(verbose_name="ABV (%)", help_text="Alcohol by volume (percent)", blank=True, null=True)
     lal = models.FloatField(verbose_name="LAL", help_text="Litres of Absolute Alcohol", blank=True, null=True)
@@ -26,7 +103,7 @@ class FermentationRecord(models.Model):
         return f"Fermentation ({self.date})"
 
 
-class WashRecord(models.Model):
+class WashRecord(TrackedModel):
     """Record for wash distillation runs"""
     description = models.CharField(max_length=255, default="Wash Run", help_text="Description of the run")
     notes = models.TextField(blank=True, null=True, help_text="Notes")
@@ -35,7 +112,7 @@ class WashRecord(models.Model):
     to_field = models.CharField(max_length=100, verbose_name="To", help_text="Destination location", blank=True, null=True)
     volume_in_l = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Volume (L)", help_text="Volume in litres", blank=True, null=True)
     start_date = models.DateField(help_text="Start date", blank=True, null=True)
-    date = models.DateField(verbose_name="End Date", help_text="End date", blank=True, null=True)
+    date = models.DateField(verbose_name="End Date", help_text="End date", blank=True, null=True, db_index=True)
     fores_out = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Fores out (L)", help_text="Foreshots output", blank=True, null=True)
     heads_out = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Heads out (L)", help_text="Heads output", blank=True, null=True)
     hearts_out = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Hearts out (L)", help_text="Hearts output", blank=True, null=True)
@@ -58,7 +135,7 @@ class WashRecord(models.Model):
         return f"{self.description} ({self.date})"
 
 
-class DistillationRecord(models.Model):
+class DistillationRecord(TrackedModel):
     """Record for spirit distillation runs (Spirit 1, Spirit 2)"""
     description = models.CharField(max_length=255, help_text="Description of the run")
     notes = models.TextField(blank=True, null=True, help_text="Notes")
@@ -67,7 +144,7 @@ class DistillationRecord(models.Model):
     to_field = models.CharField(max_length=100, verbose_name="To", help_text="Destination location", blank=True, null=True)
     volume_in_l = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Volume (L)", help_text="Volume in litres", blank=True, null=True)
     start_date = models.DateField(help_text="Start date", blank=True, null=True)
-    date = models.DateField(verbose_name="End Date", help_text="End date", blank=True, null=True)
+    date = models.DateField(verbose_name="End Date", help_text="End date", blank=True, null=True, db_index=True)
     fores_out = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Fores out (L)", help_text="Foreshots output", blank=True, null=True)
     heads_out = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Heads out (L)", help_text="Heads output", blank=True, null=True)
     hearts_out = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Hearts out (L)", help_text="Hearts output", blank=True, null=True)
@@ -89,7 +166,7 @@ class DistillationRecord(models.Model):
         return f"{self.description} ({self.date})"
 
 
-class TotalsRecord(models.Model):
+class TotalsRecord(TrackedModel):
     """Record for batch totals"""
     description = models.CharField(max_length=255, default="Totals", help_text="Description")
     notes = models.TextField(blank=True, null=True, help_text="Notes")
@@ -101,7 +178,7 @@ class TotalsRecord(models.Model):
     faints_to_storage_l = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Faints to Storage (L)", help_text="Faints stored in litres", blank=True, null=True)
     faints_abv = models.FloatField(verbose_name="Faints ABV (%)", help_text="ABV of stored faints", blank=True, null=True)
     
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
@@ -112,17 +189,17 @@ class TotalsRecord(models.Model):
         return f"Totals ({self.created_at.date()})"
 
 
-class ProductRecord(models.Model):
+class ProductRecord(TrackedModel):
     """Product record linked to a totals record"""
     totals_record = models.ForeignKey(TotalsRecord, on_delete=models.CASCADE, related_name='products')
-    product_name = models.CharField(max_length=50, verbose_name="Product", help_text="Product identifier (A, B, C, etc.)")
+    product_name = models.CharField(max_length=50, db_index=True, verbose_name="Product", help_text="Product identifier (A, B, C, etc.)")
     notes = models.TextField(blank=True, null=True, help_text="Notes")
     final_abv = models.FloatField(verbose_name="Final ABV (%)", help_text="Final alcohol by volume", blank=True, null=True)
     final_l = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Final L", help_text="Final litres", blank=True, null=True)
     distillation_location = models.CharField(max_length=100, verbose_name="Distillation Location", help_text="Location of distillation", blank=True, null=True)
     lal = models.FloatField(verbose_name="LAL", help_text="Litres of Absolute Alcohol", blank=True, null=True)
     
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
@@ -134,12 +211,70 @@ class ProductRecord(models.Model):
         return f"Product {self.product_name}"
 
 
-class Batch(models.Model):
+class Recipe(TrackedModel):
+    """A recipe batches are made to, with statistics cached from its batches (see distillery.recipes)"""
+    name = models.CharField(max_length=255, help_text="Recipe name")
+
+    batch_count = models.PositiveIntegerField(default=0, help_text="Batches made to this recipe, archived ones included")
+    avg_abv = models.FloatField(null=True, blank=True, verbose_name="Average ABV (%)", help_text="Average hearts ABV to storage")
+    avg_lal = models.FloatField(null=True, blank=True, verbose_name="Average LAL", help_text="Average hearts to storage in litres of absolute alcohol")
+    last_brewed = models.DateField(null=True, blank=True, help_text="Latest fermentation start (or batch creation)")
+    archived_stats = models.JSONField(default=dict, blank=True, help_text="Archived batches' share of the statistics")
+    stats_updated_at = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['name']
+        constraints = [models.UniqueConstraint(Lower('name'), name='unique_recipe_name')]
+        verbose_name = "Recipe"
+        verbose_name_plural = "Recipes"
+
+    def __str__(self):
+        return self.name
+
+
+# Batch fields linking the stage records, in production order
+STAGE_FIELDS = ('fermentation', 'wash', 'spirit_1', 'spirit_2', 'totals')
+
+
+def batch_status(batch, has_products=None):
+    """The ``Batch.Status`` implied by the records ``batch`` links to.
+
+    Only reads the ``*_id`` columns, so it also works on historical models in
+    migrations; ``has_products`` is looked up when not given.
+    """
+    if batch.totals_id is not None:
+        if has_products is None:
+            has_products = ProductRecord.objects.using(batch._state.db or 'default').filter(
+                totals_record_id=batch.totals_id
+            ).exists()
+        return Batch.Status.BOTTLED if has_products else Batch.Status.AWAITING_BOTTLING
+    if batch.spirit_1_id is not None or batch.spirit_2_id is not None:
+        return Batch.Status.SPIRIT_RUN
+    if batch.wash_id is not None:
+        return Batch.Status.AWAITING_SPIRIT
+    if batch.fermentation_id is not None:
+        return Batch.Status.FERMENTING
+    return Batch.Status.NEW
+
+
+class Batch(TrackedModel):
     """A batch with a sequential number and recipe"""
+
+    class Status(models.TextChoices):
+        NEW = 'new', 'Not started'
+        FERMENTING = 'fermenting', 'Fermenting'
+        AWAITING_SPIRIT = 'awaiting_spirit', 'Awaiting spirit run'
+        SPIRIT_RUN = 'spirit_run', 'Spirit runs'
+        AWAITING_BOTTLING = 'awaiting_bottling', 'Awaiting bottling'
+        BOTTLED = 'bottled', 'Bottled'
+
     id = models.AutoField(primary_key=True)
     batch_number = models.IntegerField(unique=True, verbose_name="Batch Number", help_text="Batch number")
     notes = models.TextField(blank=True, null=True, help_text="Notes")
-    recipe = models.CharField(max_length=255, verbose_name="Recipe", help_text="Recipe name")
+    recipe = models.ForeignKey(Recipe, on_delete=models.PROTECT, related_name='batches', verbose_name="Recipe")
     
     # 1:1 Relationships to records
     fermentation = models.OneToOneField(FermentationRecord, on_delete=models.SET_NULL, null=True, blank=True, related_name='batch')
@@ -147,14 +282,271 @@ class Batch(models.Model):
     spirit_1 = models.OneToOneField(DistillationRecord, on_delete=models.SET_NULL, null=True, blank=True, related_name='batch_spirit1')
     spirit_2 = models.OneToOneField(DistillationRecord, on_delete=models.SET_NULL, null=True, blank=True, related_name='batch_spirit2')
     totals = models.OneToOneField(TotalsRecord, on_delete=models.SET_NULL, null=True, blank=True, related_name='batch')
+
+    # Derived from the linked records and products (see batch_status)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.NEW, help_text="Furthest stage reached")
+    status_changed_at = models.DateTimeField(null=True, blank=True, help_text="When the batch reached its current status")
     
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['batch_number']
+        indexes = [models.Index(fields=['status', 'batch_number'])]
         verbose_name = "Batch"
         verbose_name_plural = "Batches"
     
     def __str__(self):
         return f"Batch #{self.batch_number}"
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        links = set(STAGE_FIELDS) if update_fields is None else set(STAGE_FIELDS) & set(update_fields)
+        if links & self.changed_fields and self.update_status() and update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'status', 'status_changed_at'}
+        super().save(*args, **kwargs)
+
+    def update_status(self, has_products=None):
+        """Set ``status`` from the linked records; returns whether it changed. Doesn't save."""
+        status = batch_status(self, has_products)
+        if status == self.status and self.status_changed_at is not None:
+            return False
+        self.status = status
+        self.status_changed_at = timezone.now()
+        return True
+
+
+class Job(TrackedModel):
+    """Background job queued in the database and executed by `manage.py run_jobs`"""
+
+    class Status(models.TextChoices):
+        QUEUED = 'queued', 'Queued'
+        RUNNING = 'running', 'Running'
+        DONE = 'done', 'Done'
+        FAILED = 'failed', 'Failed'
+
+    kind = models.CharField(max_length=50, help_text="Registered job handler name")
+    params = models.JSONField(default=dict, blank=True, help_text="Handler arguments")
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.QUEUED)
+    progress = models.PositiveIntegerField(default=0, help_text="Units of work completed")
+    total = models.PositiveIntegerField(default=0, help_text="Units of work expected")
+    result_file = models.CharField(max_length=255, blank=True, help_text="Output file name in JOBS_OUTPUT_DIR")
+    error = models.TextField(blank=True, help_text="Traceback of the failure")
+    duration = models.FloatField(blank=True, null=True, help_text="Run time in seconds")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    heartbeat_at = models.DateTimeField(blank=True, null=True, help_text="Last sign of life from the worker running it")
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['status', 'created_at'])]
+        verbose_name = "Job"
+        verbose_name_plural = "Jobs"
+
+    def __str__(self):
+        return f"Job #{self.pk} {self.kind} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in (self.Status.DONE, self.Status.FAILED)
+
+    @property
+    def percent(self):
+        if not self.total:
+            return 100 if self.status == self.Status.DONE else 0
+        return min(100, round(self.progress * 100 / self.total))
+
+
+class FermentationReading(TrackedModel):
+    """Raw hydrometer reading (SG and temperature) logged during a fermentation.
+
+    Kept lean since there are thousands per fermentation; raw readings are
+    pruned after TELEMETRY_RAW_RETENTION_DAYS, while the hourly rollups stay.
+    """
+    fermentation = models.ForeignKey(FermentationRecord, on_delete=models.CASCADE, related_name='readings')
+    taken_at = models.DateTimeField(help_text="When the reading was taken")
+    sg = models.FloatField(verbose_name="SG", help_text="Specific gravity", blank=True, null=True)
+    temperature = models.FloatField(verbose_name="Temperature (°C)", help_text="Temperature in °C", blank=True, null=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['fermentation', 'taken_at'], name='unique_fermentation_reading')]
+        indexes = [models.Index(fields=['taken_at'])]
+        verbose_name = "Fermentation Reading"
+        verbose_name_plural = "Fermentation Readings"
+
+    def __str__(self):
+        return f"Reading {self.taken_at:%Y-%m-%d %H:%M}"
+
+
+class FermentationRollup(TrackedModel):
+    """Hourly min/max/mean of a fermentation's readings, maintained on ingest"""
+    fermentation = models.ForeignKey(FermentationRecord, on_delete=models.CASCADE, related_name='rollups')
+    hour = models.DateTimeField(help_text="Start of the hour (UTC)")
+    readings = models.PositiveIntegerField(default=0, help_text="Readings in the hour")
+    sg_min = models.FloatField(blank=True, null=True)
+    sg_max = models.FloatField(blank=True, null=True)
+    sg_mean = models.FloatField(blank=True, null=True)
+    temperature_min = models.FloatField(blank=True, null=True)
+    temperature_max = models.FloatField(blank=True, null=True)
+    temperature_mean = models.FloatField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['hour']
+        constraints = [models.UniqueConstraint(fields=['fermentation', 'hour'], name='unique_fermentation_rollup')]
+        verbose_name = "Fermentation Rollup"
+        verbose_name_plural = "Fermentation Rollups"
+
+    def __str__(self):
+        return f"Rollup {self.hour:%Y-%m-%d %H:00}"
+
+
+class StillRunTrace(TrackedModel):
+    """Still controller samples for one wash or spirit run.
+
+    Samples are stored as packed little-endian float32 arrays (seconds since
+    ``started_at``, ABV %, temperature °C, flow L/h) rather than a row each;
+    see distillery.stillruns.
+    """
+    wash = models.OneToOneField(WashRecord, on_delete=models.CASCADE, null=True, blank=True, related_name='trace')
+    distillation = models.OneToOneField(DistillationRecord, on_delete=models.CASCADE, null=True, blank=True, related_name='trace')
+    started_at = models.DateTimeField(help_text="Time of the first sample")
+    samples = models.PositiveIntegerField(default=0, help_text="Number of samples")
+    seconds = models.BinaryField(default=bytes, help_text="Sample times, seconds since start (float32)")
+    abv = models.BinaryField(default=bytes, help_text="Distillate ABV % (float32)")
+    temperature = models.BinaryField(default=bytes, help_text="Temperature °C (float32)")
+    flow = models.BinaryField(default=bytes, help_text="Distillate flow L/h (float32)")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(wash__isnull=False, distillation__isnull=True)
+                | models.Q(wash__isnull=True, distillation__isnull=False),
+                name='still_run_trace_one_run',
+            ),
+        ]
+        verbose_name = "Still Run Trace"
+        verbose_name_plural = "Still Run Traces"
+
+    def __str__(self):
+        return f"Still run trace ({self.samples} samples from {self.started_at:%Y-%m-%d %H:%M})"
+
+    @property
+    def record(self):
+        return self.wash or self.distillation
+
+
+class FaintsTransfer(TrackedModel):
+    """Faints (or feints) from one batch recharged into a later batch's run.
+
+    The links are kept when either batch is archived, so lineage can be
+    followed through archived history (see distillery.lineage).
+    """
+    class Stage(models.TextChoices):
+        WASH = 'wash', 'Wash'
+        SPIRIT_1 = 'spirit_1', 'Spirit 1'
+        SPIRIT_2 = 'spirit_2', 'Spirit 2'
+
+    # No database constraint: archiving moves batches out of this database while the links stay
+    source = models.ForeignKey(Batch, on_delete=models.CASCADE, db_constraint=False, db_index=False, related_name='faints_sent', help_text="Batch the faints came from")
+    target = models.ForeignKey(Batch, on_delete=models.CASCADE, db_constraint=False, db_index=False, related_name='faints_received', help_text="Batch they were recharged into")
+    stage = models.CharField(max_length=20, choices=Stage.choices, default=Stage.WASH, help_text="Run the faints were charged into")
+    volume_l = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Volume (L)", help_text="Litres transferred", blank=True, null=True)
+    abv = models.FloatField(verbose_name="ABV (%)", help_text="ABV of the faints", blank=True, null=True)
+    location = models.CharField(max_length=100, help_text="Storage the faints were held in", blank=True, null=True)
+    date = models.DateField(help_text="Date transferred", blank=True, null=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['target', 'source']
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'target', 'stage'], name='faints_transfer_unique'),
+            models.CheckConstraint(condition=~models.Q(source=models.F('target')), name='faints_transfer_not_self'),
+        ]
+        # One per direction, so each step of a recursive lineage query is an index lookup
+        indexes = [
+            models.Index(fields=['target', 'source'], name='faints_target_source_idx'),
+            models.Index(fields=['source', 'target'], name='faints_source_target_idx'),
+        ]
+        verbose_name = "Faints Transfer"
+        verbose_name_plural = "Faints Transfers"
+
+    def __str__(self):
+        return f"Faints transfer {self.pk} into {self.get_stage_display()}"
+
+    @property
+    def lal(self):
+        if self.volume_l is None or self.abv is None:
+            return None
+        return round(float(self.volume_l) * self.abv / 100, 2)
+
+
+class SyncOperation(TrackedModel):
+    """A record create or edit queued offline on a device and applied by the sync endpoint.
+
+    Kept by the client's operation id so a re-sent operation gets the same
+    result instead of being applied twice (see distillery.sync).
+    """
+    class Status(models.TextChoices):
+        APPLIED = 'applied', 'Applied'
+        CONFLICT = 'conflict', 'Conflict'
+        INVALID = 'invalid', 'Invalid'
+
+    op_id = models.UUIDField(unique=True, help_text="Id the device gave the operation")
+    action = models.CharField(max_length=10, help_text="create or edit")
+    batch_number = models.IntegerField(null=True, blank=True)
+    target = models.CharField(max_length=20, help_text="Section created, or record type edited")
+    status = models.CharField(max_length=10, choices=Status.choices)
+    result = models.JSONField(default=dict, help_text="Response returned to the device")
+    queued_at = models.DateTimeField(null=True, blank=True, help_text="When the device queued it")
+
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Sync Operation"
+        verbose_name_plural = "Sync Operations"
+
+    def __str__(self):
+        return f"{self.action} {self.target} for batch #{self.batch_number} ({self.get_status_display()})"
+
+
+class AuditRun(models.Model):
+    """One run of the mass-balance audit (see distillery.audit)"""
+    started_at = models.DateTimeField(db_index=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    incremental = models.BooleanField(default=False, help_text="Only batches changed since the previous run were checked")
+    batches_checked = models.PositiveIntegerField(null=True, blank=True, help_text="Empty for a full run")
+    findings = models.PositiveIntegerField(default=0, help_text="Violations found by this run")
+
+    class Meta:
+        ordering = ['-started_at']
+        verbose_name = "Audit Run"
+        verbose_name_plural = "Audit Runs"
+
+    def __str__(self):
+        return f"Audit {self.started_at:%Y-%m-%d %H:%M} ({'incremental' if self.incremental else 'full'})"
+
+
+class AuditFinding(models.Model):
+    """A batch breaking an audit rule, as of the latest run that checked it"""
+    batch = models.ForeignKey(Batch, on_delete=models.CASCADE, related_name='audit_findings')
+    rule = models.CharField(max_length=30, db_index=True)
+    subject = models.CharField(max_length=100, blank=True, help_text="Which part of the batch, e.g. a product")
+    expected = models.FloatField(null=True, blank=True)
+    actual = models.FloatField(null=True, blank=True)
+    found_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-batch__batch_number', 'rule', 'subject']
+        verbose_name = "Audit Finding"
+        verbose_name_plural = "Audit Findings"
+
+    def __str__(self):
+        return f"{self.rule} on batch #{self.batch.batch_number}"
@@ -0,0 +1,78 @@
+"""Per-view query budgets.
+
+``@query_budget(n)`` declares the most SQL queries (across all databases) a
+view may run for one request, whatever the amount of data; a view whose count
+grows with the number of batches has an N+1 problem. Admin views share
+``ADMIN_BUDGET``, except that running an admin action decorated with
+``@query_budget`` uses the action's budget. The tests request every view at several data sizes and
+fail when one goes over budget or its count grows, and in development
+``tdist.middleware.QueryBudgetMiddleware`` logs requests that go over, with
+their repeated SQL marked.
+"""
+from collections import Counter
+from contextlib import ExitStack
+
+from django.db import connections
+
+
+ADMIN_BUDGET = 15
+ADMIN_NAMESPACE = 'admin'
+
+
+def query_budget(limit):
+    """Decorator declaring that a view runs at most ``limit`` queries per request."""
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+def budget_for(match, request=None):
+    """The budget of the view behind ``match`` (a ResolverMatch) for ``request``, or None if it has none."""
+    if match is None:
+        return None
+    if ADMIN_NAMESPACE in match.namespaces:
+        return _admin_action_budget(match, request) or ADMIN_BUDGET
+    return getattr(match.func, 'query_budget', None)
+
+
+def _admin_action_budget(match, request):
+    """The budget of the admin action ``request`` runs, if it runs one that has a budget."""
+    model_admin = getattr(match.func, 'model_admin', None)
+    if model_admin is None or request is None or request.method != 'POST' or 'action' not in request.POST:
+        return None
+    action = model_admin.get_actions(request).get(request.POST['action'])
+    return getattr(action[0], 'query_budget', None) if action else None
+
+
+class QueryCounter:
+    """Context manager recording the SQL run on every database connection in this thread."""
+
+    def __init__(self):
+        self.queries = []
+        self._stack = None
+
+    def _record(self, execute, sql, params, many, context):
+        self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self._record))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def __len__(self):
+        return len(self.queries)
+
+
+def report(label, budget, queries):
+    """Describe ``queries`` over ``budget``, marking SQL that ran more than once with its count."""
+    counts = Counter(queries)
+    lines = [f'{label} ran {len(queries)} queries (budget {budget}):']
+    for sql in dict.fromkeys(queries):
+        lines.append(f'>> {counts[sql]}x {sql}' if counts[sql] > 1 else f'   {sql}')
+    return '\n'.join(lines)
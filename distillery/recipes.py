@@ -0,0 +1,147 @@
+"""Recipes: name matching and cached per-recipe statistics.
+
+Names are matched ignoring case and repeated whitespace, so "wheat  whiskey"
+finds "Wheat Whiskey" instead of starting a new recipe.
+
+Each Recipe caches its batch count, average hearts ABV, average LAL yield
+(hearts to storage in litres of absolute alcohol) and last brew date.
+``refresh_stats()`` recomputes them for the given recipes only, with one
+aggregate query; the signal handlers below call it for the recipes whose
+batches changed. Archived batches still count: their share is kept on the
+recipe (``archived_stats``) and recounted only when batches move in or out
+of the archive, so ordinary saves never touch the archive database.
+"""
+from datetime import date
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, ExpressionWrapper, F, FloatField, Max, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.utils import timezone
+
+from .archive import ARCHIVE_DB, HOT_DB
+from .models import Batch, FermentationRecord, Recipe, TotalsRecord
+
+
+LAL = ExpressionWrapper(F('totals__hearts_to_storage_l') * F('totals__hearts_abv') / 100, output_field=FloatField())
+
+# Fields whose changes move a recipe's statistics
+BATCH_FIELDS = {'recipe', 'totals', 'fermentation', 'status'}
+RECORD_FIELDS = {
+    TotalsRecord: {'hearts_abv', 'hearts_to_storage_l'},
+    FermentationRecord: {'start_date'},
+}
+
+
+def normalize_name(name):
+    return ' '.join(str(name or '').split())
+
+
+def recipe_named(name, using=HOT_DB):
+    """The recipe called ``name`` (ignoring case and spacing), created if new."""
+    name = normalize_name(name)
+    if not name:
+        raise ValueError('A recipe needs a name.')
+    recipes = Recipe.objects.using(using)
+    recipe = recipes.filter(name__iexact=name).first()
+    if recipe is None:
+        try:
+            with transaction.atomic(using=using):
+                recipe = recipes.create(name=name)
+        except IntegrityError:
+            # Created by a concurrent request
+            recipe = recipes.get(name__iexact=name)
+    return recipe
+
+
+def aggregate_batches(batches):
+    """Totals behind the cached statistics of ``batches`` (a queryset), in one query."""
+    return batches.aggregate(
+        count=Count('pk'),
+        abv_sum=Sum('totals__hearts_abv'),
+        abv_n=Count('totals__hearts_abv'),
+        lal_sum=Sum(LAL),
+        lal_n=Count(LAL),
+        last=Max(Coalesce('fermentation__start_date', TruncDate('created_at'))),
+    )
+
+
+def _stored(part):
+    part = dict(part)
+    if part.get('last'):
+        part['last'] = date.fromisoformat(part['last'])
+    return part
+
+
+def _average(total, count):
+    return round(total / count, 2) if count else None
+
+
+def apply_stats(recipe, parts):
+    """Set ``recipe``'s cached statistics from ``aggregate_batches()`` results."""
+    def total(key):
+        return sum(part.get(key) or 0 for part in parts)
+
+    dates = [part['last'] for part in parts if part.get('last') is not None]
+    recipe.batch_count = total('count')
+    recipe.avg_abv = _average(total('abv_sum'), total('abv_n'))
+    recipe.avg_lal = _average(total('lal_sum'), total('lal_n'))
+    recipe.last_brewed = max(dates) if dates else None
+    recipe.stats_updated_at = timezone.now()
+
+
+def refresh_stats(recipes, archived=False):
+    """Recompute and store the cached statistics of ``recipes`` (Recipe instances or pks).
+
+    With ``archived``, the archived batches' share is recounted too (matched by
+    recipe name, since the archive keeps its own recipe rows).
+    """
+    pks = {getattr(recipe, 'pk', recipe) for recipe in recipes} - {None}
+    for recipe in Recipe.objects.using(HOT_DB).filter(pk__in=pks):
+        if archived:
+            part = aggregate_batches(Batch.objects.using(ARCHIVE_DB).filter(recipe__name__iexact=recipe.name))
+            recipe.archived_stats = dict(part, last=part['last'].isoformat() if part['last'] else None)
+        apply_stats(recipe, [
+            aggregate_batches(Batch.objects.using(HOT_DB).filter(recipe=recipe)),
+            _stored(recipe.archived_stats),
+        ])
+        recipe.save()
+
+
+def refresh_for_records(model, pks):
+    """Refresh the recipes of the batches linking records ``pks`` of ``model``."""
+    fields = [field.name for field in Batch._meta.concrete_fields if field.is_relation and field.related_model is model]
+    recipes = set()
+    for field in fields:
+        recipes.update(Batch.objects.filter(**{f'{field}__in': pks}).values_list('recipe_id', flat=True))
+    refresh_stats(recipes)
+
+
+def _batch_saving(sender, instance, **kwargs):
+    loaded = instance.__dict__.get('_loaded_values') or {}
+    instance._previous_recipe_id = loaded.get('recipe_id')
+
+
+def _batch_saved(sender, instance, update_fields=None, **kwargs):
+    if instance._state.db != HOT_DB or (update_fields is not None and not BATCH_FIELDS & set(update_fields)):
+        return
+    refresh_stats({instance.recipe_id, getattr(instance, '_previous_recipe_id', None)})
+
+
+def _batch_deleted(sender, instance, **kwargs):
+    if instance._state.db == HOT_DB:
+        refresh_stats({instance.recipe_id})
+
+
+def _record_saved(sender, instance, created=False, update_fields=None, **kwargs):
+    if created or instance._state.db != HOT_DB:
+        return
+    if update_fields is None or RECORD_FIELDS[sender] & set(update_fields):
+        refresh_for_records(sender, [instance.pk])
+
+
+pre_save.connect(_batch_saving, sender=Batch, dispatch_uid='recipes-batch-pre-save')
+post_save.connect(_batch_saved, sender=Batch, dispatch_uid='recipes-batch-save')
+post_delete.connect(_batch_deleted, sender=Batch, dispatch_uid='recipes-batch-delete')
+for _model in RECORD_FIELDS:
+    post_save.connect(_record_saved, sender=_model, dispatch_uid=f'recipes-{_model.__name__}-save')
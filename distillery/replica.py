@@ -0,0 +1,141 @@
+"""Read replica for reports and exports.
+
+Views decorated with ``@replica_view`` (and code inside ``with
+replica_reads():``) read distillery data from the ``replica`` database, while
+everything else, and every write, uses the primary. The router only does this
+when ``REPLICA_ENABLED`` is on and the replica was refreshed within
+``REPLICA_MAX_LAG`` seconds; otherwise reads quietly fall back to the primary.
+
+Locally the replica is a SQLite copy of the primary kept current by
+``manage.py refresh_replica``. A browser that has just written something is
+pinned to the primary for ``REPLICA_PIN_SECONDS`` (see
+``tdist.middleware.PinPrimaryMiddleware``) so it always sees its own changes.
+"""
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from pathlib import Path
+
+from django.conf import settings
+
+
+REPLICA_DB = 'replica'
+PRIMARY_DB = 'default'
+
+# Set by PinPrimaryMiddleware after a write; its presence keeps reads on the primary
+PIN_COOKIE = 'pin_primary'
+
+# Seconds to cache the staleness check, so it isn't repeated for every query
+LAG_CHECK_INTERVAL = 1.0
+
+_reading = ContextVar('replica_reads', default=False)
+_lag_cache = {'checked': None, 'lag': None}
+
+
+def replica_path():
+    return Path(settings.DATABASES[REPLICA_DB]['NAME'])
+
+
+def replica_lag():
+    """Seconds since the replica was last refreshed, or None if there is no replica."""
+    try:
+        return max(0.0, time.time() - os.stat(replica_path()).st_mtime)
+    except (OSError, KeyError):
+        return None
+
+
+def replica_is_fresh():
+    if not settings.REPLICA_ENABLED:
+        return False
+    now = time.monotonic()
+    if _lag_cache['checked'] is None or now - _lag_cache['checked'] > LAG_CHECK_INTERVAL:
+        _lag_cache.update(checked=now, lag=replica_lag())
+    lag = _lag_cache['lag']
+    return lag is not None and lag <= settings.REPLICA_MAX_LAG
+
+
+def reading_from_replica():
+    """True when distillery reads in the current context should go to the replica."""
+    return _reading.get() and replica_is_fresh()
+
+
+def is_pinned(request):
+    return request is not None and PIN_COOKIE in request.COOKIES
+
+
+@contextmanager
+def replica_reads(request=None):
+    """Send distillery reads in this block to the replica (unless ``request`` is pinned)."""
+    token = _reading.set(not is_pinned(request))
+    try:
+        yield
+    finally:
+        _reading.reset(token)
+
+
+def complete_on_replica(queryset, expected):
+    """``queryset``, or a copy pinned to the primary if the replica doesn't have all ``expected`` rows yet.
+
+    For reads of rows that may have only just been written, such as an export
+    of the batches just selected in the admin.
+    """
+    if reading_from_replica() and queryset.count() < expected:
+        return queryset.using(PRIMARY_DB)
+    return queryset
+
+
+def _iterate_on_replica(chunks, enabled):
+    token = _reading.set(enabled)
+    try:
+        yield from chunks
+    finally:
+        _reading.reset(token)
+
+
+def replica_view(view):
+    """Decorator for read-only views: serve their distillery reads from the replica.
+
+    Only GET and HEAD requests are routed; a streamed body keeps reading from
+    the replica while it is generated.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        enabled = request.method in ('GET', 'HEAD') and not is_pinned(request)
+        token = _reading.set(enabled)
+        try:
+            response = view(request, *args, **kwargs)
+        finally:
+            _reading.reset(token)
+        if enabled and getattr(response, 'streaming', False) and not getattr(response, 'is_async', False):
+            response.streaming_content = _iterate_on_replica(response.streaming_content, enabled)
+        return response
+    return wrapper
+
+
+def refresh_replica():
+    """Copy the primary into the replica file; returns the number of pages copied.
+
+    Uses SQLite's backup API in a single step, so readers of the replica see
+    either the old copy or the new one.
+    """
+    source_path = Path(settings.DATABASES[PRIMARY_DB]['NAME'])
+    target_path = replica_path()
+    if source_path.resolve() == target_path.resolve():
+        raise ValueError('The replica and primary databases are the same file.')
+    target_path.parent.mkdir(parents=True, exist_ok=True)
+    source = sqlite3.connect(f'file:{source_path}?mode=ro', uri=True)
+    try:
+        dest = sqlite3.connect(target_path)
+        try:
+            source.backup(dest)
+            pages = dest.execute('PRAGMA page_count').fetchone()[0]
+        finally:
+            dest.close()
+    finally:
+        source.close()
+    # The mtime is how staleness is measured
+    os.utime(target_path)
+    return pages
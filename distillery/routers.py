@@ -0,0 +1,47 @@
+class ArchiveRouter:
+    """Keep the archive database to the distillery app's tables.
+
+    Queries only reach the archive when code asks for it with
+    ``.using('archive')`` (see distillery.archive).
+    """
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == 'archive':
+            return app_label == 'distillery'
+        return None
+
+
+class ReplicaRouter:
+    """Route distillery reads to the replica inside replica_reads() blocks.
+
+    Auth, sessions and jobs always use the primary: they must see the latest
+    writes. The replica is a copy of the primary, so it is never migrated.
+    """
+
+    def db_for_read(self, model, **hints):
+        from .replica import REPLICA_DB, reading_from_replica
+
+        # Related lookups stay on the database their instance came from
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return None
+        if model._meta.app_label == 'distillery' and model._meta.model_name != 'job' and reading_from_replica():
+            return REPLICA_DB
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Objects read from the replica are saved to the primary
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db == 'replica':
+            return 'default'
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if {obj1._state.db, obj2._state.db} <= {'default', 'replica'}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == 'replica':
+            return False
+        return None
@@ -0,0 +1,115 @@
+"""Synthetic batches for benchmarks and load tests."""
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Batch, FermentationRecord, WashRecord, DistillationRecord, TotalsRecord, ProductRecord
+from .recipes import recipe_named
+
+
+RECIPES = ['Rye Whiskey', 'Wheat Whiskey', 'Single Malt', 'Rum', 'Gin Base', 'Vodka Base']
+TANKS = ['Fermenter 1', 'Fermenter 2', 'Fermenter 3', 'Still A', 'Still B', 'Tank 1', 'Tank 2', 'Faints Tank']
+
+
+def _litres(low, high):
+    return Decimal(str(round(random.uniform(low, high), 2)))
+
+
+def _distillation(model, description, day, **extra):
+    volume = _litres(200, 1000)
+    hearts = _litres(20, 120)
+    abv_hearts = round(random.uniform(60, 85), 2)
+    return model(
+        description=description,
+        faints_in_l=_litres(0, 40),
+        from_field=random.choice(TANKS),
+        to_field=random.choice(TANKS),
+        volume_in_l=volume,
+        start_date=day,
+        date=day,
+        fores_out=_litres(0.2, 1),
+        heads_out=_litres(1, 10),
+        hearts_out=hearts,
+        hearts_out_location=random.choice(TANKS),
+        tails_out=_litres(5, 40),
+        waste_out=_litres(50, 400),
+        abv_hearts=abv_hearts,
+        lal=round(float(hearts) * abv_hearts / 100, 2),
+        notes='Sample run',
+        **extra,
+    )
+
+
+def create_sample_batches(count, products_per_batch=2, seed=None):
+    """Create ``count`` fully populated batches after the highest batch number.
+
+    Returns the list of created batches.
+    """
+    rng_state = random.getstate()
+    if seed is not None:
+        random.seed(seed)
+    try:
+        start = (Batch.objects.aggregate(last=Max('batch_number'))['last'] or 0) + 1
+        today = timezone.localdate()
+        recipes = [recipe_named(name) for name in RECIPES]
+        batches = []
+        for offset in range(count):
+            day = today - timedelta(days=(count - offset) * 3)
+            sg_start = round(random.uniform(1.050, 1.080), 4)
+            sg_end = round(random.uniform(0.990, 1.005), 4)
+            volume = _litres(500, 2000)
+            abv = round((sg_start - sg_end) * 131.25, 2)
+            fermentation = FermentationRecord.objects.create(
+                to_field=random.choice(TANKS),
+                volume_in_l=volume,
+                start_date=day - timedelta(days=7),
+                sg_start=sg_start,
+                date=day,
+                sg_end=sg_end,
+                abv=abv,
+                lal=round(float(volume) * abv / 100, 2),
+                notes='Sample fermentation',
+            )
+            wash = _distillation(WashRecord, 'Wash Run', day, faints_out_location='Faints Tank')
+            wash.save()
+            spirit_1 = _distillation(DistillationRecord, 'Spirit Run 1', day + timedelta(days=1))
+            spirit_1.save()
+            spirit_2 = _distillation(DistillationRecord, 'Spirit Run 2', day + timedelta(days=2))
+            spirit_2.save()
+            totals = TotalsRecord.objects.create(
+                hearts_to_storage_location=random.choice(TANKS),
+                hearts_abv=round(random.uniform(60, 80), 2),
+                hearts_to_storage_l=_litres(50, 200),
+                faints_to_storage_location='Faints Tank',
+                faints_to_storage_l=_litres(10, 60),
+                faints_abv=round(random.uniform(20, 40), 2),
+                notes='Sample totals',
+            )
+            for index in range(products_per_batch):
+                final_abv = round(random.uniform(40, 65), 2)
+                final_l = _litres(20, 120)
+                ProductRecord.objects.create(
+                    totals_record=totals,
+                    product_name=chr(65 + index),
+                    final_abv=final_abv,
+                    final_l=final_l,
+                    distillation_location=random.choice(TANKS),
+                    lal=round(float(final_l) * final_abv / 100, 2),
+                )
+            batches.append(Batch.objects.create(
+                batch_number=start + offset,
+                recipe=random.choice(recipes),
+                notes='Sample batch',
+                fermentation=fermentation,
+                wash=wash,
+                spirit_1=spirit_1,
+                spirit_2=spirit_2,
+                totals=totals,
+            ))
+        return batches
+    finally:
+        if seed is not None:
+            random.setstate(rng_state)
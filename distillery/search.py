@@ -0,0 +1,269 @@
+"""Search grammar for the batch and full-log search boxes.
+
+A query is a list of terms, all of which must match::
+
+    #120                 batch 120
+    #100-150             batches 100 to 150
+    recipe:rye           recipe name contains "rye"
+    status:fermenting    batch status
+    date:2026-03         in March 2026 (a year, month or day)
+    date:2026-03..2026-06, date>2026-03-15, date<=2026
+    abv>60, abv:60..65   hearts ABV
+    loc:"Still A"        a vessel or location, exactly (ignoring case)
+
+Anything else is free text (searched as one phrase, as before); free text
+that is just a number means that batch number. Batch numbers, dates and
+numbers compile to exact or range lookups on the column itself (indexed for
+batch numbers and dates) instead of substring matches, which cast the column
+and scan every row.
+
+``parse()`` caches parsed queries; ``batch_filter()`` and ``record_filters()``
+turn them into ``Q`` objects. Bad input raises ``SearchError`` with a message
+for the user.
+"""
+import re
+from collections import namedtuple
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+
+from django.db.models import DateTimeField, Q
+from django.utils import timezone
+
+from .models import Batch, DistillationRecord, FermentationRecord, TotalsRecord, WashRecord
+
+
+class SearchError(ValueError):
+    """Raised for a search query that can't be parsed or used."""
+
+
+# ``key`` is None for free text; ``lookups`` is ``((lookup, value), ...)``, all of which must hold
+Term = namedtuple('Term', 'key lookups')
+
+KEYS = {
+    'batch': 'number',
+    'recipe': 'text',
+    'status': 'status',
+    'date': 'date',
+    'abv': 'number',
+    'loc': 'exact',
+}
+
+_TOKEN = re.compile(r'\s*(?:(?P<key>[a-z_]+)(?P<op>>=|<=|[:<>=]))?(?P<value>"[^"]*"|[^\s"]+)\s*', re.IGNORECASE)
+# ASCII only: \d also matches digits like "²" that int() rejects
+_BATCH_RANGE = re.compile(r'^(\d+)(?:-(\d+))?$', re.ASCII)
+_DATE = re.compile(r'^(\d{4})(?:-(\d{1,2}))?(?:-(\d{1,2}))?$', re.ASCII)
+_COMPARISONS = {'>': 'gt', '>=': 'gte', '<': 'lt', '<=': 'lte'}
+
+LOCATIONS = {
+    'fermentation': ['to_field'],
+    'wash': ['from_field', 'to_field', 'hearts_out_location', 'faints_out_location'],
+    'spirit_1': ['from_field', 'to_field', 'hearts_out_location'],
+    'spirit_2': ['from_field', 'to_field', 'hearts_out_location'],
+    'totals': ['hearts_to_storage_location', 'faints_to_storage_location'],
+}
+
+# Search key -> fields (any of which may match)
+BATCH_FIELDS = {
+    None: ['recipe__name'],
+    'batch': ['batch_number'],
+    'recipe': ['recipe__name'],
+    'status': ['status'],
+    'date': ['created_at'],
+    'abv': ['totals__hearts_abv'],
+    'loc': [f'{stage}__{field}' for stage, fields in LOCATIONS.items() for field in fields],
+}
+RECORD_FIELDS = {
+    FermentationRecord: {
+        None: ['description', 'to_field'],
+        'batch': ['batch__batch_number'],
+        'recipe': ['batch__recipe__name'],
+        'date': ['date'],
+        'abv': ['abv'],
+        'loc': LOCATIONS['fermentation'],
+    },
+    WashRecord: {
+        None: ['description', 'from_field', 'to_field'],
+        'batch': ['batch__batch_number'],
+        'recipe': ['batch__recipe__name'],
+        'date': ['date'],
+        'abv': ['abv_hearts'],
+        'loc': LOCATIONS['wash'],
+    },
+    DistillationRecord: {
+        None: ['description', 'from_field', 'to_field'],
+        'batch': ['batch_spirit1__batch_number', 'batch_spirit2__batch_number'],
+        'recipe': ['batch_spirit1__recipe__name', 'batch_spirit2__recipe__name'],
+        'date': ['date'],
+        'abv': ['abv_hearts'],
+        'loc': LOCATIONS['spirit_1'],
+    },
+    TotalsRecord: {
+        None: ['description'],
+        'batch': ['batch__batch_number'],
+        'recipe': ['batch__recipe__name'],
+        'date': ['created_at'],
+        'abv': ['hearts_abv'],
+        'loc': LOCATIONS['totals'],
+    },
+}
+
+
+def _number(text, key):
+    try:
+        return int(text) if key == 'batch' else float(text)
+    except ValueError:
+        raise SearchError(f'"{key}" needs a {"whole " if key == "batch" else ""}number, not "{text}".')
+
+
+def _period(text):
+    """``(first day, day after the last)`` of a year, month or day like 2026, 2026-03 or 2026-03-15."""
+    match = _DATE.match(text)
+    if not match:
+        raise SearchError(f'"{text}" is not a date like 2026, 2026-03 or 2026-03-15.')
+    year, month, day = (int(part) if part else None for part in match.groups())
+    try:
+        if day is not None:
+            start = date(year, month, day)
+            return start, start + timedelta(days=1)
+        if month is not None:
+            start = date(year, month, 1)
+            return start, date(year + month // 12, month % 12 + 1, 1)
+        return date(year, 1, 1), date(year + 1, 1, 1)
+    except ValueError:
+        raise SearchError(f'"{text}" is not a valid date.')
+
+
+def _range(text, parse_one):
+    """``(low, high)`` from "a..b", "a.." or "..b"; None for a missing end."""
+    low, sep, high = text.partition('..')
+    if not sep:
+        return None
+    if not low and not high:
+        raise SearchError('A range needs at least one end, like 60..65.')
+    return (parse_one(low) if low else None, parse_one(high) if high else None)
+
+
+def _number_term(key, op, text):
+    if key == 'batch':
+        match = _BATCH_RANGE.match(text) if op in (':', '=') else None
+        if match:
+            low, high = match.group(1), match.group(2) or match.group(1)
+            low, high = sorted((int(low), int(high)))
+            return Term(key, (('exact', low),) if low == high else (('gte', low), ('lte', high)))
+    if op in _COMPARISONS:
+        return Term(key, ((_COMPARISONS[op], _number(text, key)),))
+    bounds = _range(text, lambda part: _number(part, key))
+    if bounds is None:
+        return Term(key, (('exact', _number(text, key)),))
+    return Term(key, tuple((lookup, value) for lookup, value in zip(('gte', 'lte'), bounds) if value is not None))
+
+
+def _date_term(key, op, text):
+    if op in _COMPARISONS:
+        start, end = _period(text)
+        # "after March" starts in April; "up to March" ends with it
+        bound = {'>': ('gte', end), '>=': ('gte', start), '<': ('lt', start), '<=': ('lt', end)}[op]
+        return Term(key, (bound,))
+    bounds = _range(text, _period)
+    start, end = _period(text) if bounds is None else (
+        bounds[0] and bounds[0][0], bounds[1] and bounds[1][1]
+    )
+    return Term(key, tuple((lookup, value) for lookup, value in (('gte', start), ('lt', end)) if value is not None))
+
+
+def _term(key, op, text):
+    kind = KEYS[key]
+    if kind == 'number':
+        return _number_term(key, op, text)
+    if kind == 'date':
+        return _date_term(key, op, text)
+    if op not in (':', '='):
+        raise SearchError(f'"{key}" can only be matched with "{key}:", not "{op}".')
+    if not text:
+        raise SearchError(f'"{key}:" needs a value.')
+    if kind == 'status':
+        status = text.lower()
+        if status not in Batch.Status.values:
+            raise SearchError(f'Unknown status "{text}". Use one of: {", ".join(Batch.Status.values)}.')
+        return Term(key, (('exact', status),))
+    return Term(key, (('iexact' if kind == 'exact' else 'icontains', text),))
+
+
+@lru_cache(maxsize=256)
+def parse(query):
+    """The terms of ``query`` as a tuple of ``Term``; raises SearchError for bad input."""
+    terms = []
+    words = []
+    pos = 0
+    query = query.strip()
+    while pos < len(query):
+        match = _TOKEN.match(query, pos)
+        if not match:
+            raise SearchError('The search has an unclosed quote.')
+        pos = match.end()
+        key, op, value = match.group('key', 'op', 'value')
+        quoted = value.startswith('"')
+        if quoted:
+            value = value[1:-1]
+        if key is None:
+            if not quoted and value.startswith('#'):
+                terms.append(_number_term('batch', ':', value[1:]))
+            elif value:
+                words.append(value)
+            continue
+        key = key.lower()
+        if key not in KEYS:
+            raise SearchError(f'Unknown search "{key}{op}". Use one of: {", ".join(f"{name}:" for name in KEYS)}.')
+        terms.append(_term(key, op, value))
+    if words:
+        text = ' '.join(words)
+        terms.append(Term('batch', (('exact', int(text)),)) if text.isascii() and text.isdigit() else Term(None, (('icontains', text),)))
+    return tuple(terms)
+
+
+def _db_value(model, path, value):
+    """Dates compared with a datetime column become local midnight, so the column's index is used."""
+    field = model._meta.get_field(path.split('__')[0])
+    for name in path.split('__')[1:]:
+        field = field.related_model._meta.get_field(name)
+    if isinstance(field, DateTimeField) and isinstance(value, date):
+        return timezone.make_aware(datetime.combine(value, time.min))
+    return value
+
+
+def _compile(terms, model, fields):
+    """Q matching every term on ``model``, or None if a term has no field there."""
+    q = Q()
+    for term in terms:
+        if term.key not in fields:
+            return None
+        either = Q()
+        for path in fields[term.key]:
+            either |= Q(**{f'{path}__{lookup}': _db_value(model, path, value) for lookup, value in term.lookups})
+        q &= either
+    return q
+
+
+def _check_keys(terms, targets):
+    for term in terms:
+        if not any(term.key in fields for fields in targets):
+            raise SearchError(f'"{term.key}:" can\'t be searched here.')
+
+
+def batch_filter(query):
+    """Q for batches matching ``query``."""
+    terms = parse(query)
+    _check_keys(terms, [BATCH_FIELDS])
+    return _compile(terms, Batch, BATCH_FIELDS)
+
+
+def record_filters(query):
+    """``{record model: Q}`` for the full log; a model is left out when the query can't match it."""
+    terms = parse(query)
+    _check_keys(terms, RECORD_FIELDS.values())
+    filters = {}
+    for model, fields in RECORD_FIELDS.items():
+        q = _compile(terms, model, fields)
+        if q is not None:
+            filters[model] = q
+    return filters
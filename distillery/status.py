@@ -0,0 +1,76 @@
+"""Keeping ``Batch.status`` current, and the in-progress board.
+
+Linking a stage record goes through ``Batch.save()``, which sets the status
+itself. Products and record deletions change a batch's status without saving
+the batch, so the signal handlers here refresh it.
+"""
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
+from django.db.models.signals import post_delete, post_save, pre_delete
+
+from .models import (
+    STAGE_FIELDS, Batch, FermentationRecord, WashRecord, DistillationRecord, TotalsRecord, ProductRecord,
+)
+
+
+# Statuses shown on the board, in production order
+IN_PROGRESS = [status for status in Batch.Status if status != Batch.Status.BOTTLED]
+
+BOARD_LIMIT = 200
+
+
+def refresh_status(batches):
+    """Recompute and store the status of ``batches`` (a queryset)."""
+    for batch in batches:
+        if batch.update_status():
+            batch.save(update_fields=['status', 'status_changed_at'])
+
+
+def _product_changed(sender, instance, created=True, **kwargs):
+    # Edits don't change whether the totals have products; deletes have no "created"
+    if created:
+        refresh_status(Batch.objects.using(instance._state.db).filter(totals_id=instance.totals_record_id))
+
+
+def _record_deleting(sender, instance, **kwargs):
+    # The batch's link is nulled before post_delete, so note the batches now
+    fields = [field for field in STAGE_FIELDS if Batch._meta.get_field(field).related_model is sender]
+    links = Q(*[Q(**{field: instance.pk}) for field in fields], _connector=Q.OR)
+    instance._status_batches = list(Batch.objects.using(instance._state.db).filter(links).values_list('pk', flat=True))
+
+
+def _record_deleted(sender, instance, **kwargs):
+    if getattr(instance, '_status_batches', None):
+        refresh_status(Batch.objects.using(instance._state.db).filter(pk__in=instance._status_batches))
+
+
+post_save.connect(_product_changed, sender=ProductRecord, dispatch_uid='status-product-save')
+post_delete.connect(_product_changed, sender=ProductRecord, dispatch_uid='status-product-delete')
+for _model in (FermentationRecord, WashRecord, DistillationRecord, TotalsRecord):
+    pre_delete.connect(_record_deleting, sender=_model, dispatch_uid=f'status-{_model.__name__}-pre-delete')
+    post_delete.connect(_record_deleted, sender=_model, dispatch_uid=f'status-{_model.__name__}-delete')
+
+
+def board(limit=BOARD_LIMIT):
+    """``[(status, label, count, batches)]`` for each in-progress status, newest batches first.
+
+    One query over the status index: window functions number the batches
+    within each status and count them, and only the first ``limit`` of each
+    are fetched, so the board's cost doesn't grow with the number of batches.
+    """
+    columns = {status: [] for status in IN_PROGRESS}
+    counts = dict.fromkeys(IN_PROGRESS, 0)
+    batches = (
+        Batch.objects.filter(status__in=IN_PROGRESS).select_related('recipe')
+        .only('batch_number', 'recipe__name', 'status', 'status_changed_at')
+        .annotate(
+            position=Window(RowNumber(), partition_by='status', order_by=F('batch_number').desc()),
+            column_count=Window(Count('pk'), partition_by='status'),
+        )
+        .filter(position__lte=limit)
+        .order_by('status', '-batch_number')
+    )
+    for batch in batches:
+        columns[batch.status].append(batch)
+        counts[batch.status] = batch.column_count
+    return [(status, status.label, counts[status], columns[status]) for status in IN_PROGRESS]
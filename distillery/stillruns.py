@@ -0,0 +1,220 @@
+"""Still-run telemetry: storage, cut detection and cross-run comparison.
+
+A run's samples live in one ``StillRunTrace`` row as packed float32 arrays,
+so loading dozens of runs is one query plus a ``frombytes`` per column.
+Arrays are processed with C-level builtins (``array``, ``accumulate``,
+``bisect``) rather than per-sample Python objects.
+
+Cuts are found by integrating distillate flow over time and locating where
+the collected volume passes the run's recorded ``fores_out``, ``heads_out``,
+``hearts_out`` and ``tails_out`` totals.
+"""
+import math
+import sys
+from array import array
+from bisect import bisect_left
+from datetime import timedelta
+from itertools import accumulate
+
+from django.db import transaction
+
+from .models import StillRunTrace, WashRecord, DistillationRecord
+from .telemetry import TelemetryError, parse_number, parse_rows, parse_timestamp, pick
+
+
+COLUMNS = ('seconds', 'abv', 'temperature', 'flow')
+
+TIME_COLUMNS = ('taken_at', 'timestamp', 'time')
+ABV_COLUMNS = ('abv', 'distillate_abv')
+TEMPERATURE_COLUMNS = ('temperature', 'temp')
+FLOW_COLUMNS = ('flow', 'flow_l_per_h')
+
+# (boundary name, record fields whose totals are collected before it)
+CUTS = [
+    ('Heads', ['fores_out']),
+    ('Hearts', ['fores_out', 'heads_out']),
+    ('Tails', ['fores_out', 'heads_out', 'hearts_out']),
+    ('End', ['fores_out', 'heads_out', 'hearts_out', 'tails_out']),
+]
+
+# Record type (as in URLs) -> model
+RECORD_TYPES = {
+    'wash': WashRecord,
+    'distillation': DistillationRecord,
+}
+
+# Stage name -> (trace field, reverse path from the record to its batch)
+STAGES = {
+    'wash': ('wash', 'batch'),
+    'spirit_1': ('distillation', 'batch_spirit1'),
+    'spirit_2': ('distillation', 'batch_spirit2'),
+}
+
+MAX_OVERLAY_POINTS = 400
+
+
+def pack(values):
+    data = array('f', values)
+    if sys.byteorder == 'big':
+        data.byteswap()
+    return data.tobytes()
+
+
+def unpack(data):
+    values = array('f')
+    values.frombytes(bytes(data or b''))
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+def columns(trace):
+    """The trace's samples as ``{'seconds': array, 'abv': array, ...}``."""
+    return {name: unpack(getattr(trace, name)) for name in COLUMNS}
+
+
+def parse_samples(data, content_type=''):
+    """Parse a CSV/JSON upload into ``[(taken_at, abv, temperature, flow)]``.
+
+    Rows need a timestamp (``taken_at``, ``timestamp`` or ``time``) and any of
+    ``abv``, ``temperature`` and ``flow`` (L/h).
+    """
+    samples = []
+    for line, row in parse_rows(data, content_type):
+        values = [
+            parse_number(pick(row, ABV_COLUMNS), line, 'ABV'),
+            parse_number(pick(row, TEMPERATURE_COLUMNS), line, 'temperature'),
+            parse_number(pick(row, FLOW_COLUMNS), line, 'flow'),
+        ]
+        if all(value is None for value in values):
+            raise TelemetryError(f'Line {line}: needs an ABV, temperature or flow value.')
+        samples.append((parse_timestamp(pick(row, TIME_COLUMNS), line), *values))
+    return samples
+
+
+def ingest_samples(record, samples):
+    """Merge ``samples`` into the trace of ``record`` (a WashRecord or DistillationRecord).
+
+    Samples at a time already stored replace the old values. Returns the trace.
+    """
+    field = 'wash' if isinstance(record, WashRecord) else 'distillation'
+    with transaction.atomic():
+        trace = StillRunTrace.objects.select_for_update().filter(**{field: record}).first()
+        merged = {}
+        if trace is not None:
+            start = trace.started_at
+            existing = columns(trace)
+            for offset, *values in zip(*(existing[name] for name in COLUMNS)):
+                merged[start + timedelta(seconds=offset)] = values
+        for taken_at, *values in samples:
+            merged[taken_at] = [math.nan if value is None else value for value in values]
+        if not merged:
+            return trace
+
+        times = sorted(merged)
+        start = times[0]
+        trace = trace or StillRunTrace(**{field: record})
+        trace.started_at = start
+        trace.samples = len(times)
+        trace.seconds = pack((moment - start).total_seconds() for moment in times)
+        for index, name in enumerate(COLUMNS[1:]):
+            setattr(trace, name, pack(merged[moment][index] for moment in times))
+        trace.save()
+    return trace
+
+
+def collected_volume(seconds, flow):
+    """Cumulative litres collected at each sample (trapezoid rule over flow in L/h)."""
+    if not seconds:
+        return array('d')
+    rates = [0.0 if math.isnan(rate) else rate for rate in flow]
+    steps = (
+        (rates[i] + rates[i - 1]) / 2 * (seconds[i] - seconds[i - 1]) / 3600
+        for i in range(1, len(seconds))
+    )
+    return array('d', accumulate(steps, initial=0.0))
+
+
+def find_cuts(trace, record=None):
+    """Where each cut happened: ``[{'cut', 'volume', 'seconds', 'abv'}]``.
+
+    A cut is placed at the first sample where the collected volume reaches
+    the recorded totals of the fractions before it; cuts whose totals aren't
+    recorded, or that the trace never reaches, are omitted.
+    """
+    record = record or trace.record
+    data = columns(trace)
+    volume = collected_volume(data['seconds'], data['flow'])
+    cuts = []
+    for name, fields in CUTS:
+        totals = [getattr(record, field) for field in fields]
+        if any(total is None for total in totals):
+            continue
+        target = float(sum(totals))
+        index = bisect_left(volume, target)
+        if index >= len(volume):
+            continue
+        abv = data['abv'][index]
+        cuts.append({
+            'cut': name,
+            'volume': round(volume[index], 2),
+            'seconds': round(data['seconds'][index], 1),
+            'abv': None if math.isnan(abv) else round(abv, 2),
+        })
+    return cuts
+
+
+def _downsample(values, step):
+    return [None if math.isnan(value) else round(value, 3) for value in values[::step]]
+
+
+def recipe_runs(recipe, stage='spirit_1', limit=50, points=MAX_OVERLAY_POINTS):
+    """Traces of ``stage`` runs for batches of ``recipe`` (a Recipe or pk), with cuts and downsampled curves.
+
+    One query loads every run and its record; each entry has ``volume`` and
+    ``abv`` series (for overlaying ABV against litres collected) and ``cuts``.
+    """
+    field, batch_path = STAGES[stage]
+    traces = (
+        StillRunTrace.objects.select_related(field)
+        .filter(**{f'{field}__{batch_path}__recipe': recipe})
+        .order_by('-started_at')[:limit]
+    )
+    runs = []
+    for trace in traces:
+        record = getattr(trace, field)
+        data = columns(trace)
+        volume = collected_volume(data['seconds'], data['flow'])
+        step = max(1, math.ceil(len(volume) / points))
+        runs.append({
+            'trace': trace.pk,
+            'record': record.pk,
+            'description': str(record),
+            'started_at': trace.started_at.isoformat(),
+            'samples': trace.samples,
+            'duration': round(data['seconds'][-1], 1) if data['seconds'] else 0,
+            'cuts': find_cuts(trace, record),
+            'volume': [round(value, 3) for value in volume[::step]],
+            'abv': _downsample(data['abv'], step),
+        })
+    return runs
+
+
+def cut_summary(runs):
+    """Mean and spread of each cut's timing and volume across ``runs``."""
+    summary = []
+    for name, _ in CUTS:
+        found = [cut for run in runs for cut in run['cuts'] if cut['cut'] == name]
+        if not found:
+            continue
+        seconds = [cut['seconds'] for cut in found]
+        volumes = [cut['volume'] for cut in found]
+        summary.append({
+            'cut': name,
+            'runs': len(found),
+            'mean_seconds': round(sum(seconds) / len(seconds), 1),
+            'min_seconds': min(seconds),
+            'max_seconds': max(seconds),
+            'mean_volume': round(sum(volumes) / len(volumes), 2),
+        })
+    return summary
@@ -0,0 +1,214 @@
+"""Batched sync of record creates and edits queued offline.
+
+Devices on the still floor queue form submissions while offline and send
+them in one request when connectivity returns. ``apply_operations()`` applies
+them in a single transaction, each under its own savepoint, and returns a
+result per operation:
+
+``applied``
+    The record was created or updated.
+``conflict``
+    The server's data moved on: an edited field was changed by someone else
+    since the device loaded the form, the record is no longer linked to the
+    batch, or a create's section already has a record.
+``invalid``
+    The form didn't validate, or the operation is malformed.
+
+Operations are stored by their client id (``SyncOperation``), so a request
+retried after a dropped response returns the original results.
+
+An operation looks like::
+
+    {"id": "<uuid>", "action": "create", "batch": 12, "section": "Wash",
+     "data": {"description": "Wash Run", ...}}
+    {"id": "<uuid>", "action": "edit", "batch": 12, "record_type": "wash",
+     "record_id": 5, "data": {"hearts_out": "61.5"}, "original": {"hearts_out": "60"}}
+
+An edit sends only the fields the operator changed (``data``) with the values
+the form showed before the change (``original``).
+"""
+import uuid
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from .forms import RECORD_FORMS, SECTION_MAP
+from .models import Batch, SyncOperation
+
+
+MAX_OPERATIONS = 200
+
+
+class SyncError(ValueError):
+    """Raised for a sync request that can't be processed at all."""
+
+
+def _blank(value):
+    return None if value in ('', None) else value
+
+
+def _clean_or_none(field, value):
+    try:
+        return field.clean(value)
+    except ValidationError:
+        return None
+
+
+def _form_values(form):
+    """Current values of an unbound form as POST-style strings."""
+    return {name: '' if form[name].value() is None else str(form[name].value()) for name in form.fields}
+
+
+def _apply_create(op, batch):
+    section = op.get('section')
+    if section not in SECTION_MAP:
+        return {'status': SyncOperation.Status.INVALID, 'message': f'Unknown section: {section}'}
+    field, FormClass, _ = SECTION_MAP[section]
+    existing = getattr(batch, f'{field}_id')
+    if existing is not None:
+        return {
+            'status': SyncOperation.Status.CONFLICT,
+            'message': f'Batch #{batch.batch_number} already has a {section} record.',
+            'record_id': existing,
+        }
+    form = FormClass(op.get('data') or {})
+    if not form.is_valid():
+        return {'status': SyncOperation.Status.INVALID, 'errors': form.errors.get_json_data()}
+    record = form.save()
+    setattr(batch, field, record)
+    batch.save()
+    return {'status': SyncOperation.Status.APPLIED, 'record_id': record.pk}
+
+
+def _apply_edit(op, batch):
+    record_type = op.get('record_type')
+    if record_type not in RECORD_FORMS:
+        return {'status': SyncOperation.Status.INVALID, 'message': f'Unknown record type: {record_type}'}
+    FormClass = RECORD_FORMS[record_type]
+    record = getattr(batch, record_type)
+    if record is None or str(record.pk) != str(op.get('record_id')):
+        return {
+            'status': SyncOperation.Status.CONFLICT,
+            'message': f'The record is no longer linked to Batch #{batch.batch_number}.',
+        }
+
+    fields = FormClass.base_fields
+    changes = {name: value for name, value in (op.get('data') or {}).items() if name in fields}
+    conflicts = {}
+    for name, original in (op.get('original') or {}).items():
+        if name not in changes:
+            continue
+        try:
+            expected = _blank(fields[name].clean(original))
+        except ValidationError:
+            expected = original
+        current = _blank(getattr(record, name))
+        # Someone else changed it, unless they changed it to the same value
+        if current != expected and current != _blank(_clean_or_none(fields[name], changes[name])):
+            conflicts[name] = '' if current is None else str(current)
+    if conflicts:
+        return {
+            'status': SyncOperation.Status.CONFLICT,
+            'message': 'Changed by someone else since the form was loaded.',
+            'current': conflicts,
+        }
+
+    # Apply only the operator's changes on top of the current record
+    form = FormClass({**_form_values(FormClass(instance=record)), **changes}, instance=record)
+    if not form.is_valid():
+        return {'status': SyncOperation.Status.INVALID, 'errors': form.errors.get_json_data()}
+    form.save()
+    return {'status': SyncOperation.Status.APPLIED, 'record_id': record.pk, 'fields': sorted(record.saved_fields)}
+
+
+def _shape_error(op):
+    """What is wrong with the JSON types in ``op``, or None; the fields come straight from the client."""
+    for key in ('section', 'record_type'):
+        if not isinstance(op.get(key), (str, type(None))):
+            return f'"{key}" must be a string.'
+    for key in ('data', 'original'):
+        values = op.get(key)
+        if values is None:
+            continue
+        if not isinstance(values, dict):
+            return f'"{key}" must be an object.'
+        for name, value in values.items():
+            if not isinstance(value, (str, int, float, bool, type(None))):
+                return f'"{key}.{name}" must be a string, number or null.'
+    return None
+
+
+def _apply(op):
+    if op.get('action') not in ('create', 'edit'):
+        return {'status': SyncOperation.Status.INVALID, 'message': f"Unknown action: {op.get('action')}"}
+    error = _shape_error(op)
+    if error:
+        return {'status': SyncOperation.Status.INVALID, 'message': error}
+    batch = Batch.objects.filter(batch_number=_batch_number(op)).first()
+    if batch is None:
+        return {'status': SyncOperation.Status.INVALID, 'message': f"Batch #{op.get('batch')} does not exist."}
+    if op['action'] == 'create':
+        return _apply_create(op, batch)
+    return _apply_edit(op, batch)
+
+
+def _batch_number(op):
+    try:
+        return int(op.get('batch'))
+    except (TypeError, ValueError):
+        return None
+
+
+def _op_id(op):
+    try:
+        return uuid.UUID(str(op.get('id')))
+    except ValueError:
+        raise SyncError(f"Operation id {op.get('id')!r} is not a UUID.")
+
+
+def apply_operations(operations):
+    """Apply queued operations in one transaction; returns ``[{'id', 'status', ...}]`` in order.
+
+    Operations already applied (same id) aren't applied again; their stored
+    result is returned with ``duplicate`` set.
+    """
+    if not isinstance(operations, list) or not all(isinstance(op, dict) for op in operations):
+        raise SyncError('"operations" must be a list of objects.')
+    if len(operations) > MAX_OPERATIONS:
+        raise SyncError(f'Send at most {MAX_OPERATIONS} operations at a time.')
+    op_ids = [_op_id(op) for op in operations]
+
+    results = []
+    with transaction.atomic():
+        done = {
+            sync.op_id: sync.result
+            for sync in SyncOperation.objects.filter(op_id__in=op_ids)
+        }
+        for op_id, op in zip(op_ids, operations):
+            if op_id in done:
+                results.append({**done[op_id], 'duplicate': True})
+                continue
+            savepoint = transaction.savepoint()
+            result = _apply(op)
+            if result['status'] == SyncOperation.Status.APPLIED:
+                transaction.savepoint_commit(savepoint)
+            else:
+                transaction.savepoint_rollback(savepoint)
+            result = {'id': str(op_id), **result}
+            try:
+                queued_at = parse_datetime(str(op.get('queued_at') or ''))
+            except ValueError:
+                queued_at = None
+            SyncOperation.objects.create(
+                op_id=op_id,
+                action=str(op.get('action'))[:10],
+                batch_number=_batch_number(op),
+                target=str(op.get('section') or op.get('record_type') or '')[:20],
+                status=result['status'],
+                result=result,
+                queued_at=queued_at,
+            )
+            done[op_id] = result
+            results.append(result)
+    return results
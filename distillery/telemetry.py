@@ -0,0 +1,243 @@
+"""Hydrometer telemetry for fermentations.
+
+Readings arrive in batches (CSV or JSON) from the ingest endpoint or the
+``ingest_readings`` command. ``ingest_readings()`` stores them, skipping
+duplicates, and recomputes the hourly rollups for just the hours it touched.
+Raw readings older than ``TELEMETRY_RAW_RETENTION_DAYS`` are removed by
+``prune_readings()``; charts read the rollups, which are kept.
+"""
+import csv
+import io
+import json
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg, Count, Max, Min
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .migration_utils import pk_chunks
+from .models import FermentationReading, FermentationRollup
+
+
+BULK_SIZE = 500
+
+TIME_COLUMNS = ('taken_at', 'timestamp', 'time')
+SG_COLUMNS = ('sg', 'gravity')
+TEMPERATURE_COLUMNS = ('temperature', 'temp')
+
+
+class TelemetryError(ValueError):
+    """Raised for uploads that can't be parsed."""
+
+
+def pick(row, names):
+    for name in names:
+        value = row.get(name)
+        if value not in (None, ''):
+            return value
+    return None
+
+
+def parse_number(value, line, name):
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise TelemetryError(f'Line {line}: {name} "{value}" is not a number.')
+
+
+def parse_timestamp(value, line):
+    try:
+        taken_at = parse_datetime(str(value).strip()) if value is not None else None
+    except ValueError:
+        # Well formed but impossible, such as February 30th
+        taken_at = None
+    if taken_at is None:
+        raise TelemetryError(f'Line {line}: missing or invalid timestamp (use ISO 8601).')
+    if timezone.is_naive(taken_at):
+        taken_at = timezone.make_aware(taken_at)
+    return taken_at
+
+
+def parse_rows(data, content_type=''):
+    """Parse a CSV (with a header row) or JSON upload into ``[(line, {column: value})]``.
+
+    JSON is a list of objects, or ``{"readings": [...]}``. Column names are
+    lower-cased.
+    """
+    if isinstance(data, bytes):
+        data = data.decode('utf-8-sig')
+    text = data.strip()
+    if 'json' in content_type or text.startswith(('[', '{')):
+        try:
+            payload = json.loads(text)
+        except json.JSONDecodeError as exc:
+            raise TelemetryError(f'Invalid JSON: {exc}')
+        if isinstance(payload, dict):
+            payload = payload.get('readings')
+        if not isinstance(payload, list) or not all(isinstance(row, dict) for row in payload):
+            raise TelemetryError('JSON must be a list of reading objects.')
+        rows = enumerate(payload, start=1)
+    else:
+        rows = enumerate(csv.DictReader(io.StringIO(text)), start=2)
+    return [(line, {str(key).strip().lower(): value for key, value in row.items()}) for line, row in rows]
+
+
+def _reading(row, line):
+    sg = parse_number(pick(row, SG_COLUMNS), line, 'SG')
+    temperature = parse_number(pick(row, TEMPERATURE_COLUMNS), line, 'temperature')
+    if sg is None and temperature is None:
+        raise TelemetryError(f'Line {line}: needs an SG or temperature value.')
+    return {'taken_at': parse_timestamp(pick(row, TIME_COLUMNS), line), 'sg': sg, 'temperature': temperature}
+
+
+def parse_readings(data, content_type=''):
+    """Parse a CSV or JSON upload into reading dicts.
+
+    Rows need a timestamp column (``taken_at``, ``timestamp`` or ``time``)
+    and ``sg`` and/or ``temperature``.
+    """
+    return [_reading(row, line) for line, row in parse_rows(data, content_type)]
+
+
+def retention_cutoff():
+    """Readings before this hour are pruned (and refused on ingest)."""
+    cutoff = timezone.now() - timedelta(days=settings.TELEMETRY_RAW_RETENTION_DAYS)
+    return cutoff.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def _hour(moment):
+    return moment.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def refresh_rollups(fermentation_id, hours):
+    """Recompute the rollups of ``fermentation_id`` for ``hours`` from the raw readings."""
+    if not hours:
+        return 0
+    rows = (
+        FermentationReading.objects.filter(
+            fermentation_id=fermentation_id,
+            taken_at__gte=min(hours),
+            taken_at__lt=max(hours) + timedelta(hours=1),
+        )
+        .annotate(hour=TruncHour('taken_at', tzinfo=dt_timezone.utc))
+        .values('hour')
+        .annotate(
+            count=Count('id'),
+            sg_min=Min('sg'), sg_max=Max('sg'), sg_mean=Avg('sg'),
+            temperature_min=Min('temperature'), temperature_max=Max('temperature'), temperature_mean=Avg('temperature'),
+        )
+        .order_by()
+    )
+    rollups = [
+        FermentationRollup(
+            fermentation_id=fermentation_id,
+            hour=row['hour'],
+            readings=row['count'],
+            sg_min=row['sg_min'], sg_max=row['sg_max'], sg_mean=row['sg_mean'],
+            temperature_min=row['temperature_min'], temperature_max=row['temperature_max'],
+            temperature_mean=row['temperature_mean'],
+        )
+        for row in rows if row['hour'] in hours
+    ]
+    FermentationRollup.objects.bulk_create(
+        rollups,
+        update_conflicts=True,
+        unique_fields=['fermentation', 'hour'],
+        update_fields=[
+            'readings', 'sg_min', 'sg_max', 'sg_mean',
+            'temperature_min', 'temperature_max', 'temperature_mean',
+        ],
+    )
+    return len(rollups)
+
+
+def ingest_readings(fermentation, readings):
+    """Store ``readings`` for ``fermentation`` and update the affected hourly rollups.
+
+    Readings already stored (same timestamp) are ignored, so re-sending a file
+    is harmless. Readings older than the retention window are skipped.
+    Returns a dict of counts.
+    """
+    cutoff = retention_cutoff()
+    fresh = [reading for reading in readings if reading['taken_at'] >= cutoff]
+    hours = {_hour(reading['taken_at']) for reading in fresh}
+    with transaction.atomic():
+        before = fermentation.readings.count()
+        FermentationReading.objects.bulk_create(
+            [FermentationReading(fermentation=fermentation, **reading) for reading in fresh],
+            batch_size=BULK_SIZE,
+            ignore_conflicts=True,
+        )
+        stored = fermentation.readings.count() - before
+        refresh_rollups(fermentation.pk, hours)
+    return {
+        'received': len(readings),
+        'stored': stored,
+        'duplicates': len(fresh) - stored,
+        'too_old': len(readings) - len(fresh),
+        'hours': len(hours),
+    }
+
+
+def prune_readings(cutoff=None, chunk_size=5000):
+    """Delete raw readings taken before ``cutoff``, a chunk per transaction; returns the count."""
+    cutoff = retention_cutoff() if cutoff is None else cutoff
+    deleted = 0
+    for pks in pk_chunks(FermentationReading.objects.filter(taken_at__lt=cutoff), chunk_size):
+        with transaction.atomic():
+            deleted += FermentationReading.objects.filter(pk__in=pks).delete()[0]
+    return deleted
+
+
+def _scale(values, low, high, size, invert=False):
+    span = (high - low) or 1
+    return [((value - low) / span * size) if not invert else size - (value - low) / span * size for value in values]
+
+
+def fermentation_curve(fermentation, width=800, height=200):
+    """SVG polyline data for the SG (mean and min-max band) and temperature rollups, or None."""
+    rollups = list(
+        FermentationRollup.objects.filter(fermentation=fermentation)
+        .order_by('hour')
+        .values_list('hour', 'sg_min', 'sg_max', 'sg_mean', 'temperature_mean')
+    )
+    if not rollups:
+        return None
+    start, end = rollups[0][0], rollups[-1][0]
+    seconds = (end - start).total_seconds() or 1
+    xs = [(hour - start).total_seconds() / seconds * width for hour, *_ in rollups]
+
+    def line(points):
+        return ' '.join(f'{x:.1f},{y:.1f}' for x, y in points)
+
+    curve = {'start': start, 'end': end, 'hours': len(rollups), 'width': width, 'height': height}
+    sg = [(x, row) for x, row in zip(xs, rollups) if row[3] is not None]
+    if sg:
+        low = min(row[1] for _, row in sg)
+        high = max(row[2] for _, row in sg)
+        x_values = [x for x, _ in sg]
+        mean = _scale([row[3] for _, row in sg], low, high, height, invert=True)
+        top = _scale([row[2] for _, row in sg], low, high, height, invert=True)
+        bottom = _scale([row[1] for _, row in sg], low, high, height, invert=True)
+        curve.update(
+            sg_line=line(zip(x_values, mean)),
+            sg_band=line([*zip(x_values, top), *reversed(list(zip(x_values, bottom)))]),
+            sg_low=low,
+            sg_high=high,
+        )
+    temperature = [(x, row[4]) for x, row in zip(xs, rollups) if row[4] is not None]
+    if temperature:
+        low = min(value for _, value in temperature)
+        high = max(value for _, value in temperature)
+        scaled = _scale([value for _, value in temperature], low, high, height, invert=True)
+        curve.update(
+            temperature_line=line(zip([x for x, _ in temperature], scaled)),
+            temperature_low=low,
+            temperature_high=high,
+        )
+    return curve
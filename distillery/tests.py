@@ -1,3 +1,1555 @@
-from django.test import TestCase
+import ast
+import asyncio
+import gzip
+import io
+import shutil
+import sqlite3
+import tempfile
+import uuid
+import zlib
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import call_command
+from django.templatetags.static import static
+from django.db import connection, connections
+from django.db.migrations.recorder import MigrationRecorder
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, resolve, reverse
+from django.utils import timezone
+from django.utils.http import urlencode
+
+from .admin import BatchAdmin, EstimatedCountPaginator
+from .archive import ARCHIVE_DB, ArchiveError, _move_plan, archive_migrated, archive_batches, move_batches, restore_batch
+from .audit import run_audit
+from .backups import backup_database, list_backups, restore_database
+from .bootstrap import ensure_admin, migration_names, unapplied_migrations
+from .compare import parse_batch_numbers
+from .forms import ProductRecordForm, WashRecordForm
+from .jobs import HANDLERS, claim_next, enqueue, heartbeat, requeue_interrupted, run_job
+from .lineage import ancestry, descendants, provenance_tree
+from .loadtest import RECIPE as LOADTEST_RECIPE, parse_mix, percentile
+from .recipes import recipe_named, refresh_stats
+from .sync import apply_operations
+from .stillruns import cut_summary, find_cuts, ingest_samples, parse_samples, recipe_runs
+from .telemetry import TelemetryError, ingest_readings, parse_readings
+from .trends import trend
+from .querybudget import QueryCounter, budget_for, report
+from .migration_utils import backfill, pk_chunks, update_in_chunks
+from .replica import PIN_COOKIE, REPLICA_DB, _lag_cache
+from .models import (
+    Batch, FermentationRollup, FermentationRecord, WashRecord, DistillationRecord, TotalsRecord, ProductRecord,
+    AuditFinding, AuditRun, FaintsTransfer, Job, FermentationReading, Recipe, StillRunTrace, SyncOperation,
+)
+from .sampledata import create_sample_batches
+from .snapshots import write_snapshot
+from .status import board
+from tdist import urls
+from tdist.middleware import CompressionMiddleware, QueryBudgetMiddleware
+
+
+class ArchiveTests(TestCase):
+    databases = {'default', ARCHIVE_DB}
+
+    def setUp(self):
+        self.old, self.recent = create_sample_batches(2, seed=1)
+        # Age the first batch and everything hanging off it
+        past = timezone.now() - timedelta(days=400)
+        for record in (self.old.fermentation, self.old.wash, self.old.spirit_1, self.old.spirit_2, self.old.totals):
+            type(record).objects.filter(pk=record.pk).update(updated_at=past)
+        ProductRecord.objects.filter(totals_record=self.old.totals).update(updated_at=past)
+        Batch.objects.filter(pk=self.old.pk).update(updated_at=past)
+
+    def test_archives_only_batches_untouched_since_cutoff(self):
+        moved = archive_batches(timezone.now() - timedelta(days=365))
+
+        self.assertEqual(moved, [self.old.batch_number])
+        self.assertFalse(Batch.objects.filter(pk=self.old.pk).exists())
+        archived = Batch.objects.using(ARCHIVE_DB).get(pk=self.old.pk)
+        self.assertEqual(archived.wash.hearts_out, self.old.wash.hearts_out)
+        self.assertEqual(archived.totals.products.count(), 2)
+        self.assertLess(archived.updated_at, timezone.now() - timedelta(days=365))
+        self.assertTrue(Batch.objects.filter(pk=self.recent.pk).exists())
+
+    def test_restore_round_trips_rows(self):
+        archive_batches(timezone.now() - timedelta(days=365))
+
+        self.assertTrue(restore_batch(self.old.batch_number))
+        restored = Batch.objects.get(pk=self.old.pk)
+        self.assertEqual(restored.spirit_2_id, self.old.spirit_2_id)
+        self.assertEqual(ProductRecord.objects.filter(totals_record_id=restored.totals_id).count(), 2)
+        self.assertFalse(Batch.objects.using(ARCHIVE_DB).exists())
+
+    def test_audit_findings_move_with_their_batch(self):
+        run_audit(full=True)
+        findings = AuditFinding.objects.filter(batch=self.old).count()
+        self.assertGreater(findings, 0)
+
+        archive_batches(timezone.now() - timedelta(days=365))
+
+        self.assertFalse(Batch.objects.filter(pk=self.old.pk).exists())
+        self.assertFalse(AuditFinding.objects.filter(batch_id=self.old.pk).exists())
+        self.assertEqual(AuditFinding.objects.using(ARCHIVE_DB).filter(batch_id=self.old.pk).count(), findings)
+
+        restore_batch(self.old.batch_number)
+        self.assertEqual(AuditFinding.objects.filter(batch=self.old).count(), findings)
+
+    def test_move_fails_cleanly_when_rows_still_reference_the_batch(self):
+        run_audit(full=True)
+        plan = _move_plan
+        unplanned = lambda batch_pks, source: [(model, pks) for model, pks in plan(batch_pks, source) if model is not AuditFinding]
+
+        with mock.patch('distillery.archive._move_plan', unplanned), self.assertRaises(ArchiveError):
+            archive_batches(timezone.now() - timedelta(days=365))
+
+        self.assertTrue(Batch.objects.filter(pk=self.old.pk).exists())
+        self.assertFalse(Batch.objects.using(ARCHIVE_DB).exists())
+
+    def test_log_page_leaves_archived_batch_until_restored(self):
+        archive_batches(timezone.now() - timedelta(days=365))
+
+        response = self.client.get(reverse('log', args=[self.old.batch_number]))
+
+        self.assertContains(response, reverse('restore_archived_batch', args=[self.old.batch_number]))
+        self.assertFalse(Batch.objects.filter(pk=self.old.pk).exists())
+        self.assertEqual(self.client.get(reverse('restore_archived_batch', args=[self.old.batch_number])).status_code, 405)
+
+        response = self.client.post(reverse('restore_archived_batch', args=[self.old.batch_number]))
+
+        self.assertRedirects(response, reverse('log', args=[self.old.batch_number]))
+        self.assertTrue(Batch.objects.filter(pk=self.old.pk).exists())
+        self.assertFalse(Batch.objects.using(ARCHIVE_DB).exists())
+
+    def test_pages_work_before_the_archive_is_migrated(self):
+        with connections[ARCHIVE_DB].cursor() as cursor:
+            for table in connections[ARCHIVE_DB].introspection.table_names(cursor):
+                cursor.execute(f'DROP TABLE {connections[ARCHIVE_DB].ops.quote_name(table)}')
+        self.assertFalse(archive_migrated())
+        number = self.recent.batch_number + 1
+
+        self.assertEqual(self.client.get(reverse('create_batch')).status_code, 200)
+        response = self.client.post(reverse('create_batch'), {'batch_number': number, 'recipe': 'Test'})
+        self.assertRedirects(response, reverse('log', args=[number]))
+        self.assertEqual(self.client.get(reverse('log', args=[number + 1])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('trends_data')).status_code, 200)
+        self.assertEqual(self.client.get(reverse('index'), {'q': str(number), 'archive': '1'}).status_code, 200)
+        self.assertEqual(self.client.get(reverse('full_log'), {'archive': '1'}).status_code, 200)
+        self.assertEqual(self.client.post(reverse('restore_archived_batch', args=[number + 1])).status_code, 404)
+
+    def test_search_includes_archive_only_when_asked(self):
+        archive_batches(timezone.now() - timedelta(days=365))
+        query = str(self.old.batch_number)
+
+        hot_only = self.client.get(reverse('index'), {'q': query})
+        with_archive = self.client.get(reverse('index'), {'q': query, 'archive': '1'})
+
+        self.assertNotIn(self.old.pk, [batch.pk for batch in hot_only.context['batches']])
+        self.assertIn(self.old.pk, [batch.pk for batch in with_archive.context['batches']])
+
+
+class AdminChangelistTests(TestCase):
+    models = (Batch, FermentationRecord, WashRecord, DistillationRecord, TotalsRecord, ProductRecord)
+
+    def setUp(self):
+        user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.client.force_login(user)
+
+    def changelist_queries(self, model):
+        url = reverse(f'admin:distillery_{model._meta.model_name}_changelist')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return queries
+
+    def test_query_count_does_not_grow_with_rows(self):
+        create_sample_batches(1, seed=1)
+        small = {model: len(self.changelist_queries(model)) for model in self.models}
+        create_sample_batches(9, seed=2)
+        large = {model: len(self.changelist_queries(model)) for model in self.models}
+
+        self.assertEqual(small, large)
+
+    def test_notes_column_is_not_loaded(self):
+        create_sample_batches(1, seed=1)
+        for model in self.models:
+            with self.subTest(model=model.__name__):
+                column = connection.ops.quote_name('notes')
+                queries = self.changelist_queries(model)
+                self.assertFalse(any(column in query['sql'] for query in queries), model)
+
+    def test_changelists_of_models_without_notes(self):
+        for model in (FermentationReading, FermentationRollup, StillRunTrace):
+            with self.subTest(model=model.__name__):
+                self.changelist_queries(model)
+
+    def test_estimated_count_for_large_unfiltered_tables(self):
+        create_sample_batches(3, seed=1)
+        Batch.objects.order_by('pk').first().delete()
+
+        class Paginator(EstimatedCountPaginator):
+            exact_limit = 1
+
+        last_pk = Batch.objects.order_by('-pk').values_list('pk', flat=True).first()
+        self.assertEqual(Paginator(Batch.objects.all(), 100).count, last_pk)
+        self.assertEqual(Paginator(Batch.objects.filter(recipe__isnull=False), 100).count, 2)
+
+    def test_estimate_is_clamped_at_the_end_of_the_table(self):
+        batches = create_sample_batches(5, seed=1)
+        Batch.objects.filter(pk__in=[batch.pk for batch in batches[:2]]).delete()
+        remaining = list(Batch.objects.order_by('pk').values_list('pk', flat=True))
+
+        class Paginator(EstimatedCountPaginator):
+            exact_limit = 1
+
+        short = Paginator(Batch.objects.order_by('pk'), 2)
+        self.assertGreater(short.num_pages, 2)
+        with self.assertNumQueries(1):
+            page = short.page(2)
+        self.assertEqual(([batch.pk for batch in page], short.count, short.num_pages), (remaining[2:], 3, 2))
+
+        past_end = Paginator(Batch.objects.order_by('pk'), 2)
+        page = past_end.page(past_end.num_pages)
+        self.assertEqual(([batch.pk for batch in page], page.number, past_end.count), (remaining[2:], 2, 3))
+
+    def test_changelist_page_past_the_estimated_end(self):
+        batches = create_sample_batches(5, seed=1)
+        Batch.objects.filter(pk__in=[batch.pk for batch in batches[:2]]).delete()
+        url = reverse('admin:distillery_batch_changelist')
+
+        with mock.patch.object(EstimatedCountPaginator, 'exact_limit', 1), mock.patch.object(BatchAdmin, 'list_per_page', 2):
+            estimated = self.client.get(url).context['cl'].paginator.num_pages
+            response = self.client.get(url, {'p': estimated})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.context['cl'].result_count, response.context['cl'].page_num), (3, 2))
+
+    def test_batch_form_does_not_grow_with_records(self):
+        first = create_sample_batches(1, seed=1)[0]
+        url = reverse('admin:distillery_batch_change', args=[first.pk])
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as small:
+            small_response = self.client.get(url)
+        create_sample_batches(9, seed=2)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(small), len(large))
+        # Only the current selections are rendered, not every record
+        self.assertEqual(small_response.content.count(b'<option'), response.content.count(b'<option'))
+
+    def test_record_autocomplete_offers_unlinked_and_current_records(self):
+        first, second = create_sample_batches(2, seed=1)
+        spare = DistillationRecord.objects.create(description='Spare run')
+        params = {'app_label': 'distillery', 'model_name': 'batch', 'field_name': 'spirit_1', 'batch': first.pk}
+
+        response = self.client.get(reverse('admin:autocomplete'), params)
+
+        offered = {int(result['id']) for result in response.json()['results']}
+        self.assertEqual(offered, {first.spirit_1_id, first.spirit_2_id, spare.pk})
+
+
+class MigrationUtilsTests(TestCase):
+    def setUp(self):
+        create_sample_batches(5, seed=1)
+
+    def test_pk_chunks_cover_every_row_once(self):
+        chunks = list(pk_chunks(ProductRecord.objects.all(), chunk_size=3))
+
+        self.assertEqual([len(chunk) for chunk in chunks], [3, 3, 3, 1])
+        self.assertEqual(sum(chunks, []), sorted(ProductRecord.objects.values_list('pk', flat=True)))
+
+    def test_backfill_writes_returned_related_objects(self):
+        batches = Batch.objects.filter(wash__isnull=False)
+
+        def update(batch):
+            if batch.batch_number % 2:
+                batch.wash.to_field = f'Still {batch.batch_number}'
+                return batch.wash
+
+        written = backfill(batches, update, ['to_field'], chunk_size=2, select_related=('wash',), progress=lambda *args: None)
+
+        odd = [batch for batch in batches.select_related('wash') if batch.batch_number % 2]
+        self.assertEqual(written, len(odd))
+        self.assertTrue(all(batch.wash.to_field == f'Still {batch.batch_number}' for batch in odd))
+
+    def test_update_in_chunks_rechecks_filter(self):
+        updated = update_in_chunks(
+            ProductRecord.objects.filter(product_name='A'), chunk_size=2, progress=lambda *args: None, distillation_location='Shed',
+        )
+
+        self.assertEqual(updated, ProductRecord.objects.filter(product_name='A').count())
+        self.assertFalse(ProductRecord.objects.exclude(product_name='A').filter(distillation_location='Shed').exists())
+
+    def test_migrations_do_not_import_project_code(self):
+        for path in sorted((Path(__file__).parent / 'migrations').glob('0*.py')):
+            with self.subTest(migration=path.stem):
+                imported = [
+                    name
+                    for node in ast.walk(ast.parse(path.read_text()))
+                    for name in (
+                        [node.module] if isinstance(node, ast.ImportFrom)
+                        else [alias.name for alias in node.names] if isinstance(node, ast.Import) else []
+                    )
+                ]
+                self.assertFalse([name for name in imported if name.split('.')[0] in ('distillery', 'tdist')])
+
+
+class StaticFilesTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+        production = override_settings(
+            STATIC_ROOT=self.root,
+            WHITENOISE_AUTOREFRESH=False,
+            STORAGES={
+                'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+                'staticfiles': {'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage'},
+            },
+        )
+        production.enable()
+        self.addCleanup(production.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    def test_collectstatic_writes_hashed_compressed_files(self):
+        url = static('css/app.css')
+
+        self.assertRegex(url, r'^/static/css/app\.[0-9a-f]{12}\.css$')
+        self.assertTrue((self.root / url.removeprefix('/static/')).exists())
+        self.assertTrue((self.root / (url.removeprefix('/static/') + '.gz')).exists())
+
+    def test_hashed_files_are_served_with_far_future_caching(self):
+        response = self.client.get(static('js/app.js'), HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', response['Cache-Control'])
+        response.close()
+
+    def test_unhashed_names_get_a_short_max_age(self):
+        response = self.client.get('/static/js/app.js')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('max-age=3600', response['Cache-Control'])
+        self.assertNotIn('immutable', response['Cache-Control'])
+        response.close()
+
+
+@override_settings(COMPRESSION_MIN_LENGTH=500, COMPRESSION_CONTENT_TYPES=('text/', 'application/json'))
+class CompressionTests(TestCase):
+    body = b'Batch,Recipe,ABV\n' * 100
+
+    def compress(self, response, accept='gzip, deflate'):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_short_bodies_are_left_alone(self):
+        response = self.compress(HttpResponse(self.body[:400], content_type='text/csv'))
+
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, self.body[:400])
+
+    def test_only_allowed_content_types_are_compressed(self):
+        for content_type, compressed in [('text/csv; charset=utf-8', True), ('application/json', True), ('image/png', False)]:
+            with self.subTest(content_type=content_type):
+                response = self.compress(HttpResponse(self.body, content_type=content_type))
+                self.assertEqual(response.get('Content-Encoding') == 'gzip', compressed)
+                self.assertEqual(gzip.decompress(response.content) if compressed else response.content, self.body)
+
+    def test_streaming_responses_are_compressed(self):
+        response = self.compress(StreamingHttpResponse(iter([b'Batch', b',Recipe\n'] * 5), content_type='text/csv'))
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('Content-Length'))
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), b'Batch,Recipe\n' * 5)
+
+    def test_async_streaming_responses_are_one_gzip_member(self):
+        async def chunks():
+            for _ in range(5):
+                yield b'Batch,Recipe\n'
+
+        async def read(response):
+            return b''.join([chunk async for chunk in response.streaming_content])
+
+        response = self.compress(StreamingHttpResponse(chunks(), content_type='text/csv'))
+        member = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+        self.assertEqual(member.decompress(asyncio.run(read(response))), b'Batch,Recipe\n' * 5)
+        self.assertEqual(member.unused_data, b'')
+
+    def test_level_applies_to_plain_and_streaming_responses(self):
+        async def chunks():
+            yield self.body
+
+        async def read(response):
+            return b''.join([chunk async for chunk in response.streaming_content])
+
+        for level, extra_flags in [(1, 4), (9, 2)]:
+            with self.subTest(level=level), self.settings(COMPRESSION_LEVEL=level):
+                plain = self.compress(HttpResponse(self.body, content_type='text/csv')).content
+                streamed = b''.join(self.compress(StreamingHttpResponse([self.body], content_type='text/csv')).streaming_content)
+                streamed_async = asyncio.run(read(self.compress(StreamingHttpResponse(chunks(), content_type='text/csv'))))
+                # Byte 8 of the gzip header records the fastest (4) or smallest (2) setting
+                self.assertEqual([body[8] for body in (plain, streamed, streamed_async)], [extra_flags] * 3)
+                self.assertEqual(gzip.decompress(streamed_async), self.body)
+
+    def test_strong_etag_is_weakened(self):
+        response = HttpResponse(self.body, content_type='text/csv')
+        response['ETag'] = '"batch-1"'
+
+        self.assertEqual(self.compress(response)['ETag'], 'W/"batch-1"')
+
+    def test_vary_is_set_whether_or_not_the_client_accepts_gzip(self):
+        for accept in ('gzip', 'identity'):
+            with self.subTest(accept=accept):
+                response = self.compress(HttpResponse(self.body, content_type='text/csv'), accept=accept)
+                self.assertIn('Accept-Encoding', response['Vary'])
+                self.assertEqual(response.has_header('Content-Encoding'), accept == 'gzip')
+
+
+class BackupTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        # A file database stands in for the (in-memory) test database
+        self.database = self.directory / 'live.sqlite3'
+        with sqlite3.connect(self.database) as conn:
+            conn.execute('CREATE TABLE batch (number INTEGER)')
+            conn.executemany('INSERT INTO batch VALUES (?)', [(number,) for number in range(1, 101)])
+        conn.close()
+        patched = mock.patch('distillery.backups.database_path', return_value=self.database)
+        patched.start()
+        self.addCleanup(patched.stop)
+        overrides = self.settings(BACKUP_DIR=self.directory / 'backups', BACKUP_KEEP=3)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def numbers(self):
+        conn = sqlite3.connect(self.database)
+        try:
+            return [row[0] for row in conn.execute('SELECT number FROM batch ORDER BY number')]
+        finally:
+            conn.close()
+
+    def test_backup_restores_the_database_as_it_was(self):
+        result = backup_database(sleep=0)
+        with sqlite3.connect(self.database) as conn:
+            conn.execute('DELETE FROM batch WHERE number > 10')
+        conn.close()
+
+        pages = restore_database(result['path'])
+
+        self.assertEqual(pages, result['pages'])
+        self.assertEqual(self.numbers(), list(range(1, 101)))
+
+    def test_rotation_keeps_the_newest_backups(self):
+        made = [backup_database(sleep=0)['path'] for _ in range(5)]
+
+        # Several backups a second still get their own files
+        self.assertEqual(len(set(made)), 5)
+        self.assertEqual(list_backups(), made[:-4:-1])
+        self.assertEqual(set((self.directory / 'backups').iterdir()), set(made[2:]))
+
+
+class JobTests(TestCase):
+    def setUp(self):
+        self.output = tempfile.TemporaryDirectory()
+        self.addCleanup(self.output.cleanup)
+        overrides = self.settings(JOBS_OUTPUT_DIR=Path(self.output.name), EXPORT_BACKGROUND_THRESHOLD=2)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.staff = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'pw')
+
+    def export(self, batches):
+        self.client.force_login(self.staff)
+        return self.client.post(reverse('admin:distillery_batch_changelist'), {
+            'action': 'export_batches_to_csv', 'index': 0, '_selected_action': [batch.pk for batch in batches],
+        })
+
+    def test_claim_next_claims_each_job_once(self):
+        first = enqueue('export_batches_csv', batch_ids=[])
+        second = enqueue('export_batches_csv', batch_ids=[])
+
+        self.assertEqual(claim_next().pk, first.pk)
+        self.assertEqual(claim_next().pk, second.pk)
+        self.assertIsNone(claim_next())
+        self.assertEqual(set(Job.objects.values_list('status', flat=True)), {Job.Status.RUNNING})
+
+    def test_only_jobs_with_an_expired_lease_are_requeued(self):
+        live, dead = enqueue('export_batches_csv', batch_ids=[]), enqueue('export_batches_csv', batch_ids=[])
+        claim_next(), claim_next()
+        stale = timezone.now() - timedelta(seconds=120)
+        Job.objects.update(heartbeat_at=stale)
+        heartbeat([live.pk])
+
+        with self.settings(JOBS_LEASE_SECONDS=60):
+            self.assertEqual(requeue_interrupted(), 1)
+
+        statuses = dict(Job.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses, {live.pk: Job.Status.RUNNING, dead.pk: Job.Status.QUEUED})
+        self.assertEqual(claim_next().pk, dead.pk)
+
+    def test_failed_job_saves_its_error(self):
+        def fail(job, progress):
+            raise RuntimeError('Disk full')
+
+        with mock.patch.dict(HANDLERS, {'fail': fail}):
+            enqueue('fail')
+            job = run_job(claim_next())
+
+        self.assertEqual(job.status, Job.Status.FAILED)
+        self.assertIn('RuntimeError: Disk full', job.error)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_small_exports_run_inline_and_large_ones_are_queued(self):
+        batches = create_sample_batches(3, seed=1)
+
+        response = self.export(batches[:2])
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertFalse(Job.objects.exists())
+
+        response = self.export(batches)
+        job = Job.objects.get()
+        self.assertRedirects(response, reverse('job_detail', args=[job.pk]))
+        job = run_job(claim_next())
+        self.assertEqual(job.status, Job.Status.DONE)
+        download = self.client.get(reverse('job_download', args=[job.pk]))
+        self.assertIn(f'BATCH #{batches[2].batch_number}', b''.join(download.streaming_content).decode())
+
+    def test_job_pages_are_staff_only(self):
+        job = enqueue('export_batches_csv', batch_ids=[])
+        for name in ('job_detail', 'job_download'):
+            with self.subTest(name=name):
+                response = self.client.get(reverse(name, args=[job.pk]))
+                self.assertEqual(response.status_code, 302)
+                self.assertIn(reverse('admin:login'), response['Location'])
+
+
+@override_settings(REPLICA_ENABLED=True, REPLICA_MAX_LAG=60)
+class ReplicaRoutingTests(TransactionTestCase):
+    # The replica mirrors the test database over its own connection, so data must be committed
+    databases = {'default', ARCHIVE_DB, REPLICA_DB}
+
+    def setUp(self):
+        create_sample_batches(1, seed=1)
+        _lag_cache.update(checked=None, lag=None)
+
+    def full_log_queries(self, lag):
+        with mock.patch('distillery.replica.replica_lag', return_value=lag), \
+                CaptureQueriesContext(connections[REPLICA_DB]) as replica, \
+                CaptureQueriesContext(connections['default']) as primary:
+            response = self.client.get(reverse('full_log'))
+        self.assertEqual(response.status_code, 200)
+        return len(replica), len(primary)
+
+    def test_reports_read_from_fresh_replica(self):
+        replica, primary = self.full_log_queries(lag=5)
+
+        self.assertGreater(replica, 0)
+        self.assertEqual(primary, 0)
+
+    def test_stale_replica_falls_back_to_primary(self):
+        replica, primary = self.full_log_queries(lag=600)
+
+        self.assertEqual(replica, 0)
+        self.assertGreater(primary, 0)
+
+    def test_writes_pin_the_browser_to_primary(self):
+        response = self.client.post(reverse('create_batch'), {'batch_number': '9001', 'recipe': 'Pinned'})
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        replica, primary = self.full_log_queries(lag=5)
+
+        self.assertEqual(replica, 0)
+        self.assertGreater(primary, 0)
+
+
+class CompareTests(TestCase):
+    def test_parse_batch_numbers(self):
+        self.assertEqual(parse_batch_numbers('12, 14-16 12 9'), [12, 14, 15, 16, 9])
+        with self.assertRaises(ValueError):
+            parse_batch_numbers('12, abc')
+        with self.assertRaises(ValueError):
+            parse_batch_numbers('1-500')
+
+    def test_loads_any_number_of_batches_in_two_queries(self):
+        batches = create_sample_batches(8, seed=1)
+        numbers = f'{batches[0].batch_number}-{batches[-1].batch_number}'
+
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('compare'), {'batches': numbers})
+
+        self.assertEqual(len(response.context['batches']), 8)
+
+    def test_csv_has_deltas_against_baseline(self):
+        first, second = create_sample_batches(2, seed=1)
+        WashRecord.objects.filter(pk=first.wash_id).update(volume_in_l='100.00')
+        WashRecord.objects.filter(pk=second.wash_id).update(volume_in_l='112.50')
+
+        response = self.client.get(reverse('compare_csv'), {
+            'batches': f'{first.batch_number},{second.batch_number}',
+            'baseline': first.batch_number,
+        })
+
+        rows = [line.split(',') for line in response.content.decode().splitlines()]
+        self.assertEqual(rows[0], ['Stage', 'Field', f'#{first.batch_number}', f'#{second.batch_number}', f'#{second.batch_number} vs #{first.batch_number}'])
+        self.assertIn(['Wash', 'Volume (L)', '100.00', '112.50', '12.50'], rows)
+
+
+class TrendTests(TestCase):
+    databases = {'default', ARCHIVE_DB}
+    today = date(2026, 3, 18)
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        for day, volume, hearts in [(date(2026, 1, 5), 100, 10), (date(2026, 1, 7), 300, 50), (date(2026, 2, 2), 200, 20), (date(2026, 3, 16), 100, 30)]:
+            DistillationRecord.objects.create(description='Run', date=day, volume_in_l=volume, hearts_out=hearts, abv_hearts=volume / 10)
+
+    def test_aggregates_per_bucket(self):
+        self.assertEqual(trend('spirit_abv', 'month', today=self.today), [
+            {'t': '2026-01-01', 'value': 20.0},
+            {'t': '2026-02-01', 'value': 20.0},
+            {'t': '2026-03-01', 'value': 10.0},
+        ])
+        # Ratios are volume weighted: (10 + 50) / (100 + 300)
+        self.assertEqual(trend('hearts_yield', 'week', today=self.today)[0], {'t': '2026-01-05', 'value': 15.0})
+
+    def test_downsampling_merges_buckets_exactly(self):
+        series = trend('hearts_yield', 'month', points=2, today=self.today)
+
+        self.assertEqual(series, [
+            {'t': '2026-01-01', 'value': 13.333},
+            {'t': '2026-03-01', 'value': 30.0},
+        ])
+
+    def test_archived_records_are_included(self):
+        DistillationRecord.objects.using(ARCHIVE_DB).create(description='Old run', date=date(2026, 1, 9), volume_in_l=100, hearts_out=10, abv_hearts=50)
+
+        self.assertEqual(trend('spirit_abv', 'month', today=self.today)[0], {'t': '2026-01-01', 'value': 30.0})
+
+    def test_closed_buckets_are_cached_until_a_record_changes(self):
+        # The open bucket is queried in the hot and archive databases
+        trend('spirit_abv', 'month', today=self.today)
+        with self.assertNumQueries(1), self.assertNumQueries(1, using=ARCHIVE_DB):
+            trend('spirit_abv', 'month', today=self.today)
+
+        DistillationRecord.objects.create(description='Late entry', date=date(2026, 1, 20), volume_in_l=50, hearts_out=5, abv_hearts=5)
+        with self.assertNumQueries(2), self.assertNumQueries(2, using=ARCHIVE_DB):
+            series = trend('spirit_abv', 'month', today=self.today)
+        self.assertEqual(series[0]['value'], 15.0)
+
+    def test_saves_of_unrelated_fields_keep_the_cache(self):
+        record = DistillationRecord.objects.get(date=date(2026, 1, 5))
+        trend('spirit_abv', 'month', today=self.today)
+
+        record.notes = 'Tasted fine'
+        record.save()
+        with self.assertNumQueries(1), self.assertNumQueries(1, using=ARCHIVE_DB):
+            trend('spirit_abv', 'month', today=self.today)
+
+        record.abv_hearts = 40
+        record.save()
+        with self.assertNumQueries(2), self.assertNumQueries(2, using=ARCHIVE_DB):
+            trend('spirit_abv', 'month', today=self.today)
+
+
+@override_settings(TELEMETRY_TOKEN='secret', TELEMETRY_RAW_RETENTION_DAYS=30)
+class TelemetryTests(TestCase):
+    def setUp(self):
+        self.fermentation = FermentationRecord.objects.create()
+        hour = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=2)
+        self.hour = hour
+        self.csv = '\n'.join(['taken_at,sg,temperature'] + [
+            f'{(hour + timedelta(minutes=minutes)).isoformat()},{sg},{temp}'
+            for minutes, sg, temp in [(0, 1.050, 20), (20, 1.040, 22), (40, 1.030, 21), (70, 1.020, 19)]
+        ])
+
+    def test_ingest_rolls_up_touched_hours_and_ignores_duplicates(self):
+        readings = parse_readings(self.csv, 'text/csv')
+        old = {'taken_at': timezone.now() - timedelta(days=60), 'sg': 1.1, 'temperature': None}
+
+        first = ingest_readings(self.fermentation, readings + [old])
+        again = ingest_readings(self.fermentation, readings)
+
+        self.assertEqual((first['stored'], first['too_old'], first['hours']), (4, 1, 2))
+        self.assertEqual((again['stored'], again['duplicates']), (0, 4))
+        rollup = FermentationRollup.objects.get(fermentation=self.fermentation, hour=self.hour)
+        self.assertEqual(rollup.readings, 3)
+        self.assertEqual((rollup.sg_min, rollup.sg_max), (1.03, 1.05))
+        self.assertAlmostEqual(rollup.sg_mean, 1.04)
+        self.assertEqual(rollup.temperature_max, 22)
+
+    def test_endpoint_requires_token(self):
+        url = reverse('ingest_fermentation_readings', args=[self.fermentation.pk])
+
+        denied = self.client.post(url, self.csv, content_type='text/csv')
+        accepted = self.client.post(url, self.csv, content_type='text/csv', HTTP_AUTHORIZATION='Bearer secret')
+
+        self.assertEqual(denied.status_code, 403)
+        self.assertEqual(accepted.json()['stored'], 4)
+        self.assertEqual(self.fermentation.rollups.count(), 2)
+
+    def test_impossible_timestamps_are_rejected(self):
+        url = reverse('ingest_fermentation_readings', args=[self.fermentation.pk])
+        upload = 'taken_at,sg\n2026-02-30T10:00:00,1.050'
+
+        with self.assertRaisesMessage(TelemetryError, 'Line 2: missing or invalid timestamp'):
+            parse_readings(upload, 'text/csv')
+        response = self.client.post(url, upload, content_type='text/csv', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(FermentationReading.objects.exists())
+
+
+@override_settings(TELEMETRY_TOKEN='secret')
+class StillRunTests(TestCase):
+    def setUp(self):
+        self.run = DistillationRecord.objects.create(
+            description='Spirit run', fores_out=1, heads_out=2, hearts_out=10, tails_out=3,
+        )
+        self.gin = recipe_named('Gin')
+        Batch.objects.create(batch_number=1, recipe=self.gin, spirit_1=self.run)
+        self.start = timezone.now().replace(microsecond=0)
+        # 60 L/h is one litre a minute, so litres collected equal minutes elapsed
+        self.csv = '\n'.join(['taken_at,abv,temperature,flow'] + [
+            f'{(self.start + timedelta(minutes=minute)).isoformat()},{80 - minute},{78 + minute / 10},60'
+            for minute in range(20)
+        ])
+
+    def test_ingest_merges_overlapping_uploads(self):
+        samples = parse_samples(self.csv, 'text/csv')
+
+        ingest_samples(self.run, samples[:12])
+        trace = ingest_samples(self.run, samples[10:])
+
+        self.assertEqual(StillRunTrace.objects.count(), 1)
+        self.assertEqual((trace.samples, trace.started_at), (20, self.start))
+
+    def test_impossible_timestamps_are_rejected(self):
+        url = reverse('ingest_still_run_samples', args=['distillation', self.run.pk])
+        upload = 'taken_at,abv\n2026-02-30T10:00:00,80'
+
+        response = self.client.post(url, upload, content_type='text/csv', HTTP_AUTHORIZATION='Bearer secret')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(StillRunTrace.objects.exists())
+
+    def test_cuts_follow_recorded_fraction_volumes(self):
+        trace = ingest_samples(self.run, parse_samples(self.csv, 'text/csv'))
+
+        cuts = {cut['cut']: (cut['seconds'], cut['volume'], cut['abv']) for cut in find_cuts(trace)}
+
+        self.assertEqual(cuts['Heads'], (60, 1, 79))
+        self.assertEqual(cuts['Hearts'], (180, 3, 77))
+        self.assertEqual(cuts['Tails'], (780, 13, 67))
+        self.assertEqual(cuts['End'], (960, 16, 64))
+
+    def test_recipe_runs_load_in_one_query(self):
+        ingest_samples(self.run, parse_samples(self.csv, 'text/csv'))
+        other = DistillationRecord.objects.create(description='Other', fores_out=2, heads_out=2, hearts_out=10, tails_out=3)
+        Batch.objects.create(batch_number=2, recipe=self.gin, spirit_1=other)
+        ingest_samples(other, parse_samples(self.csv, 'text/csv'))
+
+        with self.assertNumQueries(1):
+            runs = recipe_runs(self.gin, 'spirit_1')
+
+        self.assertEqual(len(runs), 2)
+        self.assertEqual(recipe_runs(self.gin, 'spirit_2'), [])
+        summary = {row['cut']: row for row in cut_summary(runs)}
+        self.assertEqual((summary['Heads']['min_seconds'], summary['Heads']['max_seconds']), (60, 120))
+
+    def test_endpoint_requires_token(self):
+        url = reverse('ingest_still_run_samples', args=['distillation', self.run.pk])
+
+        denied = self.client.post(url, self.csv, content_type='text/csv')
+        accepted = self.client.post(url, self.csv, content_type='text/csv', HTTP_AUTHORIZATION='Bearer secret')
+
+        self.assertEqual(denied.status_code, 403)
+        self.assertEqual(accepted.json()['samples'], 20)
+        data = self.client.get(reverse('still_runs_data'), {'recipe': self.gin.pk}).json()
+        self.assertEqual(len(data['runs']), 1)
+
+
+class LineageTests(TestCase):
+    databases = {'default', ARCHIVE_DB}
+
+    def setUp(self):
+        self.batches = create_sample_batches(6, seed=1)
+        a, b, c, d, e, f = self.batches
+        # a -> b -> c -> d, with e also feeding c and f feeding both b and c
+        for source, target in [(a, b), (b, c), (c, d), (e, c), (f, b), (f, c)]:
+            FaintsTransfer.objects.create(source=source, target=target, volume_l=20, abv=30)
+
+    def test_ancestry_resolves_deep_chains_in_one_query(self):
+        a, b, c, d, e, f = self.batches
+
+        with self.assertNumQueries(1):
+            transfers = ancestry(d.pk)
+
+        depths = {(t.source_number, t.target_number): t.depth for t in transfers}
+        self.assertEqual(depths, {
+            (c.batch_number, d.batch_number): 1,
+            (b.batch_number, c.batch_number): 2,
+            (e.batch_number, c.batch_number): 2,
+            (f.batch_number, c.batch_number): 2,
+            (a.batch_number, b.batch_number): 3,
+            (f.batch_number, b.batch_number): 3,
+        })
+        self.assertEqual({t.target_number for t in descendants(a.pk)}, {b.batch_number, c.batch_number, d.batch_number})
+
+    def test_tree_expands_shared_ancestors_once(self):
+        a, b, c, d, e, f = self.batches
+
+        tree = provenance_tree(d.pk, ancestry(d.pk))
+
+        [via_c] = tree
+        self.assertEqual(via_c['batch_number'], c.batch_number)
+        shown = {node['batch_number']: node['repeat'] for node in via_c['sources']}
+        self.assertEqual(set(shown), {b.batch_number, e.batch_number, f.batch_number})
+        self.assertEqual(sum(shown.values()), 1)
+
+    def test_links_survive_archiving(self):
+        a, b, c, d, e, f = self.batches
+        past = timezone.now() - timedelta(days=400)
+        for model in (Batch, FermentationRecord, WashRecord, DistillationRecord, TotalsRecord, ProductRecord):
+            model.objects.update(updated_at=past)
+        Batch.objects.exclude(pk=a.pk).update(updated_at=timezone.now())
+
+        archive_batches(timezone.now() - timedelta(days=365))
+
+        self.assertFalse(Batch.objects.filter(pk=a.pk).exists())
+        numbers = {t.source_number for t in ancestry(d.pk)}
+        self.assertIn(a.batch_number, numbers)
+
+    def test_provenance_page(self):
+        d = self.batches[3]
+        product = d.totals.products.first()
+
+        response = self.client.get(reverse('product_provenance', args=[d.batch_number, product.pk]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, f'Batch #{self.batches[0].batch_number}')
+
+
+class BootstrapTests(TestCase):
+    def test_unapplied_migrations_compares_files_with_recorded(self):
+        self.assertEqual(unapplied_migrations('default'), [])
+
+        latest = max(migration_names('distillery'))
+        MigrationRecorder(connection).migration_qs.filter(app='distillery', name=latest).delete()
+
+        self.assertEqual(unapplied_migrations('default'), [('distillery', latest)])
+
+    def test_ensure_admin_only_creates_once(self):
+        self.assertTrue(ensure_admin('boss', 'pw'))
+        self.assertFalse(ensure_admin('boss', 'other'))
+        self.assertTrue(get_user_model().objects.get(username='boss').check_password('pw'))
+
+
+class LoadTestTests(TransactionTestCase):
+    def test_percentile_and_mix(self):
+        values = list(range(1, 101))
+        self.assertEqual((percentile(values, 0.5), percentile(values, 0.95), percentile(values, 0.99)), (50, 95, 99))
+        self.assertEqual(parse_mix('log=3, edit'), {'log': 3, 'edit': 1})
+        with self.assertRaises(ValueError):
+            parse_mix('drop_tables=1')
+
+    def test_run_reports_percentiles_and_cleans_up(self):
+        existing = create_sample_batches(1, seed=1)[0]
+        out = io.StringIO()
+
+        call_command('loadtest', threads=2, duration=0, requests=5, batches=2, mix='log=1,edit=1,create=1', stdout=out)
+
+        total = next(line for line in out.getvalue().splitlines() if line.startswith('total'))
+        self.assertEqual(total.split()[1:3], ['10', '0'])
+        self.assertFalse(Batch.objects.filter(recipe__name=LOADTEST_RECIPE).exists())
+        self.assertFalse(Recipe.objects.filter(name=LOADTEST_RECIPE).exists())
+        self.assertEqual(list(Batch.objects.values_list('pk', flat=True)), [existing.pk])
+        self.assertEqual(TotalsRecord.objects.count(), 1)
+
+
+class DirtyFieldTests(TestCase):
+    def setUp(self):
+        self.batch = create_sample_batches(1, seed=1)[0]
+
+    def test_save_updates_only_changed_columns(self):
+        wash = WashRecord.objects.get(pk=self.batch.wash_id)
+        self.assertEqual(wash.changed_fields, set())
+        wash.hearts_out = wash.hearts_out + 1
+
+        self.assertEqual(wash.changed_fields, {'hearts_out'})
+        with CaptureQueriesContext(connection) as queries:
+            wash.save()
+
+        [update] = [query['sql'] for query in queries]
+        self.assertIn('hearts_out', update)
+        self.assertIn('updated_at', update)
+        self.assertNotIn('tails_out', update)
+        self.assertEqual(wash.saved_fields, {'hearts_out', 'updated_at'})
+        self.assertEqual(wash.changed_fields, set())
+
+    def test_unchanged_save_skips_the_query(self):
+        wash = WashRecord.objects.get(pk=self.batch.wash_id)
+        before = wash.updated_at
+
+        with self.assertNumQueries(0):
+            wash.save()
+
+        self.assertEqual(wash.saved_fields, set())
+        wash.refresh_from_db()
+        self.assertEqual(wash.updated_at, before)
+
+    def test_edit_form_without_changes_writes_nothing(self):
+        wash = self.batch.wash
+        url = reverse('edit_record', args=[self.batch.batch_number, 'wash', wash.pk])
+        data = {
+            name: '' if value is None else value
+            for name, value in WashRecordForm(instance=wash).initial.items()
+        }
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, data)
+
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse([query for query in queries if query['sql'].startswith('UPDATE')])
+        data['notes'] = 'Changed'
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(url, data)
+        [update] = [query['sql'] for query in queries if query['sql'].startswith('UPDATE')]
+        self.assertNotIn('hearts_out', update)
+
+
+class SyncTests(TestCase):
+    def setUp(self):
+        self.batch = create_sample_batches(1, seed=1)[0]
+        self.wash = self.batch.wash
+
+    def edit(self, data, original, **extra):
+        return {
+            'id': str(uuid.uuid4()), 'action': 'edit', 'batch': self.batch.batch_number, 'record_type': 'wash',
+            'record_id': self.wash.pk, 'data': data, 'original': original, **extra,
+        }
+
+    def test_create_fills_an_empty_section(self):
+        self.batch.totals = None
+        self.batch.save()
+        op = {
+            'id': str(uuid.uuid4()), 'action': 'create', 'batch': self.batch.batch_number, 'section': 'Totals',
+            'data': {'description': 'Totals', 'notes': 'Offline'}, 'queued_at': '2026-01-05T10:00:00Z',
+        }
+
+        [result] = apply_operations([op])
+
+        self.assertEqual(result['status'], 'applied')
+        self.batch.refresh_from_db()
+        self.assertEqual(self.batch.totals_id, result['record_id'])
+        self.assertEqual(SyncOperation.objects.get(op_id=op['id']).queued_at.year, 2026)
+
+    def test_create_conflicts_when_the_section_is_filled(self):
+        op = {
+            'id': str(uuid.uuid4()), 'action': 'create', 'batch': self.batch.batch_number, 'section': 'Wash',
+            'data': {'description': 'Wash Run'},
+        }
+
+        [result] = apply_operations([op])
+
+        self.assertEqual(result['status'], 'conflict')
+        self.assertEqual(result['record_id'], self.wash.pk)
+
+    def test_edit_saves_only_the_changed_fields(self):
+        op = self.edit({'hearts_out': '61.5'}, {'hearts_out': str(self.wash.hearts_out)})
+
+        [result] = apply_operations([op])
+
+        self.assertEqual(result['status'], 'applied')
+        self.assertEqual(result['fields'], ['hearts_out', 'updated_at'])
+        self.wash.refresh_from_db()
+        self.assertEqual(float(self.wash.hearts_out), 61.5)
+
+    def test_edit_conflicts_when_the_server_value_moved_on(self):
+        original = str(self.wash.hearts_out)
+        WashRecord.objects.filter(pk=self.wash.pk).update(hearts_out=self.wash.hearts_out + 5)
+
+        [conflict, applied] = apply_operations([
+            self.edit({'hearts_out': '61.5'}, {'hearts_out': original}),
+            self.edit({'notes': 'From the floor'}, {'notes': self.wash.notes or ''}),
+        ])
+
+        self.assertEqual(conflict['status'], 'conflict')
+        self.assertIn('hearts_out', conflict['current'])
+        self.assertEqual(applied['status'], 'applied')
+        self.wash.refresh_from_db()
+        self.assertEqual(self.wash.notes, 'From the floor')
+
+    def test_retried_operation_is_not_applied_twice(self):
+        op = self.edit({'hearts_out': '61.5'}, {'hearts_out': str(self.wash.hearts_out)})
+        url = reverse('sync')
+        first = self.client.post(url, {'operations': [op]}, content_type='application/json').json()
+        WashRecord.objects.filter(pk=self.wash.pk).update(hearts_out=70)
+
+        second = self.client.post(url, {'operations': [op]}, content_type='application/json').json()
+
+        self.assertEqual(second['results'][0]['status'], first['results'][0]['status'])
+        self.assertTrue(second['results'][0]['duplicate'])
+        self.wash.refresh_from_db()
+        self.assertEqual(self.wash.hearts_out, 70)
+        self.assertEqual(SyncOperation.objects.count(), 1)
+
+    def test_malformed_operations_are_invalid_without_failing_the_rest(self):
+        create = {'id': str(uuid.uuid4()), 'action': 'create', 'batch': self.batch.batch_number}
+        malformed = [
+            self.edit(['hearts_out'], {}),
+            self.edit({'hearts_out': '61.5'}, ['60']),
+            self.edit({'notes': ['From the floor']}, {}),
+            {**create, 'section': ['Wash'], 'data': {}},
+            {**create, 'section': 'Totals', 'data': 'Totals'},
+        ]
+
+        response = self.client.post(reverse('sync'), {
+            'operations': [*malformed, self.edit({'notes': 'From the floor'}, {}, queued_at='2026-02-30T10:00:00')],
+        }, content_type='application/json')
+
+        statuses = [result['status'] for result in response.json()['results']]
+        self.assertEqual(statuses, ['invalid'] * len(malformed) + ['applied'])
+        self.wash.refresh_from_db()
+        self.assertEqual(self.wash.notes, 'From the floor')
+
+    def test_malformed_request_is_rejected(self):
+        url = reverse('sync')
+        self.assertEqual(self.client.post(url, 'not json', content_type='application/json').status_code, 400)
+        response = self.client.post(url, {'operations': [{'id': 'x'}]}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_service_worker_lists_the_offline_assets(self):
+        response = self.client.get(reverse('service_worker'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/javascript')
+        self.assertContains(response, 'js/offline.js')
+
+
+class BulkEditTests(TestCase):
+    def setUp(self):
+        self.batches = create_sample_batches(4, seed=1)
+        self.params = {
+            'batches': f'{self.batches[0].batch_number}-{self.batches[-1].batch_number}',
+            'stage': 'wash',
+            'fields': ['hearts_out_location', 'hearts_out', 'abv_hearts', 'lal'],
+        }
+        self.url = f"{reverse('bulk_edit')}?{urlencode(self.params, doseq=True)}"
+
+    def grid_data(self):
+        formset = self.client.get(self.url).context['formset']
+        data = {form.add_prefix(name): form[name].value() for form in formset.forms for name in form.fields}
+        data = {name: '' if value is None else value for name, value in data.items()}
+        data.update({
+            'grid-TOTAL_FORMS': len(formset.forms), 'grid-INITIAL_FORMS': len(formset.forms),
+            'grid-MIN_NUM_FORMS': 0, 'grid-MAX_NUM_FORMS': 1000,
+        })
+        return data
+
+    def test_loads_any_number_of_batches_in_one_query(self):
+        more = create_sample_batches(6, seed=2)
+        for params in (self.params, dict(self.params, batches=f'{self.batches[0].batch_number}-{more[-1].batch_number}')):
+            with self.assertNumQueries(1):
+                response = self.client.get(reverse('bulk_edit'), params)
+        self.assertEqual(len(response.context['grid']), 10)
+
+    def test_saves_changed_rows_with_one_update(self):
+        data = self.grid_data()
+        data['grid-0-hearts_out_location'] = 'Tank 9'
+        data['grid-2-hearts_out_location'] = 'Tank 9'
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, data)
+
+        self.assertEqual(response.status_code, 302)
+        [update] = [query['sql'] for query in queries if query['sql'].startswith('UPDATE')]
+        self.assertIn('updated_at', update)
+        self.assertNotIn('tails_out', update)
+        locations = dict(WashRecord.objects.values_list('pk', 'hearts_out_location'))
+        self.assertEqual(locations[self.batches[0].wash_id], 'Tank 9')
+        self.assertEqual(locations[self.batches[2].wash_id], 'Tank 9')
+        self.assertNotEqual(locations[self.batches[1].wash_id], 'Tank 9')
+
+    def test_rows_are_cleaned_by_the_record_form(self):
+        data = self.grid_data()
+        data.update({'grid-1-hearts_out': '50', 'grid-1-abv_hearts': '20', 'grid-1-lal': ''})
+
+        self.client.post(self.url, data)
+
+        wash = WashRecord.objects.get(pk=self.batches[1].wash_id)
+        self.assertEqual(float(wash.lal), 10.0)
+
+    def test_one_invalid_row_saves_nothing(self):
+        data = self.grid_data()
+        data['grid-0-hearts_out_location'] = 'Tank 9'
+        data['grid-3-hearts_out'] = 'lots'
+
+        response = self.client.post(self.url, data)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['formset'].forms[3].errors)
+        self.assertFalse(WashRecord.objects.filter(hearts_out_location='Tank 9').exists())
+
+    def test_rows_must_match_the_loaded_records(self):
+        data = self.grid_data()
+        data['grid-0-id'] = self.batches[0].fermentation_id + 1000
+
+        response = self.client.post(self.url, data)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['formset'].non_form_errors())
+
+
+class BatchStatusTests(TestCase):
+    def setUp(self):
+        self.batch = Batch.objects.create(batch_number=900, recipe=recipe_named('Status'))
+
+    def create(self, section, data=None):
+        self.client.post(reverse('create_record', args=[900, section, 0]), data or {'description': section})
+        self.batch.refresh_from_db()
+        return self.batch.status
+
+    def test_status_follows_linked_records_and_products(self):
+        self.assertEqual(self.batch.status, Batch.Status.NEW)
+        self.assertEqual(self.create('Fermentation'), Batch.Status.FERMENTING)
+        self.assertEqual(self.create('Wash'), Batch.Status.AWAITING_SPIRIT)
+        self.assertEqual(self.create('Spirit 1'), Batch.Status.SPIRIT_RUN)
+        self.assertEqual(self.create('Totals'), Batch.Status.AWAITING_BOTTLING)
+        changed_at = self.batch.status_changed_at
+
+        self.client.post(reverse('add_product', args=[900, self.batch.totals_id]), {'product_name': 'A'})
+        self.batch.refresh_from_db()
+        self.assertEqual(self.batch.status, Batch.Status.BOTTLED)
+        self.assertGreater(self.batch.status_changed_at, changed_at)
+
+        ProductRecord.objects.filter(totals_record_id=self.batch.totals_id).delete()
+        self.batch.refresh_from_db()
+        self.assertEqual(self.batch.status, Batch.Status.AWAITING_BOTTLING)
+        TotalsRecord.objects.filter(pk=self.batch.totals_id).delete()
+        self.batch.refresh_from_db()
+        self.assertEqual(self.batch.status, Batch.Status.SPIRIT_RUN)
+
+    def test_status_filter_uses_the_index(self):
+        create_sample_batches(3, seed=1)
+
+        response = self.client.get(reverse('index'), {'status': 'new'})
+
+        self.assertEqual([batch.batch_number for batch in response.context['batches']], [900])
+        plan = Batch.objects.filter(status='new').order_by('-batch_number').explain()
+        self.assertIn('distillery__status', plan)
+
+    def test_board_lists_batches_in_progress_in_one_query(self):
+        create_sample_batches(3, seed=1)
+        self.create('Fermentation')
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('board'))
+
+        columns = {status: batches for status, _, _, batches in response.context['columns']}
+        self.assertEqual([batch.batch_number for batch in columns[Batch.Status.FERMENTING]], [900])
+        self.assertNotIn(Batch.Status.BOTTLED, columns)
+
+    def test_board_fetches_at_most_limit_batches_per_status(self):
+        for number in range(901, 905):
+            Batch.objects.create(batch_number=number, recipe=self.batch.recipe, fermentation=FermentationRecord.objects.create())
+
+        with CaptureQueriesContext(connection) as queries:
+            columns = {status: (count, batches) for status, _, count, batches in board(limit=2)}
+
+        count, batches = columns[Batch.Status.FERMENTING]
+        self.assertEqual((count, [batch.batch_number for batch in batches]), (4, [904, 903]))
+        self.assertEqual(columns[Batch.Status.SPIRIT_RUN], (0, []))
+        self.assertEqual(len(queries), 1)
+
+
+class RecipeTests(TestCase):
+    databases = {'default', ARCHIVE_DB}
+
+    def setUp(self):
+        self.batches = create_sample_batches(3, seed=1)
+        self.recipe = recipe_named('Signature Rye')
+        for batch in self.batches:
+            batch.recipe = self.recipe
+            batch.save()
+
+    def test_names_match_ignoring_case_and_spacing(self):
+        self.assertEqual(recipe_named('  signature   RYE '), self.recipe)
+
+        self.client.post(reverse('create_batch'), {'batch_number': '950', 'recipe': 'SIGNATURE rye'})
+
+        self.assertEqual(Batch.objects.get(batch_number=950).recipe, self.recipe)
+        self.assertEqual(Recipe.objects.filter(name__iexact='signature rye').count(), 1)
+
+    def test_statistics_follow_batch_and_totals_changes(self):
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.batch_count, 3)
+        totals = [batch.totals for batch in self.batches]
+        self.assertAlmostEqual(self.recipe.avg_abv, round(sum(t.hearts_abv for t in totals) / 3, 2))
+
+        for totals_record in totals:
+            totals_record.hearts_abv = 70
+            totals_record.hearts_to_storage_l = 100
+            totals_record.save()
+        self.batches[0].recipe = recipe_named('Other')
+        self.batches[0].save()
+
+        self.recipe.refresh_from_db()
+        self.assertEqual((self.recipe.batch_count, self.recipe.avg_abv, self.recipe.avg_lal), (2, 70, 70))
+        self.assertEqual(recipe_named('Other').batch_count, 1)
+
+    def test_archived_batches_still_count(self):
+        archive_batches(cutoff=timezone.now() + timedelta(days=1))
+        refresh_stats([self.recipe])
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.batch_count, 3)
+        archived = Batch.objects.using(ARCHIVE_DB).select_related('recipe').get(pk=self.batches[0].pk)
+        self.assertEqual(archived.recipe.name, 'Signature Rye')
+
+        restore_batch(self.batches[0].batch_number)
+        self.assertEqual(Batch.objects.get(pk=self.batches[0].pk).recipe, self.recipe)
+
+    def test_recipe_page_reads_cached_statistics(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('recipe_detail', args=[self.recipe.pk]))
+
+        self.assertContains(response, 'Signature Rye')
+        self.assertEqual(len(response.context['batches']), 3)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.rye = recipe_named('Rye Whiskey')
+        self.gin = recipe_named('Gin')
+        self.batches = {
+            number: Batch.objects.create(batch_number=number, recipe=recipe)
+            for number, recipe in [(12, self.gin), (112, self.rye), (120, self.rye), (150, self.gin)]
+        }
+        self.batches[120].totals = TotalsRecord.objects.create(hearts_abv=64, hearts_to_storage_location='Still A')
+        self.batches[120].save()
+        self.batches[150].totals = TotalsRecord.objects.create(hearts_abv=58, hearts_to_storage_location='Still AB')
+        self.batches[150].save()
+        Batch.objects.filter(batch_number=12).update(created_at=timezone.make_aware(datetime(2026, 3, 31, 23, 30)))
+
+    def search(self, query):
+        response = self.client.get(reverse('index'), {'q': query})
+        return sorted(batch.batch_number for batch in response.context['batches']), response.context['error']
+
+    def test_terms_compile_to_exact_lookups(self):
+        self.assertEqual(self.search('#120'), ([120], ''))
+        self.assertEqual(self.search('12'), ([12], ''))
+        self.assertEqual(self.search('#100-150'), ([112, 120, 150], ''))
+        self.assertEqual(self.search('recipe:rye abv>60'), ([120], ''))
+        self.assertEqual(self.search('loc:"still a"'), ([120], ''))
+        self.assertEqual(self.search('date:2026-03'), ([12], ''))
+        self.assertEqual(self.search('date:2026-04..2026-06'), ([], ''))
+        self.assertEqual(self.search('whiskey'), ([112, 120], ''))
+
+    def test_batch_number_search_is_not_a_substring_scan(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.search('#120')
+
+        sql = next(query['sql'] for query in queries if 'FROM "distillery_batch"' in query['sql'])
+        self.assertIn('"distillery_batch"."batch_number" = 120', sql)
+        self.assertNotIn('LIKE', sql)
+
+    def test_bad_queries_report_an_error(self):
+        for query, message in [
+            ('abv>high', 'needs a number'),
+            ('loc:"Still A', 'unclosed quote'),
+            ('colour:amber', 'Unknown search'),
+            ('date:2026-13', 'not a valid date'),
+            ('status:drunk', 'Unknown status'),
+        ]:
+            batches, error = self.search(query)
+            self.assertEqual(batches, [])
+            self.assertIn(message, error)
+
+    def test_non_ascii_digits_are_not_numbers(self):
+        self.assertEqual(self.search('²'), ([], ''))
+        self.assertIn('needs a whole number', self.search('#¹²')[1])
+        self.assertIn('needs a whole number', self.search('batch:²')[1])
+        self.assertIn('not a date', self.search('date:²⁰²⁶')[1])
+        self.assertEqual(self.client.get(reverse('full_log'), {'q': '²'}).status_code, 200)
+
+    def test_full_log_searches_each_record_type(self):
+        response = self.client.get(reverse('full_log'), {'q': 'abv>=60'})
+        self.assertEqual([entry['record'] for entry in response.context['records']], [self.batches[120].totals])
+
+        response = self.client.get(reverse('full_log'), {'q': 'status:new'})
+        self.assertIn("can't be searched here", response.context['error'])
+
+
+class SnapshotTests(TransactionTestCase):
+    def setUp(self):
+        self.batches = create_sample_batches(3, seed=1)
+
+    def unpack(self, packed):
+        path = Path(tempfile.mkdtemp()) / 'snapshot.sqlite3'
+        self.addCleanup(shutil.rmtree, path.parent)
+        path.write_bytes(gzip.decompress(packed))
+        conn = sqlite3.connect(path)
+        self.addCleanup(conn.close)
+        return conn
+
+    def test_snapshot_holds_selected_batches_with_their_records(self):
+        chosen = self.batches[:2]
+        packed = io.BytesIO()
+
+        counts = write_snapshot(Batch.objects.filter(pk__in=[batch.pk for batch in chosen]), packed)
+
+        conn = self.unpack(packed.getvalue())
+        self.assertEqual(
+            sorted(row[0] for row in conn.execute('SELECT batch_number FROM distillery_batch')),
+            [batch.batch_number for batch in chosen],
+        )
+        products = ProductRecord.objects.filter(totals_record__batch__in=chosen).count()
+        self.assertEqual(conn.execute('SELECT COUNT(*) FROM distillery_productrecord').fetchone()[0], products)
+        self.assertEqual(counts['DistillationRecord'], 4)
+        self.assertEqual(conn.execute('PRAGMA foreign_key_check').fetchall(), [])
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        self.assertIn('unique_recipe_name', indexes)
+
+    def test_admin_action_downloads_the_snapshot(self):
+        user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.client.force_login(user)
+
+        response = self.client.post(reverse('admin:distillery_batch_changelist'), {
+            'action': 'export_batches_to_sqlite',
+            '_selected_action': [self.batches[0].pk],
+        })
+
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('batches_snapshot.sqlite3.gz', response['Content-Disposition'])
+        conn = self.unpack(b''.join(response.streaming_content))
+        self.assertEqual(conn.execute('SELECT COUNT(*) FROM distillery_batch').fetchone()[0], 1)
+        self.assertEqual(conn.execute('SELECT COUNT(*) FROM distillery_totalsrecord').fetchone()[0], 1)
+
+
+class AuditTests(TestCase):
+    def setUp(self):
+        run = dict(volume_in_l=500, faints_in_l=20, fores_out=1, heads_out=9, hearts_out=100, tails_out=30, waste_out=380, abv_hearts=70, lal=70)
+        self.batch = Batch.objects.create(
+            batch_number=700,
+            recipe=recipe_named('Audit'),
+            fermentation=FermentationRecord.objects.create(volume_in_l=1000, abv=8, lal=80),
+            wash=WashRecord.objects.create(**run),
+            spirit_1=DistillationRecord.objects.create(description='Spirit 1', **dict(run, hearts_out=50, waste_out=430, lal=35)),
+            totals=TotalsRecord.objects.create(hearts_to_storage_l=40, hearts_abv=75),
+        )
+        ProductRecord.objects.create(totals_record=self.batch.totals, product_name='A', final_l=50, final_abv=40, lal=20)
+
+    def findings(self):
+        return sorted(AuditFinding.objects.values_list('rule', 'subject'))
+
+    def test_consistent_batch_has_no_findings(self):
+        with self.assertNumQueries(8):
+            run = run_audit()
+
+        self.assertEqual((run.incremental, run.batches_checked, run.findings), (False, 1, 0))
+        self.assertEqual(self.findings(), [])
+
+    def test_rules_report_violations_outside_tolerance(self):
+        WashRecord.objects.filter(pk=self.batch.wash_id).update(waste_out=390)  # 2% over
+        ProductRecord.objects.update(lal=31)
+        DistillationRecord.objects.filter(pk=self.batch.spirit_1_id).update(lal=75)
+
+        run_audit()
+
+        self.assertEqual(self.findings(), [
+            ('product_lal', 'Product A'),
+            ('products_lal_gain', ''),
+            ('spirit_1_lal', ''),
+            ('spirit_lal_gain', ''),
+        ])
+        finding = AuditFinding.objects.get(rule='spirit_lal_gain')
+        self.assertEqual((finding.expected, finding.actual), (70, 75))
+
+        with self.settings(AUDIT_TOLERANCES={'wash_volume': 1}):
+            run_audit(full=True)
+        self.assertIn(('wash_volume', ''), self.findings())
+
+    def test_incremental_run_rechecks_only_changed_batches(self):
+        other = create_sample_batches(1, seed=1)[0]
+        run_audit()
+        before = AuditFinding.objects.filter(batch=other).count()
+        WashRecord.objects.filter(pk=self.batch.wash_id).update(hearts_out=200, updated_at=timezone.now())
+
+        run = run_audit()
+
+        self.assertEqual((run.incremental, run.batches_checked), (True, 1))
+        self.assertIn(('wash_volume', ''), self.findings())
+        self.assertEqual(AuditFinding.objects.filter(batch=other).count(), before)
+
+    def test_page_and_csv(self):
+        DistillationRecord.objects.filter(pk=self.batch.spirit_1_id).update(lal=75)
+        self.client.post(reverse('audit'))
+
+        response = self.client.get(reverse('audit'), {'rule': 'spirit_1_lal'})
+        self.assertEqual([finding.batch.batch_number for finding in response.context['findings']], [700])
+
+        response = self.client.get(reverse('audit_csv'))
+        lines = response.content.decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['Batch', 'Rule', 'Check'])
+        self.assertEqual(len(lines), 1 + AuditFinding.objects.count())
+
+
+@override_settings(QUERY_BUDGET_WARNINGS=True)
+class QueryBudgetTests(TransactionTestCase):
+    # A transaction test so the snapshot export (which can't run inside a transaction) can be counted
+    databases = {'default', ARCHIVE_DB}
+    sizes = (1, 4, 12)
+
+    def setUp(self):
+        user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.client.force_login(user)
+
+    def counted(self, method, url, **kwargs):
+        """The SQL run by the request, and its view's budget."""
+        with QueryCounter() as queries, self.assertNoLogs('tdist.middleware'):
+            response = getattr(self.client, method)(url, **kwargs)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertLess(response.status_code, 400, url)
+        return queries.queries, budget_for(response.resolver_match, response.wsgi_request)
+
+    def assertWithinBudget(self, requests):
+        """Make ``requests()`` (``[(method, url, client kwargs)]``) as the data grows; each stays in budget and doesn't grow."""
+        counts = {}
+        for seed, size in enumerate(self.sizes, start=1):
+            create_sample_batches(size - Batch.objects.count(), seed=seed)
+            run_audit()
+            for method, url, kwargs in requests():
+                queries, budget = self.counted(method, url, **kwargs)
+                self.assertIsNotNone(budget, url)
+                self.assertLessEqual(len(queries), budget, report(f'{method.upper()} {url}', budget, queries))
+                # Admin actions all post to the changelist
+                action = kwargs.get('data', {}).get('action')
+                counts.setdefault((method, url, action), []).append(len(queries))
+        # The first request can also fill caches (content types, sessions)
+        for (method, url, action), runs in counts.items():
+            self.assertLessEqual(max(runs), runs[0], f'{method.upper()} {url} {action or ""} ran {runs} queries at {self.sizes} batches')
+
+    def test_pages_stay_within_budget(self):
+        def requests():
+            batch = Batch.objects.order_by('batch_number').first()
+            product = ProductRecord.objects.filter(totals_record=batch.totals_id).first()
+            return [('get', url, {}) for url in [
+                reverse('index'),
+                reverse('index') + '?' + urlencode({'q': 'recipe:rye abv>40', 'archive': '1'}),
+                reverse('log', args=[batch.batch_number]),
+                reverse('create_batch'),
+                reverse('create_record', args=[batch.batch_number, 'Wash', 0]),
+                reverse('edit_record', args=[batch.batch_number, 'wash', batch.wash_id]),
+                reverse('export_batch_csv', args=[batch.batch_number]),
+                reverse('add_product', args=[batch.batch_number, batch.totals_id]),
+                reverse('edit_product', args=[batch.batch_number, product.pk]),
+                reverse('product_provenance', args=[batch.batch_number, product.pk]),
+                reverse('delete_product', args=[batch.batch_number, product.pk]),
+                reverse('recipes'),
+                reverse('recipe_detail', args=[batch.recipe_id]),
+                reverse('board'),
+                reverse('bulk_edit') + '?' + urlencode({'batches': '1-20', 'stage': 'wash'}),
+                reverse('full_log') + '?archive=1',
+                reverse('compare') + '?batches=1-12',
+                reverse('compare_csv') + '?batches=1-12',
+                reverse('audit'),
+                reverse('audit_csv'),
+                reverse('still_runs'),
+                reverse('still_runs_data') + f'?recipe={batch.recipe_id}',
+                reverse('trends'),
+                reverse('trends_data'),
+                reverse('service_worker'),
+            ]]
+
+        self.assertWithinBudget(requests)
+
+    def form_data(self, form):
+        return {name: '' if value is None else value for name, value in form.initial.items() if name in form.fields}
+
+    def test_writes_stay_within_budget(self):
+        def requests():
+            batch = Batch.objects.order_by('batch_number').first()
+            number = batch.batch_number
+            product = ProductRecord.objects.filter(totals_record=batch.totals_id).first()
+            doomed = ProductRecord.objects.create(totals_record=batch.totals, product_name='Z')
+            edit = dict(self.form_data(WashRecordForm(instance=batch.wash)), notes=f'Edited at {Batch.objects.count()}')
+            product_data = dict(self.form_data(ProductRecordForm(instance=product)), notes=f'Edited at {Batch.objects.count()}')
+            grid = f"{reverse('bulk_edit')}?{urlencode({'batches': number, 'stage': 'wash', 'fields': 'hearts_out_location'})}"
+            operation = {
+                'id': str(uuid.uuid4()), 'action': 'edit', 'batch': number, 'record_type': 'wash',
+                'record_id': batch.wash_id, 'data': {'notes': 'Synced'},
+            }
+            return [
+                ('post', reverse('create_batch'), {'data': {'batch_number': number + 100 + Batch.objects.count(), 'recipe': 'Rye'}}),
+                ('post', reverse('create_record', args=[number, 'Spirit 2', 0]), {'data': {'description': 'Spirit Run 2'}}),
+                ('post', reverse('edit_record', args=[number, 'wash', batch.wash_id]), {'data': edit}),
+                ('post', reverse('add_product', args=[number, batch.totals_id]), {'data': dict(product_data, product_name='N')}),
+                ('post', reverse('edit_product', args=[number, product.pk]), {'data': product_data}),
+                ('post', reverse('delete_product', args=[number, doomed.pk]), {}),
+                ('post', grid, {'data': {
+                    'grid-TOTAL_FORMS': 1, 'grid-INITIAL_FORMS': 1, 'grid-MIN_NUM_FORMS': 0, 'grid-MAX_NUM_FORMS': 1000,
+                    'grid-0-id': batch.wash_id, 'grid-0-hearts_out_location': f'Tank {Batch.objects.count()}',
+                }}),
+                ('post', reverse('audit'), {'data': {'full': '1'}}),
+                ('post', reverse('sync'), {'data': {'operations': [operation]}, 'content_type': 'application/json'}),
+                *(('post', reverse('admin:distillery_batch_changelist'), {'data': {
+                    'action': action, 'index': 0, '_selected_action': list(Batch.objects.values_list('pk', flat=True)),
+                }}) for action in ('export_batches_to_csv', 'export_batches_to_sqlite')),
+            ]
+
+        self.assertWithinBudget(requests)
+
+    def test_restoring_an_archived_batch_stays_within_budget(self):
+        batch = create_sample_batches(1, seed=1)[0]
+        move_batches([batch.pk], 'default', ARCHIVE_DB)
+
+        queries, budget = self.counted('post', reverse('restore_archived_batch', args=[batch.batch_number]))
+
+        self.assertLessEqual(len(queries), budget, report('restore', budget, queries))
+
+    def test_admin_stays_within_budget(self):
+        def requests():
+            batch = Batch.objects.order_by('batch_number').first()
+            return [('get', url, {}) for url in [
+                reverse('admin:index'),
+                reverse('admin:distillery_batch_change', args=[batch.pk]),
+                *(reverse(f'admin:distillery_{model._meta.model_name}_changelist') for model in (
+                    Batch, FermentationRecord, WashRecord, DistillationRecord, TotalsRecord, ProductRecord, Recipe, AuditRun,
+                )),
+            ]]
+
+        self.assertWithinBudget(requests)
+
+    def test_every_route_has_a_budget(self):
+        for pattern in urls.urlpatterns:
+            if isinstance(pattern, URLPattern):
+                with self.subTest(route=str(pattern.pattern)):
+                    self.assertIsInstance(getattr(pattern.callback, 'query_budget', None), int)
+
+    def test_middleware_logs_requests_over_budget(self):
+        batch = create_sample_batches(1, seed=1)[0]
+        middleware = QueryBudgetMiddleware(lambda request: HttpResponse())
+        request = RequestFactory().get('/')
+        request.resolver_match = resolve(reverse('log', args=[batch.batch_number]))
+
+        counter = QueryCounter()
+        counter.queries = ['SELECT 1'] * 9
+
+        with self.assertLogs('tdist.middleware', 'WARNING') as logs:
+            middleware.check(request, counter)
+
+        self.assertIn('GET / ran 9 queries (budget 6)', logs.output[0])
+        self.assertIn('>> 9x SELECT 1', logs.output[0])
+
+        with self.settings(QUERY_BUDGET_WARNINGS=False), self.assertRaises(MiddlewareNotUsed):
+            QueryBudgetMiddleware(lambda request: HttpResponse())
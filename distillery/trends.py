@@ -0,0 +1,172 @@
+"""Time-series trends across batches.
+
+Each metric is aggregated per day, week or month in SQL as a ``(total,
+weight)`` pair (sum and count for averages, numerator and denominator sums for
+ratios), so buckets can be merged exactly when a series is downsampled to a
+target number of points.
+
+Batches in the archive database are included: each bucket adds up the rows
+from both databases, and archiving or restoring batches clears the cache.
+
+Buckets that have closed (ended before today) are cached; only the open ones
+are queried on each request. Saving or deleting a stage record clears the
+cached buckets of that record's metrics, since its date may be in the past;
+a save that only changed other fields leaves them alone.
+"""
+import math
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from .models import FermentationRecord, WashRecord, DistillationRecord
+
+
+PERIODS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+# name: (label, model, value field, how it's aggregated, denominator field for ratios)
+METRICS = {
+    'fermentation_abv': ('Fermentation ABV (%)', FermentationRecord, 'abv', 'avg', None),
+    'fermentation_lal': ('Fermentation LAL', FermentationRecord, 'lal', 'sum', None),
+    'wash_volume': ('Wash volume (L)', WashRecord, 'volume_in_l', 'sum', None),
+    'wash_abv': ('Wash hearts ABV (%)', WashRecord, 'abv_hearts', 'avg', None),
+    'wash_lal': ('Wash LAL', WashRecord, 'lal', 'sum', None),
+    'spirit_abv': ('Spirit hearts ABV (%)', DistillationRecord, 'abv_hearts', 'avg', None),
+    'spirit_lal': ('Spirit LAL', DistillationRecord, 'lal', 'sum', None),
+    'hearts_yield': ('Spirit hearts yield (% of volume)', DistillationRecord, 'hearts_out', 'ratio', 'volume_in_l'),
+}
+
+DATE_FIELD = 'date'
+MAX_POINTS = 2000
+CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def period_start(day, period):
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _cache_key(metric, period):
+    return f'trends:{metric}:{period}'
+
+
+def _bucket_rows(metric, period, since=None):
+    """``{bucket_date: (total, weight)}`` from the hot and archive databases, for buckets starting at ``since`` or later."""
+    # archive imports clear_cached_trends from here
+    from .archive import ARCHIVE_DB, archive_reads
+
+    buckets = {}
+    # None leaves the hot database to the router (primary or replica)
+    for db in (None, ARCHIVE_DB):
+        with archive_reads(db):
+            for bucket, (total, weight) in _database_bucket_rows(metric, period, since, db).items():
+                previous = buckets.get(bucket, (0.0, 0.0))
+                buckets[bucket] = (previous[0] + total, previous[1] + weight)
+    return buckets
+
+
+def _database_bucket_rows(metric, period, since, using):
+    _, model, field, how, denominator = METRICS[metric]
+    queryset = model.objects.using(using).filter(**{f'{DATE_FIELD}__isnull': False, f'{field}__isnull': False})
+    if how == 'ratio':
+        queryset = queryset.filter(**{f'{denominator}__gt': 0})
+    if since is not None:
+        queryset = queryset.filter(**{f'{DATE_FIELD}__gte': since})
+    weight = Sum(denominator) if how == 'ratio' else Count(field)
+    rows = (
+        queryset.annotate(bucket=PERIODS[period](DATE_FIELD))
+        .values('bucket')
+        .annotate(total=Sum(F(field)), weight=weight)
+        .order_by('bucket')
+    )
+    buckets = {}
+    for row in rows:
+        bucket = row['bucket']
+        if hasattr(bucket, 'date'):
+            bucket = bucket.date()
+        buckets[bucket] = (float(row['total'] or 0), float(row['weight'] or 0))
+    return buckets
+
+
+def bucket_totals(metric, period, today=None):
+    """All ``{bucket_date: (total, weight)}`` for ``metric``, with closed buckets from the cache."""
+    current = period_start(today or timezone.localdate(), period)
+    key = _cache_key(metric, period)
+    cached = cache.get(key)
+    if cached is None or cached['open_from'] != current:
+        closed = {bucket: value for bucket, value in _bucket_rows(metric, period).items() if bucket < current}
+        cache.set(key, {'open_from': current, 'buckets': closed}, CACHE_TIMEOUT)
+    else:
+        closed = cached['buckets']
+    return {**closed, **_bucket_rows(metric, period, since=current)}
+
+
+def _value(how, total, weight):
+    if not weight:
+        return None
+    if how == 'sum':
+        return round(total, 3)
+    if how == 'ratio':
+        return round(total / weight * 100, 3)
+    return round(total / weight, 3)
+
+
+def trend(metric, period='week', start=None, end=None, points=None, today=None):
+    """Series for ``metric`` as ``[{'t': 'YYYY-MM-DD', 'value': ...}]``.
+
+    ``points`` merges neighbouring buckets so at most that many are returned.
+    """
+    if metric not in METRICS:
+        raise ValueError(f'Unknown metric: {metric}')
+    if period not in PERIODS:
+        raise ValueError(f'Unknown period: {period}')
+    how = METRICS[metric][3]
+
+    buckets = sorted(
+        (bucket, value) for bucket, value in bucket_totals(metric, period, today).items()
+        if (start is None or bucket >= period_start(start, period)) and (end is None or bucket <= end)
+    )
+    points = min(points or MAX_POINTS, MAX_POINTS)
+    size = max(1, math.ceil(len(buckets) / points))
+
+    series = []
+    for index in range(0, len(buckets), size):
+        group = buckets[index:index + size]
+        total = sum(value[0] for _, value in group)
+        weight = sum(value[1] for _, value in group)
+        series.append({'t': group[0][0].isoformat(), 'value': _value(how, total, weight)})
+    return series
+
+
+def _metric_fields(metric):
+    _, _, field, _, denominator = METRICS[metric]
+    return {DATE_FIELD, field, denominator} - {None}
+
+
+def clear_cached_trends(sender=None, update_fields=None, **kwargs):
+    """Drop cached buckets for metrics of model ``sender`` (all metrics if None).
+
+    A save limited to ``update_fields`` only clears the metrics reading those fields.
+    """
+    cache.delete_many([
+        _cache_key(metric, period)
+        for metric, (_, model, *_rest) in METRICS.items()
+        if (sender is None or model is sender)
+        and (update_fields is None or _metric_fields(metric) & set(update_fields))
+        for period in PERIODS
+    ])
+
+
+for _model in {model for _, model, *_rest in METRICS.values()}:
+    post_save.connect(clear_cached_trends, sender=_model, dispatch_uid=f'trends-{_model.__name__}-save')
+    post_delete.connect(clear_cached_trends, sender=_model, dispatch_uid=f'trends-{_model.__name__}-delete')
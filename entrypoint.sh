@@ -1,13 +1,9 @@
 #!/bin/bash
 
-echo "Ensuring db directory exists..."
-mkdir -p /app/db
-
-echo "Running database migrations..."
-python manage.py migrate --noinput
+# Read by manage.py boot to report total start-up time
+export BOOT_STARTED=$(date +%s.%N)
 
-echo "Creating admin user..."
-python create_admin.py
+mkdir -p /app/db
 
-echo "Starting Django development server..."
-exec python manage.py runserver 0.0.0.0:8000
+# One Django process: migrates only when needed, ensures the admin user, then serves
+exec python manage.py boot 0.0.0.0:8000
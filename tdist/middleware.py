@@ -0,0 +1,143 @@
+import io
+import logging
+import secrets
+from gzip import GzipFile
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from distillery.querybudget import QueryCounter, budget_for, report
+from distillery.replica import PIN_COOKIE
+from django.middleware.gzip import GZipMiddleware, re_accepts_gzip
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import StreamingBuffer
+
+
+logger = logging.getLogger(__name__)
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Django's GZipMiddleware, with a configurable level (COMPRESSION_LEVEL),
+    size threshold (COMPRESSION_MIN_LENGTH) and content-type allowlist
+    (COMPRESSION_CONTENT_TYPES). Django's compressors are fixed at level 6, so
+    the body is compressed here, keeping their random-length file name
+    (max_random_bytes) against BREACH. Streaming responses are always
+    compressed since their size isn't known up front, sync and async alike as
+    a single gzip member.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.level = getattr(settings, 'COMPRESSION_LEVEL', 6)
+        self.min_length = getattr(settings, 'COMPRESSION_MIN_LENGTH', 200)
+        self.content_types = tuple(getattr(settings, 'COMPRESSION_CONTENT_TYPES', ('text/',)))
+
+    def is_compressible(self, response):
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        return content_type.startswith(self.content_types)
+
+    def gzip_file(self, fileobj):
+        filename = b'a' * secrets.randbelow(self.max_random_bytes) if self.max_random_bytes else None
+        return GzipFile(filename=filename, mode='wb', compresslevel=self.level, fileobj=fileobj, mtime=0)
+
+    def compress(self, content):
+        buffer = io.BytesIO()
+        with self.gzip_file(buffer) as zfile:
+            zfile.write(content)
+        return buffer.getvalue()
+
+    def compress_sequence(self, chunks):
+        buffer = StreamingBuffer()
+        with self.gzip_file(buffer) as zfile:
+            for chunk in chunks:
+                zfile.write(chunk)
+                data = buffer.read()
+                if data:
+                    yield data
+        yield buffer.read()
+
+    async def compress_async(self, chunks):
+        buffer = StreamingBuffer()
+        with self.gzip_file(buffer) as zfile:
+            async for chunk in chunks:
+                zfile.write(chunk)
+                data = buffer.read()
+                if data:
+                    yield data
+        yield buffer.read()
+
+    def process_response(self, request, response):
+        if not response.streaming and len(response.content) < self.min_length:
+            return response
+        if response.has_header('Content-Encoding') or not self.is_compressible(response):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if not re_accepts_gzip.search(request.META.get('HTTP_ACCEPT_ENCODING', '')):
+            return response
+
+        if response.streaming:
+            compress = self.compress_async if response.is_async else self.compress_sequence
+            response.streaming_content = compress(response.streaming_content)
+            del response.headers['Content-Length']
+        else:
+            compressed = self.compress(response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # A strong ETag can't stand for the compressed body
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'gzip'
+        return response
+
+
+class PinPrimaryMiddleware(MiddlewareMixin):
+    """
+    After a successful write (any non-GET/HEAD request), set a short-lived
+    cookie that keeps the browser's reads on the primary database until the
+    replica has caught up (REPLICA_PIN_SECONDS), so users see their own changes.
+    """
+
+    def process_response(self, request, response):
+        if settings.REPLICA_ENABLED and request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400:
+            response.set_cookie(PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax')
+        return response
+
+
+class QueryBudgetMiddleware:
+    """
+    Log a warning, with repeated SQL marked, for each request that runs more
+    queries than its view's budget (see distillery.querybudget). Only used
+    while QUERY_BUDGET_WARNINGS is set, which it is by default under DEBUG.
+    Streaming responses are counted until their content has been consumed.
+    """
+
+    def __init__(self, get_response):
+        if not settings.QUERY_BUDGET_WARNINGS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        with counter:
+            response = self.get_response(request)
+        if response.streaming and not response.is_async:
+            response.streaming_content = self._counted(request, counter, response.streaming_content)
+        else:
+            self.check(request, counter)
+        return response
+
+    def _counted(self, request, counter, chunks):
+        with counter:
+            yield from chunks
+        self.check(request, counter)
+
+    def check(self, request, counter):
+        budget = budget_for(request.resolver_match, request)
+        if budget is not None and len(counter) > budget:
+            logger.warning(report(f'{request.method} {request.path}', budget, counter.queries))
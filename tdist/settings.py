@@ -24,7 +24,9 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = 'django-insecure-twc4+&p)elw@!wvkjzbkjedd@47y8+lj2**b1etmkffk8&ohxf'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+# On for runserver; the Docker image sets DEBUG=0, which switches to the
+# hashed static files it collects at build time (see STORAGES below).
+DEBUG = os.getenv('DEBUG', '1') == '1'
 
 ALLOWED_HOSTS = ['*']
 
@@ -37,12 +39,17 @@ INSTALLED_APPS = [
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
+    'whitenoise.runserver_nostatic',
     'django.contrib.staticfiles',
     'distillery',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'tdist.middleware.QueryBudgetMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'tdist.middleware.CompressionMiddleware',
+    'tdist.middleware.PinPrimaryMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -78,9 +85,38 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db' / 'db.sqlite3',
-    }
+    },
+    # Cold storage for finished batches (see distillery.archive)
+    'archive': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db' / 'archive.sqlite3',
+    },
+    # Read-only copy of default for reports and exports (see distillery.replica)
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.getenv('REPLICA_DB_PATH', BASE_DIR / 'db' / 'replica.sqlite3'),
+        'TEST': {'MIRROR': 'default'},
+    },
 }
 
+DATABASE_ROUTERS = ['distillery.routers.ArchiveRouter', 'distillery.routers.ReplicaRouter']
+
+# Send report and export reads to the replica database
+REPLICA_ENABLED = os.getenv('REPLICA_ENABLED', '0') == '1'
+
+# Fall back to the primary when the replica is older than this (seconds)
+REPLICA_MAX_LAG = int(os.getenv('REPLICA_MAX_LAG', '300'))
+
+# After a write, that browser reads from the primary for this long (seconds)
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', str(REPLICA_MAX_LAG)))
+
+# Batches untouched for this many days are moved to the archive database
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', '365'))
+
+# Where `manage.py backup_db` writes gzipped backups, and how many to keep per database
+BACKUP_DIR = BASE_DIR / 'db' / 'backups'
+BACKUP_KEEP = int(os.getenv('BACKUP_KEEP', '14'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -117,3 +153,90 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/6.0/howto/static-files/
 
 STATIC_URL = 'static/'
+
+STATICFILES_DIRS = [BASE_DIR / 'tdist' / 'static']
+
+# collectstatic output, served by WhiteNoise straight from the app server. The
+# image puts it outside /app so docker-compose's source mount doesn't hide it.
+STATIC_ROOT = Path(os.getenv('STATIC_ROOT', BASE_DIR / 'staticfiles'))
+
+# Outside DEBUG, collectstatic writes content-hashed copies plus precompressed
+# .gz variants and WhiteNoise serves the hashed names with far-future caching.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+            else 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+        ),
+    },
+}
+
+# Non-hashed files (anything requested outside the manifest) get a short max-age
+WHITENOISE_MAX_AGE = 60 * 60
+
+
+# Response compression (tdist.middleware.CompressionMiddleware)
+
+# gzip level 1 (fastest) - 9 (smallest)
+COMPRESSION_LEVEL = int(os.getenv('COMPRESSION_LEVEL', '6'))
+
+# Bodies shorter than this many bytes aren't worth compressing
+COMPRESSION_MIN_LENGTH = int(os.getenv('COMPRESSION_MIN_LENGTH', '500'))
+
+COMPRESSION_CONTENT_TYPES = (
+    'text/',
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'image/svg+xml',
+)
+
+
+# Fermentation telemetry (distillery.telemetry)
+
+# Raw hydrometer readings are pruned after this many days; hourly rollups are kept
+TELEMETRY_RAW_RETENTION_DAYS = int(os.getenv('TELEMETRY_RAW_RETENTION_DAYS', '90'))
+
+# Devices send this as "Authorization: Bearer <token>"; the ingest endpoint is off while it's empty
+TELEMETRY_TOKEN = os.getenv('TELEMETRY_TOKEN', '')
+
+
+# Shared by web, worker and management command processes, so a file cache
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'db' / 'cache',
+    },
+}
+
+# Swaps the cache for a memory one while testing
+TEST_RUNNER = 'tdist.test_runner.TestRunner'
+
+
+# Background jobs (distillery.jobs, run by `manage.py run_jobs`)
+
+# Where job output files (exports, reports) are written
+JOBS_OUTPUT_DIR = BASE_DIR / 'db' / 'jobs'
+
+# A running job whose worker hasn't checked in for this many seconds is requeued
+JOBS_LEASE_SECONDS = int(os.getenv('JOBS_LEASE_SECONDS', '60'))
+
+# Admin exports of more batches than this run as a background job
+EXPORT_BACKGROUND_THRESHOLD = int(os.getenv('EXPORT_BACKGROUND_THRESHOLD', '50'))
+
+
+# Mass-balance audit (distillery.audit)
+
+# Allowed difference, as a percentage of the expected value, before a rule reports a batch
+AUDIT_TOLERANCE_PERCENT = float(os.getenv('AUDIT_TOLERANCE_PERCENT', '2'))
+
+# Per-rule overrides of the above, e.g. {'wash_volume': 5}
+AUDIT_TOLERANCES = {}
+
+# Per-view query budgets (distillery.querybudget)
+
+# Log requests that run more queries than their view's budget
+QUERY_BUDGET_WARNINGS = os.getenv('QUERY_BUDGET_WARNINGS', '1' if DEBUG else '0') == '1'
@@ -0,0 +1,23 @@
+// Site-wide behaviour: mobile navigation menu
+
+function toggleMenu() {
+    const navLinks = document.getElementById('navLinks');
+    navLinks.classList.toggle('active');
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    const menuToggle = document.querySelector('.menu-toggle');
+    if (menuToggle) {
+        menuToggle.addEventListener('click', toggleMenu);
+    }
+});
+
+// Close menu when clicking outside on mobile
+document.addEventListener('click', function(event) {
+    const nav = document.querySelector('nav');
+    const navLinks = document.getElementById('navLinks');
+
+    if (nav && navLinks && !nav.contains(event.target) && navLinks.classList.contains('active')) {
+        navLinks.classList.remove('active');
+    }
+});
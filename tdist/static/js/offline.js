@@ -0,0 +1,221 @@
+// Offline mode: registers the service worker, queues record form submissions
+// made without a connection, and sends the queue to the sync endpoint in one
+// request when the connection returns.
+
+(function() {
+    const QUEUE_KEY = 'tdist-sync-queue';
+    const PROBLEMS_KEY = 'tdist-sync-problems';
+    const RETRY_MS = 30000;
+    const MAX_PER_REQUEST = 200;
+    let syncing = false;
+
+    function load(key) {
+        try {
+            return JSON.parse(localStorage.getItem(key)) || [];
+        } catch (error) {
+            return [];
+        }
+    }
+
+    function store(key, items) {
+        localStorage.setItem(key, JSON.stringify(items));
+    }
+
+    function csrfToken() {
+        const match = document.cookie.match(/(?:^|;\s*)csrftoken=([^;]+)/);
+        return match ? decodeURIComponent(match[1]) : '';
+    }
+
+    // crypto.randomUUID is only available over HTTPS
+    function uuid() {
+        if (window.crypto && crypto.randomUUID) {
+            return crypto.randomUUID();
+        }
+        const bytes = crypto.getRandomValues(new Uint8Array(16));
+        bytes[6] = (bytes[6] & 0x0f) | 0x40;
+        bytes[8] = (bytes[8] & 0x3f) | 0x80;
+        const hex = Array.from(bytes, function(b) { return b.toString(16).padStart(2, '0'); }).join('');
+        return [hex.slice(0, 8), hex.slice(8, 12), hex.slice(12, 16), hex.slice(16, 20), hex.slice(20)].join('-');
+    }
+
+    function formValues(form) {
+        const values = {};
+        new FormData(form).forEach(function(value, name) {
+            if (name !== 'csrfmiddlewaretoken') {
+                values[name] = value;
+            }
+        });
+        return values;
+    }
+
+    function showStatus() {
+        const status = document.getElementById('syncStatus');
+        if (!status) {
+            return;
+        }
+        const queue = load(QUEUE_KEY);
+        const problems = load(PROBLEMS_KEY);
+        status.replaceChildren();
+        status.hidden = !queue.length && !problems.length;
+        if (queue.length) {
+            const waiting = document.createElement('p');
+            waiting.textContent = queue.length + ' change(s) saved on this device, waiting to sync.';
+            status.appendChild(waiting);
+        }
+        if (problems.length) {
+            const list = document.createElement('ul');
+            problems.forEach(function(problem) {
+                const item = document.createElement('li');
+                const link = document.createElement('a');
+                link.href = problem.page;
+                link.textContent = 'Batch #' + problem.batch + ' ' + problem.target;
+                item.appendChild(link);
+                item.append(': ' + problem.message);
+                list.appendChild(item);
+            });
+            const heading = document.createElement('p');
+            heading.textContent = 'These offline changes were not applied:';
+            const dismiss = document.createElement('button');
+            dismiss.type = 'button';
+            dismiss.className = 'btn btn-secondary btn-xs';
+            dismiss.textContent = 'Dismiss';
+            dismiss.addEventListener('click', function() {
+                store(PROBLEMS_KEY, []);
+                showStatus();
+            });
+            status.append(heading, list, dismiss);
+        }
+    }
+
+    function queueSubmission(form, original) {
+        const info = form.dataset;
+        const values = formValues(form);
+        const queue = load(QUEUE_KEY);
+        if (info.offline === 'create') {
+            queue.push({
+                id: uuid(), action: 'create', batch: Number(info.batch), section: info.section,
+                data: values, queued_at: new Date().toISOString(), page: location.pathname,
+            });
+        } else {
+            const changed = Object.keys(values).filter(function(name) { return values[name] !== original[name]; });
+            if (!changed.length) {
+                return false;
+            }
+            // Later edits of the same record join the queued one, keeping the first original values
+            let op = queue.find(function(item) {
+                return item.action === 'edit' && item.batch === Number(info.batch)
+                    && item.record_type === info.recordType && item.record_id === Number(info.recordId);
+            });
+            if (!op) {
+                op = {
+                    id: uuid(), action: 'edit', batch: Number(info.batch), record_type: info.recordType,
+                    record_id: Number(info.recordId), data: {}, original: {},
+                    queued_at: new Date().toISOString(), page: location.pathname,
+                };
+                queue.push(op);
+            }
+            changed.forEach(function(name) {
+                op.data[name] = values[name];
+                if (!(name in op.original)) {
+                    op.original[name] = original[name];
+                }
+            });
+        }
+        store(QUEUE_KEY, queue);
+        return true;
+    }
+
+    function sync() {
+        const queue = load(QUEUE_KEY);
+        const url = document.body.dataset.syncUrl;
+        if (syncing || !queue.length || !navigator.onLine || !url) {
+            return;
+        }
+        syncing = true;
+        const batch = queue.slice(0, MAX_PER_REQUEST);
+        fetch(url, {
+            method: 'POST',
+            credentials: 'same-origin',
+            headers: {'Content-Type': 'application/json', 'X-CSRFToken': csrfToken()},
+            body: JSON.stringify({operations: batch}),
+        })
+            .then(function(response) {
+                return response.ok ? response.json() : Promise.reject(response.status);
+            })
+            .then(function(data) {
+                const results = {};
+                data.results.forEach(function(result) { results[result.id] = result; });
+                const problems = load(PROBLEMS_KEY);
+                batch.forEach(function(op) {
+                    const result = results[op.id];
+                    if (result && result.status !== 'applied') {
+                        problems.push({
+                            batch: op.batch,
+                            target: op.section || op.record_type,
+                            page: op.page,
+                            message: result.message || 'The form did not validate.',
+                        });
+                    }
+                });
+                store(PROBLEMS_KEY, problems);
+                store(QUEUE_KEY, load(QUEUE_KEY).filter(function(op) { return !results[op.id]; }));
+            })
+            .catch(function() {})
+            .finally(function() {
+                syncing = false;
+                showStatus();
+            });
+    }
+
+    function watchForm(form) {
+        const original = formValues(form);
+        form.addEventListener('submit', function(event) {
+            event.preventDefault();
+            const queued = function() {
+                if (queueSubmission(form, original)) {
+                    showStatus();
+                    location.href = form.dataset.done;
+                }
+            };
+            if (!navigator.onLine) {
+                queued();
+                return;
+            }
+            fetch(form.action || location.href, {
+                method: 'POST', body: new FormData(form), credentials: 'same-origin', redirect: 'manual',
+            })
+                .then(function(response) {
+                    if (response.type === 'opaqueredirect') {
+                        location.href = form.dataset.done;
+                    } else {
+                        // Validation errors: post normally so the form comes back with them
+                        form.submit();
+                    }
+                })
+                .catch(queued);
+        });
+    }
+
+    document.addEventListener('DOMContentLoaded', function() {
+        const body = document.body;
+        if ('serviceWorker' in navigator && body.dataset.serviceWorker) {
+            navigator.serviceWorker.register(body.dataset.serviceWorker).then(function(registration) {
+                // Keep the record forms this page links to available offline
+                const urls = Array.from(document.querySelectorAll('a[href*="/record/"]'), function(link) { return link.href; });
+                const worker = registration.active || navigator.serviceWorker.controller;
+                if (worker && urls.length) {
+                    worker.postMessage({type: 'cache', urls: urls});
+                }
+            }).catch(function() {});
+        }
+        const form = document.querySelector('form[data-offline]');
+        if (form) {
+            watchForm(form);
+        }
+        showStatus();
+        sync();
+        setInterval(sync, RETRY_MS);
+    });
+
+    window.addEventListener('online', sync);
+})();
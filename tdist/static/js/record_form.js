@@ -0,0 +1,57 @@
+// Auto-calculation of ABV and LAL on record forms.
+// The form declares which calculator applies through its data-calc attribute.
+
+document.addEventListener('DOMContentLoaded', function() {
+    const form = document.querySelector('form[data-calc]');
+    if (!form) {
+        return;
+    }
+
+    const calc = form.dataset.calc;
+    const sgStart = document.getElementById('id_sg_start');
+    const sgEnd = document.getElementById('id_sg_end');
+    const lal = document.getElementById('id_lal');
+
+    // Fermentation: ABV from SG, LAL from volume
+    // Wash / distillation: ABV of hearts from SG (when present), LAL from hearts out
+    const volume = calc === 'fermentation'
+        ? document.getElementById('id_volume_in_l')
+        : document.getElementById('id_hearts_out');
+    const abv = calc === 'fermentation'
+        ? document.getElementById('id_abv')
+        : document.getElementById('id_abv_hearts');
+
+    // Calculate LAL when volume and ABV have values
+    function calculateLAL() {
+        const volumeVal = parseFloat(volume.value);
+        const abvVal = parseFloat(abv.value);
+
+        if (volumeVal && abvVal) {
+            const lalValue = volumeVal * (abvVal / 100);
+            lal.value = lalValue.toFixed(2);
+        }
+    }
+
+    // Calculate ABV when SG values change
+    function calculateABV() {
+        const sgStartVal = parseFloat(sgStart.value);
+        const sgEndVal = parseFloat(sgEnd.value);
+
+        if (sgStartVal && sgEndVal) {
+            const abvValue = (sgStartVal - sgEndVal) * 131.25;
+            abv.value = abvValue.toFixed(2);
+            calculateLAL();
+        }
+    }
+
+    // Spirit runs only calculate LAL
+    if (calc !== 'distillation' && sgStart && sgEnd && abv) {
+        sgStart.addEventListener('input', calculateABV);
+        sgEnd.addEventListener('input', calculateABV);
+    }
+
+    if (volume && abv && lal) {
+        volume.addEventListener('input', calculateLAL);
+        abv.addEventListener('input', calculateLAL);
+    }
+});
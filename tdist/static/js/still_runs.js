@@ -0,0 +1,118 @@
+// Still-run overlay: ABV against litres collected for each run, with cut markers.
+
+document.addEventListener('DOMContentLoaded', function() {
+    const form = document.getElementById('stillRunForm');
+    const chart = document.getElementById('stillRunChart');
+    const table = document.getElementById('cutTable');
+    if (!form || !chart) {
+        return;
+    }
+
+    const SVG = 'http://www.w3.org/2000/svg';
+    const width = 800;
+    const height = 300;
+    const pad = {top: 20, right: 20, bottom: 30, left: 60};
+
+    function element(name, attrs, text) {
+        const node = document.createElementNS(SVG, name);
+        Object.keys(attrs).forEach(function(key) {
+            node.setAttribute(key, attrs[key]);
+        });
+        if (text !== undefined) {
+            node.textContent = text;
+        }
+        return node;
+    }
+
+    function minutes(seconds) {
+        return (seconds / 60).toFixed(1);
+    }
+
+    function drawTable(summary) {
+        const body = table.querySelector('tbody');
+        body.replaceChildren();
+        summary.forEach(function(cut) {
+            const row = document.createElement('tr');
+            [cut.cut, cut.runs, minutes(cut.mean_seconds), minutes(cut.min_seconds), minutes(cut.max_seconds), cut.mean_volume].forEach(function(value) {
+                const cell = document.createElement('td');
+                cell.textContent = value;
+                row.appendChild(cell);
+            });
+            body.appendChild(row);
+        });
+        table.hidden = !summary.length;
+    }
+
+    function draw(data) {
+        chart.replaceChildren();
+        document.getElementById('stillRunTitle').textContent = data.recipe + ' (' + data.stage + ')';
+        document.getElementById('stillRunSummary').textContent = data.runs.length
+            ? data.runs.length + ' traced run(s)'
+            : 'No traced runs for this recipe and stage.';
+        drawTable(data.summary);
+        if (!data.runs.length) {
+            return;
+        }
+
+        let maxVolume = 0;
+        let maxAbv = 0;
+        data.runs.forEach(function(run) {
+            maxVolume = Math.max(maxVolume, run.volume[run.volume.length - 1] || 0);
+            run.abv.forEach(function(value) { maxAbv = Math.max(maxAbv, value || 0); });
+        });
+        maxVolume = maxVolume || 1;
+        maxAbv = maxAbv || 1;
+        const x = function(volume) {
+            return pad.left + volume / maxVolume * (width - pad.left - pad.right);
+        };
+        const y = function(abv) {
+            return height - pad.bottom - abv / maxAbv * (height - pad.top - pad.bottom);
+        };
+
+        chart.appendChild(element('line', {x1: pad.left, y1: height - pad.bottom, x2: width - pad.right, y2: height - pad.bottom, class: 'trend-axis'}));
+        chart.appendChild(element('line', {x1: pad.left, y1: pad.top, x2: pad.left, y2: height - pad.bottom, class: 'trend-axis'}));
+        chart.appendChild(element('text', {x: pad.left - 6, y: y(maxAbv) + 4, class: 'trend-label', 'text-anchor': 'end'}, maxAbv.toFixed(1) + '%'));
+        chart.appendChild(element('text', {x: pad.left - 6, y: y(0) + 4, class: 'trend-label', 'text-anchor': 'end'}, '0%'));
+        chart.appendChild(element('text', {x: pad.left, y: height - 8, class: 'trend-label'}, '0 L'));
+        chart.appendChild(element('text', {x: width - pad.right, y: height - 8, class: 'trend-label', 'text-anchor': 'end'}, maxVolume.toFixed(1) + ' L'));
+
+        data.runs.forEach(function(run) {
+            const points = [];
+            run.volume.forEach(function(volume, i) {
+                if (run.abv[i] !== null) {
+                    points.push(x(volume).toFixed(1) + ',' + y(run.abv[i]).toFixed(1));
+                }
+            });
+            const line = element('polyline', {points: points.join(' '), class: 'trend-line still-run-line'});
+            line.appendChild(element('title', {}, run.description));
+            chart.appendChild(line);
+            run.cuts.forEach(function(cut) {
+                if (cut.abv === null) {
+                    return;
+                }
+                const dot = element('circle', {cx: x(cut.volume), cy: y(cut.abv), r: 3, class: 'still-run-cut still-run-cut-' + cut.cut.toLowerCase()});
+                dot.appendChild(element('title', {}, run.description + ': ' + cut.cut + ' at ' + minutes(cut.seconds) + ' min, ' + cut.volume + ' L, ' + cut.abv + '%'));
+                chart.appendChild(dot);
+            });
+        });
+    }
+
+    function load() {
+        const params = new URLSearchParams(new FormData(form));
+        fetch(form.dataset.url + '?' + params.toString())
+            .then(function(response) { return response.json(); })
+            .then(function(data) {
+                if (data.error) {
+                    document.getElementById('stillRunSummary').textContent = data.error;
+                    return;
+                }
+                draw(data);
+            });
+    }
+
+    form.addEventListener('submit', function(event) {
+        event.preventDefault();
+        load();
+    });
+    load();
+});
@@ -0,0 +1,84 @@
+// Trend chart: fetches an aggregated series and draws it as an SVG line.
+
+document.addEventListener('DOMContentLoaded', function() {
+    const form = document.getElementById('trendForm');
+    const chart = document.getElementById('trendChart');
+    if (!form || !chart) {
+        return;
+    }
+
+    const SVG = 'http://www.w3.org/2000/svg';
+    const width = 800;
+    const height = 300;
+    const pad = {top: 20, right: 20, bottom: 30, left: 60};
+
+    function element(name, attrs, text) {
+        const node = document.createElementNS(SVG, name);
+        Object.keys(attrs).forEach(function(key) {
+            node.setAttribute(key, attrs[key]);
+        });
+        if (text !== undefined) {
+            node.textContent = text;
+        }
+        return node;
+    }
+
+    function draw(data) {
+        chart.replaceChildren();
+        document.getElementById('trendTitle').textContent = data.label;
+        const points = data.points.filter(function(point) { return point.value !== null; });
+        document.getElementById('trendSummary').textContent = points.length
+            ? points.length + ' points, ' + points[0].t + ' to ' + points[points.length - 1].t
+            : 'No data for this range.';
+        if (!points.length) {
+            return;
+        }
+
+        const values = points.map(function(point) { return point.value; });
+        const min = Math.min.apply(null, values);
+        const max = Math.max.apply(null, values);
+        const span = max - min || 1;
+        const x = function(i) {
+            return pad.left + (points.length === 1 ? 0.5 : i / (points.length - 1)) * (width - pad.left - pad.right);
+        };
+        const y = function(value) {
+            return height - pad.bottom - (value - min) / span * (height - pad.top - pad.bottom);
+        };
+
+        chart.appendChild(element('line', {x1: pad.left, y1: height - pad.bottom, x2: width - pad.right, y2: height - pad.bottom, class: 'trend-axis'}));
+        chart.appendChild(element('line', {x1: pad.left, y1: pad.top, x2: pad.left, y2: height - pad.bottom, class: 'trend-axis'}));
+        chart.appendChild(element('text', {x: pad.left - 6, y: y(max) + 4, class: 'trend-label', 'text-anchor': 'end'}, max));
+        chart.appendChild(element('text', {x: pad.left - 6, y: y(min) + 4, class: 'trend-label', 'text-anchor': 'end'}, min));
+        chart.appendChild(element('text', {x: pad.left, y: height - 8, class: 'trend-label'}, points[0].t));
+        chart.appendChild(element('text', {x: width - pad.right, y: height - 8, class: 'trend-label', 'text-anchor': 'end'}, points[points.length - 1].t));
+
+        const line = points.map(function(point, i) { return x(i).toFixed(1) + ',' + y(point.value).toFixed(1); }).join(' ');
+        chart.appendChild(element('polyline', {points: line, class: 'trend-line'}));
+        points.forEach(function(point, i) {
+            const dot = element('circle', {cx: x(i), cy: y(point.value), r: 3, class: 'trend-point'});
+            dot.appendChild(element('title', {}, point.t + ': ' + point.value));
+            chart.appendChild(dot);
+        });
+    }
+
+    function load() {
+        const params = new URLSearchParams(new FormData(form));
+        // Roughly one point per 4px of chart width
+        params.set('points', Math.max(20, Math.round(chart.clientWidth / 4)));
+        fetch(form.dataset.url + '?' + params.toString())
+            .then(function(response) { return response.json(); })
+            .then(function(data) {
+                if (data.error) {
+                    document.getElementById('trendSummary').textContent = data.error;
+                    return;
+                }
+                draw(data);
+            });
+    }
+
+    form.addEventListener('submit', function(event) {
+        event.preventDefault();
+        load();
+    });
+    load();
+});
@@ -0,0 +1,89 @@
+// Offline support: serves static assets from the cache and falls back to the
+// last copy of each page when the network is down. Form submissions made
+// while offline are queued by js/offline.js, not here.
+
+const CACHE = 'tdist-{{ version }}';
+const STATIC_URL = '{{ static_url|escapejs }}';
+const ASSETS = [{% for asset in assets %}'{{ asset|escapejs }}'{% if not forloop.last %}, {% endif %}{% endfor %}];
+const OFFLINE_PAGE = '<!DOCTYPE html><meta charset="utf-8"><title>Offline</title>'
+    + '<p>You are offline and this page has not been opened on this device before.</p>';
+
+self.addEventListener('install', function(event) {
+    event.waitUntil(
+        caches.open(CACHE)
+            .then(function(cache) { return cache.addAll(ASSETS); })
+            .then(function() { return self.skipWaiting(); })
+    );
+});
+
+self.addEventListener('activate', function(event) {
+    event.waitUntil(
+        caches.keys()
+            .then(function(names) {
+                return Promise.all(names.filter(function(name) {
+                    return name.startsWith('tdist-') && name !== CACHE;
+                }).map(function(name) { return caches.delete(name); }));
+            })
+            .then(function() { return self.clients.claim(); })
+    );
+});
+
+function cacheable(url) {
+    return url.origin === self.location.origin
+        && !url.pathname.startsWith('/admin/')
+        && url.pathname !== '/sync/';
+}
+
+self.addEventListener('fetch', function(event) {
+    const request = event.request;
+    const url = new URL(request.url);
+    if (request.method !== 'GET' || !cacheable(url)) {
+        return;
+    }
+
+    // Static files: cache first
+    if (url.pathname.startsWith(STATIC_URL)) {
+        event.respondWith(
+            caches.match(request).then(function(cached) {
+                return cached || fetch(request).then(function(response) {
+                    const copy = response.clone();
+                    caches.open(CACHE).then(function(cache) { cache.put(request, copy); });
+                    return response;
+                });
+            })
+        );
+        return;
+    }
+
+    // Pages: network first, keeping the latest copy for when the network is down
+    event.respondWith(
+        fetch(request)
+            .then(function(response) {
+                if (response.ok) {
+                    const copy = response.clone();
+                    caches.open(CACHE).then(function(cache) { cache.put(request, copy); });
+                }
+                return response;
+            })
+            .catch(function() {
+                return caches.match(request).then(function(cached) {
+                    return cached || new Response(OFFLINE_PAGE, {headers: {'Content-Type': 'text/html; charset=utf-8'}});
+                });
+            })
+    );
+});
+
+// Pages ask for the forms they link to be cached, so they open offline later
+self.addEventListener('message', function(event) {
+    if (event.data && event.data.type === 'cache' && Array.isArray(event.data.urls)) {
+        caches.open(CACHE).then(function(cache) {
+            event.data.urls.forEach(function(url) {
+                fetch(url, {credentials: 'same-origin'}).then(function(response) {
+                    if (response.ok) {
+                        cache.put(url, response);
+                    }
+                }).catch(function() {});
+            });
+        });
+    }
+});
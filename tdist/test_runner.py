@@ -0,0 +1,31 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """
+    The default runner, with settings that keep the tests away from the
+    project's own files: a per-process memory cache instead of db/cache, and
+    unhashed static files read from the app directories rather than a
+    STATIC_ROOT and manifest that collectstatic may never have written.
+    Query budget warnings are off except in the tests that check them.
+    """
+
+    test_settings = {
+        'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+        'STORAGES': {
+            'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+            'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+        },
+        'WHITENOISE_AUTOREFRESH': True,
+        'QUERY_BUDGET_WARNINGS': False,
+    }
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.overrides = override_settings(**self.test_settings)
+        self.overrides.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.overrides.disable()
+        super().teardown_test_environment(**kwargs)
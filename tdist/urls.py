@@ -21,13 +21,33 @@ from . import views
 urlpatterns = [
     path('', views.index, name='index'),
     path('log/<int:batch_id>/', views.log, name='log'),
+    path('log/<int:batch_id>/restore/', views.restore_archived_batch, name='restore_archived_batch'),
     path('create-batch/', views.create_batch, name='create_batch'),
     path('batch/<int:batch_id>/record/create/<str:section>/<int:index>/', views.create_record, name='create_record'),
     path('batch/<int:batch_id>/record/edit/<str:record_type>/<int:record_id>/', views.edit_record, name='edit_record'),
     path('batch/<int:batch_id>/export/', views.export_batch_csv, name='export_batch_csv'),
     path('batch/<int:batch_id>/totals/<int:totals_record_id>/add-product/', views.add_product, name='add_product'),
     path('batch/<int:batch_id>/product/edit/<int:product_id>/', views.edit_product, name='edit_product'),
+    path('batch/<int:batch_id>/product/<int:product_id>/provenance/', views.product_provenance, name='product_provenance'),
     path('batch/<int:batch_id>/product/delete/<int:product_id>/', views.delete_product, name='delete_product'),
+    path('recipes/', views.recipes, name='recipes'),
+    path('recipes/<int:recipe_id>/', views.recipe_detail, name='recipe_detail'),
+    path('board/', views.board, name='board'),
+    path('bulk-edit/', views.bulk_edit, name='bulk_edit'),
     path('full-log/', views.full_log, name='full_log'),
+    path('compare/', views.compare, name='compare'),
+    path('compare/csv/', views.compare_csv, name='compare_csv'),
+    path('audit/', views.audit, name='audit'),
+    path('audit/csv/', views.audit_csv, name='audit_csv'),
+    path('fermentation/<int:record_id>/readings/', views.ingest_fermentation_readings, name='ingest_fermentation_readings'),
+    path('still-runs/', views.still_runs, name='still_runs'),
+    path('still-runs/data/', views.still_runs_data, name='still_runs_data'),
+    path('still-runs/<str:record_type>/<int:record_id>/samples/', views.ingest_still_run_samples, name='ingest_still_run_samples'),
+    path('trends/', views.trends, name='trends'),
+    path('trends/data/', views.trends_data, name='trends_data'),
+    path('sync/', views.sync, name='sync'),
+    path('sw.js', views.service_worker, name='service_worker'),
+    path('jobs/<int:job_id>/', views.job_detail, name='job_detail'),
+    path('jobs/<int:job_id>/download/', views.job_download, name='job_download'),
     path('admin/', admin.site.urls),
 ]
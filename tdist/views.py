@@ -1,118 +1,220 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from django.http import HttpResponse
+from django.contrib.admin.views.decorators import staff_member_required
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from django.utils import timezone
-from distillery.forms import FermentationRecordForm, WashRecordForm, DistillationRecordForm, TotalsRecordForm, ProductRecordForm
-from distillery.models import Batch, FermentationRecord, WashRecord, DistillationRecord, TotalsRecord, ProductRecord
-from django.db.models import Q
+from django.templatetags.static import static
+from distillery.audit import PAGE_LIMIT as AUDIT_PAGE_LIMIT, RULES as AUDIT_RULES, RULES_BY_CODE as AUDIT_RULES_BY_CODE, run_audit, tolerance, write_findings_csv
+from distillery.archive import ARCHIVE_DB, ArchiveError, archive_reads, batch_number_taken, is_archived, last_batch_number, restore_batch
+from distillery.bulkedit import MAX_BATCHES as BULK_EDIT_MAX_BATCHES, STAGES as BULK_EDIT_STAGES, HIDDEN_BY_DEFAULT, grid_formset, load_rows, save_grid, stage_fields
+from distillery.compare import comparison_rows, load_batches, parse_batch_numbers
+from distillery.forms import RECORD_FORMS, SECTION_MAP, DistillationRecordForm, ProductRecordForm
+from distillery.jobs import output_dir
+from distillery.lineage import ancestry, descendants, provenance_tree
+from distillery.models import Batch, FermentationRecord, WashRecord, DistillationRecord, TotalsRecord, ProductRecord, Job, Recipe, AuditFinding, AuditRun
+from distillery.querybudget import query_budget
+from distillery.recipes import recipe_named
+from distillery.replica import replica_view
+from distillery.search import SearchError, batch_filter, record_filters
+from distillery.status import board as status_board
+from distillery.stillruns import RECORD_TYPES, STAGES, cut_summary, find_cuts, ingest_samples, parse_samples, recipe_runs
+from distillery.sync import SyncError, apply_operations
+from distillery.telemetry import TelemetryError, fermentation_curve, ingest_readings, parse_readings
+from distillery.trends import METRICS, PERIODS, trend
+from django.db.models import Count, Q
 from datetime import date
 import csv
+import hashlib
+import json
 
+# A batch's recipe and stage records, loaded with it in one query
+BATCH_RECORDS = ('recipe', 'fermentation', 'wash', 'spirit_1', 'spirit_2', 'totals')
+
+@query_budget(4)
 def index(request):
     """Home page view showing batches with search functionality."""
     query = request.GET.get('q', '')
+    include_archive = request.GET.get('archive') == '1'
+    status = request.GET.get('status', '')
+    if status not in Batch.Status.values:
+        status = ''
     
     # Start with all batches
-    batches = Batch.objects.all()
+    batches = Batch.objects.select_related('recipe')
     
     # Apply search filter if query exists
+    search = Q()
+    error = ''
     if query:
-        batches = batches.filter(
-            Q(recipe__icontains=query) |
-            Q(batch_number__icontains=query)
-        )
+        try:
+            search &= batch_filter(query)
+        except SearchError as exc:
+            error = str(exc)
+            search &= Q(pk__in=[])
+    if status:
+        search &= Q(status=status)
+    batches = batches.filter(search)
     
     # Order by batch_number descending
     batches = batches.order_by('-batch_number')
     
     # If no search, limit to last 5 batches
-    if not query:
+    if not query and not status:
         batches = batches[:5]
+    elif include_archive:
+        # Archived matches are listed alongside; opening one shows it read-only
+        archived = []
+        with archive_reads():
+            archived = list(Batch.objects.using(ARCHIVE_DB).select_related('recipe').filter(search))
+        for batch in archived:
+            batch.archived = True
+        batches = sorted([*batches, *archived], key=lambda batch: batch.batch_number, reverse=True)
     
     return render(request, 'index.html', {
         'batches': batches,
-        'query': query
+        'query': query,
+        'error': error,
+        'include_archive': include_archive,
+        'status': status,
+        'statuses': Batch.Status.choices,
+    })
+
+@query_budget(3)
+def recipes(request):
+    """Recipes with their cached statistics."""
+    return render(request, 'recipes.html', {'recipes': Recipe.objects.all()})
+
+@query_budget(4)
+def recipe_detail(request, recipe_id):
+    """One recipe's cached statistics and its most recent batches."""
+    recipe = get_object_or_404(Recipe, pk=recipe_id)
+    return render(request, 'recipe.html', {
+        'recipe': recipe,
+        'batches': recipe.batches.order_by('-batch_number')[:20],
     })
 
+@query_budget(3)
+def board(request):
+    """Batches still in production, one column per status."""
+    return render(request, 'board.html', {'columns': status_board()})
+
+@query_budget(10)
+@replica_view
 def full_log(request):
     """Full log page view - shows all records from all batch types."""
     query = request.GET.get('q', '')
-    
-    # Gather all records from all types
-    fermentation_records = FermentationRecord.objects.all()
-    wash_records = WashRecord.objects.all()
-    distillation_records = DistillationRecord.objects.all()
-    totals_records = TotalsRecord.objects.all()
-    
-    # Apply search filter if query exists
-    if query:
-        fermentation_records = fermentation_records.filter(
-            Q(description__icontains=query) |
-            Q(to_field__icontains=query)
-        )
-        wash_records = wash_records.filter(
-            Q(description__icontains=query) |
-            Q(from_field__icontains=query) |
-            Q(to_field__icontains=query)
-        )
-        distillation_records = distillation_records.filter(
-            Q(description__icontains=query) |
-            Q(from_field__icontains=query) |
-            Q(to_field__icontains=query)
-        )
-        totals_records = totals_records.filter(
-            Q(description__icontains=query)
-        )
+    include_archive = request.GET.get('archive') == '1'
     
     # Combine all records for display
     all_records = []
-    
-    for record in fermentation_records:
-        all_records.append({
-            'type': 'Fermentation',
-            'record': record,
-            'date': record.date
-        })
-    
-    for record in wash_records:
-        all_records.append({
-            'type': 'Wash',
-            'record': record,
-            'date': record.date
-        })
-    
-    for record in distillation_records:
-        all_records.append({
-            'type': 'Distillation',
-            'record': record,
-            'date': record.date
-        })
-    
-    for record in totals_records:
-        all_records.append({
-            'type': 'Totals',
-            'record': record,
-            'date': record.created_at.date()
-        })
+    error = ''
+    filters = {}
+    if query:
+        try:
+            filters = record_filters(query)
+        except SearchError as exc:
+            error = str(exc)
+    
+    # None leaves the hot database to the router (primary or replica)
+    for db in ([None, ARCHIVE_DB] if include_archive else [None]):
+        with archive_reads(db):
+            # Gather all records from all types
+            fermentation_records = FermentationRecord.objects.using(db).all()
+            wash_records = WashRecord.objects.using(db).all()
+            distillation_records = DistillationRecord.objects.using(db).all()
+            totals_records = TotalsRecord.objects.using(db).all()
+            
+            # Apply search filter if query exists; a record type the query can't match is left out
+            if query:
+                fermentation_records = fermentation_records.filter(filters.get(FermentationRecord, Q(pk__in=[])))
+                wash_records = wash_records.filter(filters.get(WashRecord, Q(pk__in=[])))
+                distillation_records = distillation_records.filter(filters.get(DistillationRecord, Q(pk__in=[])))
+                totals_records = totals_records.filter(filters.get(TotalsRecord, Q(pk__in=[])))
+            
+            for record in fermentation_records:
+                all_records.append({
+                    'type': 'Fermentation',
+                    'record': record,
+                    'date': record.date
+                })
+            
+            for record in wash_records:
+                all_records.append({
+                    'type': 'Wash',
+                    'record': record,
+                    'date': record.date
+                })
+            
+            for record in distillation_records:
+                all_records.append({
+                    'type': 'Distillation',
+                    'record': record,
+                    'date': record.date
+                })
+            
+            for record in totals_records:
+                all_records.append({
+                    'type': 'Totals',
+                    'record': record,
+                    'date': record.created_at.date()
+                })
     
     # Sort by date descending
     all_records.sort(key=lambda x: x['date'] if x['date'] else date.min, reverse=True)
     
     return render(request, 'full_log.html', {
         'records': all_records,
-        'query': query
+        'query': query,
+        'error': error,
+        'include_archive': include_archive
     })
 
+@query_budget(6)
 def log(request, batch_id):
     """Log page view for editing batch records."""
-    batch = get_object_or_404(Batch, batch_number=batch_id)
+    batch = Batch.objects.select_related(*BATCH_RECORDS).prefetch_related('totals__products').filter(batch_number=batch_id).first()
+    if batch is None:
+        # An archived batch is only restored on request (a POST), never by just viewing it
+        archived = None
+        with archive_reads():
+            archived = Batch.objects.using(ARCHIVE_DB).select_related('recipe').filter(batch_number=batch_id).first()
+        if archived is None:
+            raise Http404(f'Batch #{batch_id} not found.')
+        return render(request, 'archived_batch.html', {'batch': archived})
     
     return render(request, 'log.html', {
-        'batch': batch
+        'batch': batch,
+        'fermentation_curve': fermentation_curve(batch.fermentation) if batch.fermentation else None,
+        'spirit_runs': [
+            ('Spirit 1', 'spirit_1', batch.spirit_1),
+            ('Spirit 2', 'spirit_2', batch.spirit_2),
+        ],
     })
 
+# A select, copy and delete per table the batch has rows in
+@query_budget(50)
+@require_POST
+def restore_archived_batch(request, batch_id):
+    """Move an archived batch back into the hot database so it can be edited."""
+    try:
+        restored = restore_batch(batch_id)
+    except ArchiveError as exc:
+        messages.error(request, str(exc))
+        return redirect('index')
+    if not restored:
+        raise Http404(f'Batch #{batch_id} is not archived.')
+    messages.info(request, f'Batch #{batch_id} was restored from the archive.')
+    return redirect('log', batch_id=batch_id)
+
+@query_budget(12)
 def create_batch(request):
     """Create a new batch."""
+    # Offered as suggestions so a known recipe isn't retyped differently
+    recipes = Recipe.objects.values_list('name', flat=True)
     if request.method == 'POST':
         batch_number = request.POST.get('batch_number', '')
         recipe = request.POST.get('recipe', '')
@@ -124,15 +226,27 @@ def create_batch(request):
             messages.error(request, 'Batch number must be a valid number.')
             return render(request, 'create_batch.html', {
                 'batch_number': batch_number,
-                'recipe': recipe
+                'recipe': recipe,
+                'recipes': recipes,
             })
         
-        # Check if batch number already exists
-        if Batch.objects.filter(batch_number=batch_number).exists():
+        # Check if batch number already exists (including archived batches)
+        if batch_number_taken(batch_number):
             messages.error(request, f'Batch #{batch_number} already exists.')
             return render(request, 'create_batch.html', {
                 'batch_number': batch_number,
-                'recipe': recipe
+                'recipe': recipe,
+                'recipes': recipes,
+            })
+        
+        try:
+            recipe = recipe_named(recipe)
+        except ValueError as exc:
+            messages.error(request, str(exc))
+            return render(request, 'create_batch.html', {
+                'batch_number': batch_number,
+                'recipe': recipe,
+                'recipes': recipes,
             })
         
         batch = Batch(batch_number=batch_number, recipe=recipe)
@@ -141,45 +255,32 @@ def create_batch(request):
         return redirect('log', batch_id=batch.batch_number)
     
     # Suggest next batch number
-    last_batch = Batch.objects.order_by('-batch_number').first()
-    suggested_number = (last_batch.batch_number + 1) if last_batch else 1
+    last_number = last_batch_number()
+    suggested_number = (last_number + 1) if last_number else 1
     
-    return render(request, 'create_batch.html', {'suggested_number': suggested_number})
+    return render(request, 'create_batch.html', {
+        'suggested_number': suggested_number,
+        'recipes': recipes,
+    })
 
+@query_budget(10)
 def create_record(request, batch_id, section, index):
     """Create a new record and link it to a batch."""
     batch = get_object_or_404(Batch, batch_number=batch_id)
     
-    # Map section to record type and field name
-    section_map = {
-        'Fermentation': ('fermentation', FermentationRecordForm, 'Fermentation'),
-        'Wash': ('wash', WashRecordForm, 'Wash Run'),
-        'Spirit 1': ('distillation', DistillationRecordForm, 'Spirit Run 1'),
-        'Spirit 2': ('distillation', DistillationRecordForm, 'Spirit Run 2'),
-        'Totals': ('totals', TotalsRecordForm, 'Totals')
-    }
-    
-    if section not in section_map:
+    if section not in SECTION_MAP:
         messages.error(request, 'Invalid section.')
         return redirect('log', batch_id=batch.batch_number)
     
-    record_type, FormClass, expected_description = section_map[section]
+    field, FormClass, expected_description = SECTION_MAP[section]
+    # The form's calculator treats both spirit runs alike
+    record_type = 'distillation' if FormClass is DistillationRecordForm else field
     
     if request.method == 'POST':
         form = FormClass(request.POST)
         if form.is_valid():
             record = form.save()
-            # Link record to batch using the appropriate field
-            if section == 'Fermentation':
-                batch.fermentation = record
-            elif section == 'Wash':
-                batch.wash = record
-            elif section == 'Spirit 1':
-                batch.spirit_1 = record
-            elif section == 'Spirit 2':
-                batch.spirit_2 = record
-            elif section == 'Totals':
-                batch.totals = record
+            setattr(batch, field, record)
             batch.save()
             messages.success(request, f'Record created and linked to Batch #{batch.batch_number}!')
             return redirect('log', batch_id=batch.batch_number)
@@ -205,32 +306,16 @@ def create_record(request, batch_id, section, index):
         'is_edit': False
     })
 
+@query_budget(10)
 def edit_record(request, batch_id, record_type, record_id):
     """Edit an existing record."""
     batch = get_object_or_404(Batch, batch_number=batch_id)
 
-    # Determine record and form class based on the passed record_type
-    record = None
-    FormClass = None
-
-    if record_type == 'fermentation':
-        record = batch.fermentation
-        FormClass = FermentationRecordForm
-    elif record_type == 'wash':
-        record = batch.wash
-        FormClass = WashRecordForm
-    elif record_type == 'spirit_1':
-        record = batch.spirit_1
-        FormClass = DistillationRecordForm
-    elif record_type == 'spirit_2':
-        record = batch.spirit_2
-        FormClass = DistillationRecordForm
-    elif record_type == 'totals':
-        record = batch.totals
-        FormClass = TotalsRecordForm
-    else:
+    if record_type not in RECORD_FORMS:
         messages.error(request, 'Invalid record type.')
         return redirect('log', batch_id=batch.batch_number)
+    record = getattr(batch, record_type)
+    FormClass = RECORD_FORMS[record_type]
 
     # Validate record exists and matches provided record_id
     if not record or record.id != record_id:
@@ -241,7 +326,10 @@ def edit_record(request, batch_id, record_type, record_id):
         form = FormClass(request.POST, instance=record)
         if form.is_valid():
             form.save()
-            messages.success(request, 'Record updated successfully!')
+            if record.saved_fields:
+                messages.success(request, 'Record updated successfully!')
+            else:
+                messages.info(request, 'No changes to save.')
             return redirect('log', batch_id=batch.batch_number)
     else:
         form = FormClass(instance=record)
@@ -254,9 +342,62 @@ def edit_record(request, batch_id, record_type, record_id):
         'is_edit': True
     })
 
+@query_budget(12)
+def bulk_edit(request):
+    """Edit one stage's records of many batches in a single grid."""
+    text = request.GET.get('batches', '')
+    stage = request.GET.get('stage', 'wash')
+    if stage not in BULK_EDIT_STAGES:
+        stage = 'wash'
+    available = stage_fields(stage)
+    names = [name for name, _ in available]
+    fields = [name for name in request.GET.getlist('fields') if name in names]
+    fields = fields or [name for name in names if name not in HIDDEN_BY_DEFAULT]
+    context = {
+        'batches_text': text,
+        'stage': stage,
+        'stages': [(field, section) for field, (section, _) in BULK_EDIT_STAGES.items()],
+        'available': available,
+        'fields': fields,
+    }
+    if not text.strip():
+        return render(request, 'bulk_edit.html', context)
+    try:
+        numbers = parse_batch_numbers(text, limit=BULK_EDIT_MAX_BATCHES)
+    except ValueError as exc:
+        return render(request, 'bulk_edit.html', dict(context, error=str(exc)))
+
+    rows = load_rows(numbers, stage)
+    found = {batch.batch_number for batch, _ in rows}
+    editable = [(batch, record) for batch, record in rows if record is not None]
+    formset = grid_formset(
+        stage, [record for _, record in editable], fields, request.POST if request.method == 'POST' else None
+    )
+    if request.method == 'POST' and formset.is_valid():
+        changed = save_grid(formset)
+        if changed:
+            messages.success(request, f'Updated {len(changed)} record{"s" if len(changed) != 1 else ""}.')
+        else:
+            messages.info(request, 'No changes to save.')
+        return redirect(request.get_full_path())
+
+    context.update({
+        'formset': formset,
+        'grid': [(batch, form) for (batch, _), form in zip(editable, formset.forms)],
+        'without_record': [batch.batch_number for batch, record in rows if record is None],
+        'missing': [number for number in numbers if number not in found],
+    })
+    return render(request, 'bulk_edit.html', context)
+
+@query_budget(4)
+@replica_view
 def export_batch_csv(request, batch_id):
     """Export batch and all its records as CSV."""
-    batch = get_object_or_404(Batch, batch_number=batch_id)
+    batches = Batch.objects.all()
+    # ?archive=1 exports an archived batch without restoring it
+    if request.GET.get('archive') == '1' and not batches.filter(batch_number=batch_id).exists() and is_archived(batch_id):
+        batches = Batch.objects.using(ARCHIVE_DB).all()
+    batch = get_object_or_404(batches.select_related(*BATCH_RECORDS).prefetch_related('totals__products'), batch_number=batch_id)
     
     # Create the HttpResponse object with CSV header
     response = HttpResponse(content_type='text/csv')
@@ -406,6 +547,7 @@ def export_batch_csv(request, batch_id):
     return response
 
 
+@query_budget(10)
 def add_product(request, batch_id, totals_record_id):
     """Add a product to a totals record."""
     batch = get_object_or_404(Batch, batch_number=batch_id)
@@ -433,6 +575,7 @@ def add_product(request, batch_id, totals_record_id):
     })
 
 
+@query_budget(10)
 def edit_product(request, batch_id, product_id):
     """Edit a product record."""
     batch = get_object_or_404(Batch, batch_number=batch_id)
@@ -442,7 +585,10 @@ def edit_product(request, batch_id, product_id):
         form = ProductRecordForm(request.POST, instance=product)
         if form.is_valid():
             form.save()
-            messages.success(request, f'Product {product.product_name} updated successfully!')
+            if product.saved_fields:
+                messages.success(request, f'Product {product.product_name} updated successfully!')
+            else:
+                messages.info(request, f'No changes to Product {product.product_name}.')
             return redirect('log', batch_id=batch.batch_number)
     else:
         form = ProductRecordForm(instance=product)
@@ -455,6 +601,25 @@ def edit_product(request, batch_id, product_id):
     })
 
 
+@query_budget(8)
+@replica_view
+def product_provenance(request, batch_id, product_id):
+    """Tree of every batch whose faints ended up in a product, and where this batch's faints went."""
+    batch = get_object_or_404(Batch, batch_number=batch_id)
+    product = get_object_or_404(ProductRecord, pk=product_id, totals_record__batch=batch)
+    transfers = ancestry(batch.pk)
+    
+    return render(request, 'provenance.html', {
+        'batch': batch,
+        'product': product,
+        'tree': provenance_tree(batch.pk, transfers),
+        'ancestor_count': len({transfer.source_id for transfer in transfers}),
+        'depth': max((transfer.depth for transfer in transfers), default=0),
+        'descendants': descendants(batch.pk),
+    })
+
+
+@query_budget(10)
 def delete_product(request, batch_id, product_id):
     """Delete a product record."""
     batch = get_object_or_404(Batch, batch_number=batch_id)
@@ -470,3 +635,272 @@ def delete_product(request, batch_id, product_id):
         'batch': batch,
         'product': product
     })
+
+
+def _comparison(request):
+    """Batches, baseline and rows for the compare views, or an error message."""
+    text = request.GET.get('batches', '')
+    try:
+        numbers = parse_batch_numbers(text)
+    except ValueError as exc:
+        return {'batches_text': text, 'error': str(exc)}
+    
+    batches = load_batches(numbers)
+    found = [batch.batch_number for batch in batches]
+    baseline = request.GET.get('baseline', '')
+    baseline = int(baseline) if baseline.isdigit() and int(baseline) in found else (found[0] if found else None)
+    
+    return {
+        'batches_text': text,
+        'batches': batches,
+        'baseline': baseline,
+        'missing': [number for number in numbers if number not in found],
+        'rows': comparison_rows(batches, baseline),
+    }
+
+@query_budget(4)
+@replica_view
+def compare(request):
+    """Compare several batches field by field, with deltas against a baseline batch."""
+    return render(request, 'compare.html', _comparison(request))
+
+@query_budget(4)
+@replica_view
+def compare_csv(request):
+    """CSV export of the comparison matrix."""
+    context = _comparison(request)
+    if context.get('error'):
+        return HttpResponse(context['error'], status=400, content_type='text/plain')
+    
+    response = HttpResponse(content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="batch_comparison.csv"'
+    writer = csv.writer(response)
+    
+    header = ['Stage', 'Field']
+    for batch in context['batches']:
+        header.append(f'#{batch.batch_number}')
+        if batch.batch_number != context['baseline']:
+            header.append(f'#{batch.batch_number} vs #{context["baseline"]}')
+    writer.writerow(header)
+    
+    for row in context['rows']:
+        line = [row['stage'], row['label']]
+        for batch, cell in zip(context['batches'], row['cells']):
+            line.append('' if cell['value'] is None else cell['value'])
+            if batch.batch_number != context['baseline']:
+                line.append('' if cell['delta'] is None else cell['delta'])
+        writer.writerow(line)
+    
+    return response
+
+
+def _audit_findings(request):
+    rule = request.GET.get('rule', '')
+    findings = AuditFinding.objects.select_related('batch')
+    if rule in AUDIT_RULES_BY_CODE:
+        findings = findings.filter(rule=rule)
+    else:
+        rule = ''
+    return findings, rule
+
+@query_budget(12)
+def audit(request):
+    """Mass-balance audit findings; a POST runs the audit (changed batches only, unless "full")."""
+    if request.method == 'POST':
+        run = run_audit(full=request.POST.get('full') == '1')
+        messages.info(request, f'Checked {run.batches_checked} batch(es): {run.findings} finding(s).')
+        return redirect('audit')
+    
+    findings, rule = _audit_findings(request)
+    counts = dict(AuditFinding.objects.values_list('rule').annotate(Count('pk')).order_by())
+    findings = list(findings[:AUDIT_PAGE_LIMIT + 1])
+    for finding in findings:
+        finding.label = AUDIT_RULES_BY_CODE[finding.rule].label if finding.rule in AUDIT_RULES_BY_CODE else finding.rule
+    return render(request, 'audit.html', {
+        'rules': [(item.code, item.label, tolerance(item.code), counts.get(item.code, 0)) for item in AUDIT_RULES],
+        'rule': rule,
+        'findings': findings[:AUDIT_PAGE_LIMIT],
+        'truncated': len(findings) > AUDIT_PAGE_LIMIT,
+        'last_run': AuditRun.objects.filter(finished_at__isnull=False).first(),
+    })
+
+@query_budget(3)
+def audit_csv(request):
+    """CSV export of the audit findings (all of them, or one rule's)."""
+    findings, rule = _audit_findings(request)
+    response = HttpResponse(content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="audit{"_" + rule if rule else ""}.csv"'
+    write_findings_csv(response, findings)
+    return response
+
+
+@query_budget(10)
+@csrf_exempt
+@require_POST
+def ingest_fermentation_readings(request, record_id):
+    """Bulk upload of hydrometer readings (CSV or JSON) for a fermentation record.
+    
+    Devices authenticate with "Authorization: Bearer <TELEMETRY_TOKEN>" instead of a CSRF token.
+    """
+    if not _telemetry_authorized(request):
+        return JsonResponse({'error': 'Invalid or missing telemetry token.'}, status=403)
+    fermentation = get_object_or_404(FermentationRecord, pk=record_id)
+    
+    upload = request.FILES.get('file')
+    try:
+        if upload:
+            readings = parse_readings(upload.read(), upload.content_type or '')
+        else:
+            readings = parse_readings(request.body, request.content_type or '')
+    except (TelemetryError, UnicodeDecodeError) as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    
+    return JsonResponse(ingest_readings(fermentation, readings))
+
+def _telemetry_authorized(request):
+    token = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    return bool(settings.TELEMETRY_TOKEN) and constant_time_compare(token, settings.TELEMETRY_TOKEN)
+
+@query_budget(10)
+@csrf_exempt
+@require_POST
+def ingest_still_run_samples(request, record_type, record_id):
+    """Bulk upload of still controller samples (CSV or JSON) for a wash or distillation run.
+    
+    Authenticated like ingest_fermentation_readings. Returns the trace size and detected cuts.
+    """
+    if not _telemetry_authorized(request):
+        return JsonResponse({'error': 'Invalid or missing telemetry token.'}, status=403)
+    if record_type not in RECORD_TYPES:
+        raise Http404('Unknown record type.')
+    record = get_object_or_404(RECORD_TYPES[record_type], pk=record_id)
+    
+    upload = request.FILES.get('file')
+    try:
+        if upload:
+            samples = parse_samples(upload.read(), upload.content_type or '')
+        else:
+            samples = parse_samples(request.body, request.content_type or '')
+    except (TelemetryError, UnicodeDecodeError) as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    
+    trace = ingest_samples(record, samples)
+    return JsonResponse({
+        'received': len(samples),
+        'samples': trace.samples if trace else 0,
+        'cuts': find_cuts(trace, record) if trace else [],
+    })
+
+@query_budget(3)
+def still_runs(request):
+    """Overlay of still-run ABV curves for one recipe; the data comes from still_runs_data."""
+    recipes = Recipe.objects.filter(batch_count__gt=0)
+    return render(request, 'still_runs.html', {
+        'recipes': recipes,
+        'stages': list(STAGES),
+    })
+
+@query_budget(4)
+@replica_view
+def still_runs_data(request):
+    """JSON runs (downsampled ABV against volume collected, with cuts) for a recipe and stage."""
+    recipe_id = request.GET.get('recipe', '')
+    recipe = Recipe.objects.filter(pk=recipe_id).first() if recipe_id.isdigit() else None
+    stage = request.GET.get('stage', 'spirit_1')
+    if stage not in STAGES:
+        return JsonResponse({'error': f'Unknown stage: {stage}'}, status=400)
+    if recipe is None:
+        return JsonResponse({'error': 'Unknown recipe.'}, status=400)
+    
+    runs = recipe_runs(recipe, stage)
+    return JsonResponse({
+        'recipe': recipe.name,
+        'stage': stage,
+        'runs': runs,
+        'summary': cut_summary(runs),
+    })
+
+@query_budget(2)
+def trends(request):
+    """Chart page for the trend series; the data comes from trends_data."""
+    return render(request, 'trends.html', {
+        'metrics': [(name, spec[0]) for name, spec in METRICS.items()],
+        'periods': list(PERIODS),
+    })
+
+@query_budget(4)
+def trends_data(request):
+    """JSON series for one metric, aggregated per day, week or month."""
+    metric = request.GET.get('metric', 'wash_volume')
+    period = request.GET.get('period', 'week')
+    try:
+        start = date.fromisoformat(request.GET['start']) if request.GET.get('start') else None
+        end = date.fromisoformat(request.GET['end']) if request.GET.get('end') else None
+        points = int(request.GET.get('points') or 0) or None
+        series = trend(metric, period, start=start, end=end, points=points)
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    
+    return JsonResponse({
+        'metric': metric,
+        'label': METRICS[metric][0],
+        'period': period,
+        'points': series,
+    })
+
+
+# Each operation takes a few queries; this covers a typical queue
+@query_budget(30)
+@require_POST
+def sync(request):
+    """Apply record creates and edits queued offline (JSON ``{"operations": [...]}``) in one transaction."""
+    try:
+        payload = json.loads(request.body)
+        results = apply_operations(payload.get('operations') if isinstance(payload, dict) else None)
+    except (ValueError, SyncError) as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    
+    return JsonResponse({'results': results})
+
+
+# Static files the offline mode needs before any page has been visited
+OFFLINE_ASSETS = ['css/app.css', 'js/app.js', 'js/offline.js', 'js/record_form.js']
+
+@query_budget(0)
+def service_worker(request):
+    """The offline service worker, served from the site root so it can control every page."""
+    assets = [static(path) for path in OFFLINE_ASSETS]
+    response = render(request, 'sw.js', {
+        # A new cache whenever the asset URLs (hashed outside DEBUG) change
+        'version': hashlib.sha256(' '.join(assets).encode()).hexdigest()[:12],
+        'assets': assets,
+        'static_url': static(''),
+    }, content_type='application/javascript')
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+@query_budget(3)
+@staff_member_required
+def job_detail(request, job_id):
+    """Status page for a background job; refreshes itself until the job finishes."""
+    job = get_object_or_404(Job, pk=job_id)
+    
+    return render(request, 'job_detail.html', {
+        'job': job
+    })
+
+
+@query_budget(3)
+@staff_member_required
+def job_download(request, job_id):
+    """Download the file produced by a finished job."""
+    job = get_object_or_404(Job, pk=job_id, status=Job.Status.DONE)
+    
+    if not job.result_file:
+        raise Http404('Job has no output file.')
+    path = output_dir() / job.result_file
+    if not path.exists():
+        raise Http404('Job output has been removed.')
+    
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=job.result_file.split('-', 2)[-1])